@@ -0,0 +1,115 @@
+"""
+Benchmark: PYIO instruction tree vs. the previous closure representation
+
+Compares the current PYIO run loop against `ClosurePYIO`, a copy of the original implementation in which
+every combinator wrapped `_compute` in a fresh closure returning an `(error, value)` tuple.
+
+The closure representation recurses once per step, so it cannot run a single 1M-step chain. For a like for
+like comparison both implementations run 1M steps as many short chains; the instruction tree additionally
+runs the same number of steps as one long chain.
+
+Usage:
+    python benchmarks/bench_pyio.py
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from pyfecto.pyio import PYIO
+
+TOTAL_STEPS = 1_000_000
+SHORT_CHAIN = 500
+
+
+@dataclass
+class ClosurePYIO:
+    """The closure based PYIO, reduced to the combinators exercised below."""
+
+    _compute: Callable[[], tuple]
+
+    @staticmethod
+    def success(value) -> ClosurePYIO:
+        return ClosurePYIO(lambda: (None, value))
+
+    def map(self, f) -> ClosurePYIO:
+        def new_compute():
+            error, value = self._compute()
+            if error is not None:
+                return error, None
+            return None, f(value)
+
+        return ClosurePYIO(new_compute)
+
+    def flat_map(self, f) -> ClosurePYIO:
+        def new_compute():
+            error, value = self._compute()
+            if error is not None:
+                return error, None
+            return f(value)._compute()
+
+        return ClosurePYIO(new_compute)
+
+    def run(self):
+        error, value = self._compute()
+        return error if error is not None else value
+
+
+def map_chain(io, steps: int):
+    effect = io.success(0)
+    for _ in range(steps):
+        effect = effect.map(lambda x: x + 1)
+    return effect
+
+
+def flat_map_chain(io, steps: int):
+    effect = io.success(0)
+    for _ in range(steps):
+        effect = effect.flat_map(lambda x: io.success(x + 1))
+    return effect
+
+
+def timed(label: str, build: Callable[[int], object], chain_length: int) -> None:
+    runs = TOTAL_STEPS // chain_length
+    build_time = run_time = 0.0
+    for _ in range(runs):
+        start = time.perf_counter()
+        effect = build(chain_length)
+        built = time.perf_counter()
+        result = effect.run()
+        run_time += time.perf_counter() - built
+        build_time += built - start
+        assert result == chain_length, result
+
+    ns_per_step = (build_time + run_time) / TOTAL_STEPS * 1e9
+    print(
+        f"{label:<46} build {build_time:6.3f}s  run {run_time:6.3f}s  "
+        f"{ns_per_step:8.1f} ns/step"
+    )
+
+
+def main() -> None:
+    print(f"{TOTAL_STEPS:,} steps per scenario\n")
+    for name, build in (("map", map_chain), ("flat_map", flat_map_chain)):
+        timed(
+            f"closure  {name:<8} ({SHORT_CHAIN}-step chains)",
+            lambda n: build(ClosurePYIO, n),
+            SHORT_CHAIN,
+        )
+        timed(
+            f"tree     {name:<8} ({SHORT_CHAIN}-step chains)",
+            lambda n: build(PYIO, n),
+            SHORT_CHAIN,
+        )
+        timed(
+            f"tree     {name:<8} (one {TOTAL_STEPS:,}-step chain)",
+            lambda n: build(PYIO, n),
+            TOTAL_STEPS,
+        )
+        print()
+
+
+if __name__ == "__main__":
+    main()
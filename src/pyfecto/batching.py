@@ -0,0 +1,387 @@
+"""
+Automatic batching of lookups, in the style of DataLoader.
+
+A DataSource describes how to fetch many keys with one bulk call. Its `get(key)` returns a BatchedRequest, an
+effect for a single key that composes like any other PYIO. When effects are run together by
+`collections.foreach` or `collections.collect_all`, every request they are blocked on at the same time is
+deduplicated and sent to its data source as one batch, and the fetched values are cached for the rest of that
+call. So
+
+    foreach(user_ids, users.get)
+
+issues a single `fetch_batch(user_ids)` instead of one backend call per id, including when each item goes on to
+make further requests, which are then batched together in a second round.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from functools import partial
+from typing import Any, Callable, Generic, Hashable, Optional, TypeVar
+
+from .fiber import Fiber
+from .pyio import (
+    PYIO,
+    Async,
+    Defer,
+    Fail,
+    Fold,
+    FromAwaitable,
+    Succeed,
+    Sync,
+    _finalize,
+    _interpret,
+)
+from .runtime import Runtime
+
+A = TypeVar("A")
+K = TypeVar("K", bound=Hashable)
+E = TypeVar("E", bound=Exception | None)
+
+
+class DataSource(Generic[K, E, A], ABC):
+    """
+    A backend that can look up many keys with one call.
+
+    Subclasses implement fetch_batch. Setting `max_batch_size` splits larger batches into several calls.
+
+    Usage:
+        class Users(DataSource[int, Exception, User]):
+            def fetch_batch(self, keys: list[int]) -> PYIO[Exception, dict[int, User]]:
+                return PYIO.attempt(lambda: {user.id: user for user in db.users_by_ids(keys)})
+
+        users = Users()
+        foreach(user_ids, users.get)  # one call to db.users_by_ids
+
+    Type Variables:
+        K: Type of the keys
+        E: Error type of the bulk call
+        A: Type of the looked up values
+    """
+
+    max_batch_size: Optional[int] = None
+
+    @abstractmethod
+    def fetch_batch(self, keys: list[K]) -> PYIO[E, dict[K, A]]:
+        """
+        Looks up a batch of distinct keys.
+
+        Args:
+            keys: The keys to look up, without duplicates
+
+        Returns:
+            A PYIO effect producing the value of each key. A key missing from the result fails its requests with
+            a KeyError; a failure of the whole effect fails the requests for all of the keys.
+        """
+        pass
+
+    def get(self, key: K) -> PYIO[E, A]:
+        """
+        Creates the request for a single key. Run on its own, the request makes a batch of one; run together
+        with other requests by foreach or collect_all, it joins their batch.
+
+        Args:
+            key: The key to look up
+        """
+        return BatchedRequest(self, key)
+
+    def _fetch(self, keys: list[K]) -> PYIO[None, dict[K, tuple[Any, Any]]]:
+        """
+        The effect fetching the keys, split according to max_batch_size. It never fails: it produces the
+        `(error, value)` outcome of each key.
+        """
+        size = self.max_batch_size or len(keys)
+        fetched: PYIO[None, dict[K, tuple[Any, Any]]] = Succeed({})
+        for start in range(0, len(keys), size):
+            end = start + size
+            chunk = self._fetch_chunk(keys[start:end])
+            fetched = fetched.flat_map(partial(_merge, chunk))
+        return fetched
+
+    def _fetch_chunk(self, keys: list[K]) -> PYIO[None, dict[K, tuple[Any, Any]]]:
+        def call() -> PYIO[Any, Any]:
+            try:
+                return self.fetch_batch(keys)
+            except Exception as e:
+                return Fail(e)
+
+        def split(values: dict[K, A]) -> PYIO[Any, Any]:
+            return Sync(
+                lambda: {
+                    key: (None, values[key]) if key in values else (KeyError(key), None)
+                    for key in keys
+                }
+            )
+
+        def fail_all(error: Any) -> PYIO[Any, Any]:
+            return Succeed({key: (error, None) for key in keys})
+
+        return Fold(Fold(Defer(call), None, split), fail_all, None)
+
+
+class BatchedRequest(Async[E, A]):
+    """
+    A lookup of one key from a DataSource.
+
+    To the run loop this is an ordinary Async node: run on its own it fetches its key on a fiber, so waiting on it
+    never blocks a worker thread. The batching drivers in the collections module recognize it and fetch all of
+    the requests they are blocked on together instead.
+    """
+
+    __slots__ = ("source", "key")
+
+    def __init__(self, source: DataSource[K, E, A], key: K):
+        super().__init__(self._fetch_alone)
+        self.source = source
+        self.key = key
+
+    def _fetch_alone(self, callback: Callable[[Any, Any], None]) -> Callable[[], None]:
+        fiber: Fiber[Any, Any] = Fiber.start(self.source._fetch([self.key]))
+
+        def deliver(error: Any, outcomes: Any) -> None:
+            if error is not None:
+                callback(error, None)
+            else:
+                callback(*outcomes[self.key])
+
+        fiber._observe(deliver)
+        return fiber._request_interruption
+
+
+def _batched(effects: list[PYIO[Any, Any]]) -> PYIO[Any, list[Any]]:
+    """
+    Runs effects one after another, batching the requests they make, and collects their results.
+
+    Each effect runs until it completes or blocks on a BatchedRequest. Once every effect has done one or the
+    other, the requests of the round are deduplicated, fetched with one call per data source, and the blocked
+    effects resume, possibly blocking on the next round of requests. Fetched outcomes are cached until the run
+    completes, so a key is fetched at most once. Effects without requests run exactly as they would in sequence.
+    The first failure fails the whole run, after the finalizers of the effects left unfinished have run.
+
+    The run is an Async node driven by callbacks: while it waits on a batch or on anything else an effect waits
+    on, it holds no thread, so on a fiber it hands its worker thread back like any other wait.
+    """
+    return Async(lambda callback: _BatchRun(effects, callback).start())
+
+
+class _BatchRun:
+    """
+    The state of one run of `_batched`.
+
+    One thread at a time drives the run: the thread that starts it, and then whichever thread picks it up after a
+    wait. A wait that completes before its `register` returns is picked up by the same thread; otherwise the run
+    continues on the runtime's worker pool, so the callbacks of timers or other fibers never run the effects.
+
+    Each item runs in its own copy of the caller's context variables, as a forked fiber would, so what one item
+    sets, such as its tracing span, is seen neither by the other items nor by the caller. The fetch of a round
+    runs in the caller's context.
+    """
+
+    def __init__(
+        self, effects: list[PYIO[Any, Any]], callback: Callable[[Any, Any], None]
+    ):
+        self._callback = callback
+        self._lock = threading.Lock()
+        self._results: list[Any] = [None] * len(effects)
+        self._fetched: dict[DataSource[Any, Any, Any], dict[Any, tuple[Any, Any]]] = {}
+        self._context = contextvars.copy_context()
+        self._runnable: deque[tuple[int, Any, list[Any], contextvars.Context]] = deque(
+            (index, effect, [], self._context.copy())
+            for index, effect in enumerate(effects)
+        )
+        self._blocked: list[
+            tuple[int, list[Any], contextvars.Context, BatchedRequest[Any, Any]]
+        ] = []
+        # The item being run, by index, stack and context, and what it continues with; the fetch of a round is
+        # item -1
+        self._running: Optional[tuple[int, list[Any], contextvars.Context]] = None
+        self._next: Any = None
+        # Identifies the wait in progress, if any, and how to cancel it
+        self._waiting: Optional[object] = None
+        self._canceler: Optional[Callable[[], object]] = None
+        self._registering = False
+        self._early: Optional[tuple[Any, Any]] = None
+        self._cancelled = False
+        self._done = False
+
+    def start(self) -> Callable[[], None]:
+        self._drive()
+        return self._cancel
+
+    def _drive(self) -> None:
+        """Runs the items until the run completes or has to wait."""
+        while True:
+            with self._lock:
+                cancelled = self._cancelled
+            if cancelled:
+                self._abandon()
+                return
+            if self._running is None:
+                if self._runnable:
+                    index, self._next, stack, context = self._runnable.popleft()
+                elif self._blocked:
+                    index, self._next, stack = -1, self._fetch_round(), []
+                    context = self._context
+                else:
+                    self._finish(None, self._results)
+                    return
+                self._running = (index, stack, context)
+            index, stack, context = self._running
+            try:
+                error, value, pending = context.run(_interpret, self._next, stack, None)
+            except Exception as e:
+                self._running = None
+                context.run(_finalize, stack)
+                self._abandon()
+                self._finish(e, None)
+                return
+            if pending is None:
+                self._running = None
+                if error is not None:
+                    # The items left unfinished will not resume: release what they hold
+                    self._abandon()
+                    self._finish(error, None)
+                elif index == -1:
+                    self._resume_blocked()
+                else:
+                    self._results[index] = value
+                continue
+            if index != -1 and isinstance(pending, BatchedRequest):
+                outcome = self._fetched.get(pending.source, {}).get(pending.key)
+                if outcome is None:
+                    self._running = None
+                    self._blocked.append((index, stack, context, pending))
+                else:
+                    self._next = _outcome(outcome)
+                continue
+            if not self._wait(pending, context):
+                return
+
+    def _fetch_round(self) -> PYIO[None, Any]:
+        """The effect fetching the keys the blocked items wait on, with one call per data source."""
+        keys: dict[DataSource[Any, Any, Any], dict[Any, None]] = {}
+        for _, _, _, request in self._blocked:
+            keys.setdefault(request.source, {})[request.key] = None
+        fetched: PYIO[None, Any] = Succeed(None)
+        for source, distinct in keys.items():
+            fetched = fetched.then(
+                source._fetch(list(distinct)).map(
+                    partial(_store, self._fetched.setdefault(source, {}))
+                )
+            )
+        return fetched
+
+    def _resume_blocked(self) -> None:
+        self._runnable.extend(
+            (
+                index,
+                _outcome(self._fetched[request.source][request.key]),
+                stack,
+                context,
+            )
+            for index, stack, context, request in self._blocked
+        )
+        self._blocked = []
+
+    def _wait(
+        self,
+        node: Async[Any, Any] | FromAwaitable[Any, Any],
+        context: contextvars.Context,
+    ) -> bool:
+        """
+        Waits on the node the running item is suspended on, registering in the item's context. Returns True if its
+        outcome arrived before `register` returned, so the calling thread goes on driving, or False if the run
+        continues on the worker pool once it arrives.
+        """
+        token = object()
+        with self._lock:
+            self._waiting = token
+            self._registering = True
+
+        def resume(error: Any, value: Any) -> None:
+            with self._lock:
+                if self._waiting is not token:
+                    return
+                self._waiting = None
+                self._canceler = None
+                if self._registering:
+                    self._early = (error, value)
+                    return
+            self._next = Fail(error) if error is not None else Succeed(value)
+            Runtime().executor.submit(self._context.copy().run, self._drive)
+
+        canceler: Optional[Callable[[], object]]
+        try:
+            canceler = context.run(node.register, resume)
+        except Exception as e:
+            canceler = None
+            resume(e, None)
+        with self._lock:
+            self._registering = False
+            early, self._early = self._early, None
+            cancelled = self._cancelled
+            if self._waiting is token and not cancelled:
+                self._canceler = canceler
+                return False
+            self._waiting = None
+        if early is not None:
+            self._next = _outcome(early)
+        elif cancelled and canceler is not None:
+            # Cancelled while `register` was running, so the canceler was not known yet
+            canceler()
+        return True
+
+    def _cancel(self) -> None:
+        """Stops the run when the effect waiting on it is interrupted, releasing what the items hold."""
+        with self._lock:
+            if self._done or self._cancelled:
+                return
+            self._cancelled = True
+            # Nobody drives the run while it waits, so the canceling thread cleans up
+            idle = self._waiting is not None and not self._registering
+            canceler = self._canceler
+            if idle:
+                self._waiting = None
+                self._canceler = None
+        if idle:
+            if canceler is not None:
+                canceler()
+            self._abandon()
+
+    def _abandon(self) -> None:
+        """Runs the pending finalizers of the items that will not be resumed, in the order of the items."""
+        stacks = []
+        if self._running is not None:
+            stacks.append(self._running[1:])
+            self._running = None
+        stacks.extend((stack, context) for _, stack, context, _ in self._blocked)
+        stacks.extend((stack, context) for _, _, stack, context in self._runnable)
+        self._blocked = []
+        self._runnable.clear()
+        for stack, context in stacks:
+            context.run(_finalize, stack)
+
+    def _finish(self, error: Any, value: Any) -> None:
+        with self._lock:
+            self._done = True
+        self._callback(error, value)
+
+
+def _outcome(outcome: tuple[Any, Any]) -> PYIO[Any, Any]:
+    error, value = outcome
+    return Fail(error) if error is not None else Succeed(value)
+
+
+def _merge(
+    chunk: PYIO[None, dict[Any, tuple[Any, Any]]], outcomes: dict[Any, tuple[Any, Any]]
+) -> PYIO[None, dict[Any, tuple[Any, Any]]]:
+    return chunk.map(lambda more: {**outcomes, **more})
+
+
+def _store(
+    fetched: dict[Any, tuple[Any, Any]], outcomes: dict[Any, tuple[Any, Any]]
+) -> None:
+    fetched.update(outcomes)
@@ -0,0 +1,214 @@
+"""
+Keyed caching of effectful lookups.
+
+An EffectCache wraps a function from keys to PYIO effects, e.g. `WeatherService.get_weather`, and remembers the
+outcome for each key. Concurrent lookups of a key that is not cached yet share a single call to the backend, the
+least recently used entries are evicted once the cache is full, and entries expire after a configurable time.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Generic, Hashable, Optional, TypeVar, cast
+
+from .fiber import Fiber
+from .pyio import PYIO, Fail, Succeed
+
+A = TypeVar("A")
+K = TypeVar("K", bound=Hashable)
+E = TypeVar("E", bound=Exception | None)
+
+# Every live cache by name, read by Runtime.cache_stats(). Kept here rather than on the runtime, so that creating
+# a cache, typically at import time, never creates the runtime before the application configures it.
+_caches: weakref.WeakValueDictionary[str, EffectCache[Any, Any, Any]] = (
+    weakref.WeakValueDictionary()
+)
+_caches_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    """A snapshot of the counters of an EffectCache."""
+
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache, 0.0 before the first lookup."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class _Entry:
+    """The lookup for one key: the fiber running it, and when its outcome goes stale once it has one."""
+
+    __slots__ = ("fiber", "expires")
+
+    def __init__(self, fiber: Fiber[Any, Any]):
+        self.fiber = fiber
+        self.expires: Optional[float] = None
+
+
+class EffectCache(Generic[K, E, A]):
+    """
+    A bounded cache of the outcomes of an effectful lookup function, keyed by its argument.
+
+    Each key is looked up at most once while its entry is cached: lookups of a key whose call is still in flight
+    wait for that call, without holding a thread when they run on fibers. Successful results are kept for `ttl`
+    seconds and failures, when `failure_ttl` is set, for `failure_ttl` seconds, so a backend that is down is not
+    hammered with the same failing request. Once `max_size` keys are cached, the least recently used is evicted.
+
+    The cache is registered under its name, so its counters are available from `Runtime().cache_stats()` as well
+    as from `stats()`.
+
+    Type Variables:
+        K: Type of the keys
+        E: Error type of the lookup
+        A: Type of the looked up values
+    """
+
+    def __init__(
+        self,
+        lookup: Callable[[K], PYIO[E, A]],
+        max_size: int = 1_024,
+        ttl: Optional[float] = None,
+        failure_ttl: Optional[float] = None,
+        name: Optional[str] = None,
+    ):
+        """
+        Args:
+            lookup: A function that maps each key to the PYIO effect looking it up
+            max_size: Maximum number of keys kept in the cache
+            ttl: Seconds a successful result stays cached (if None, until it is evicted)
+            failure_ttl: Seconds a failure stays cached (if None, failures are not cached)
+            name: Name the counters are reported under (if None, the lookup function's qualified name)
+        """
+        if max_size < 1:
+            raise ValueError(f"max_size must be at least 1, got {max_size}")
+        for label, seconds in (("ttl", ttl), ("failure_ttl", failure_ttl)):
+            if seconds is not None and seconds <= 0:
+                raise ValueError(f"{label} must be positive, got {seconds}")
+        self._lookup = lookup
+        self._max_size = max_size
+        self._ttl = ttl
+        self._failure_ttl = failure_ttl
+        if name is None:
+            name = str(getattr(lookup, "__qualname__", lookup))
+        self.name = name
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[K, _Entry] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        with _caches_lock:
+            _caches[self.name] = self
+
+    def get(self, key: K) -> PYIO[E, A]:
+        """
+        Looks up a key, calling the lookup function only if the key is not cached or its entry has expired.
+
+        Args:
+            key: The key to look up
+        """
+
+        def get_or_start() -> PYIO[E, A]:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and self._is_fresh(entry):
+                    self._hits += 1
+                    self._entries.move_to_end(key)
+                    started = False
+                else:
+                    self._misses += 1
+                    if entry is not None:
+                        del self._entries[key]
+                        self._evictions += 1
+                    # The lookup function itself is only called on the fiber, outside of the lock
+                    entry = _Entry(Fiber(PYIO.defer(lambda: self._lookup(key))))
+                    self._entries[key] = entry
+                    while len(self._entries) > self._max_size:
+                        self._entries.popitem(last=False)
+                        self._evictions += 1
+                    started = True
+            fiber = entry.fiber
+            if started:
+                fiber._observe(self._stamp(key, entry))
+                fiber._schedule()
+            outcome = fiber._outcome
+            if outcome is not None:
+                error, value = outcome
+                return cast(
+                    PYIO[E, A], Fail(error) if error is not None else Succeed(value)
+                )
+            return fiber.join()
+
+        return PYIO.defer(get_or_start)
+
+    def invalidate(self, key: K) -> PYIO[None, None]:
+        """
+        Removes a key from the cache, so its next lookup calls the lookup function again.
+
+        Args:
+            key: The key to remove
+        """
+
+        def remove() -> None:
+            with self._lock:
+                self._entries.pop(key, None)
+
+        return PYIO.attempt(remove)
+
+    def invalidate_all(self) -> PYIO[None, None]:
+        """Removes every key from the cache."""
+
+        def clear() -> None:
+            with self._lock:
+                self._entries.clear()
+
+        return PYIO.attempt(clear)
+
+    def stats(self) -> CacheStats:
+        """Returns the current hit, miss and eviction counters and the number of cached keys."""
+        with self._lock:
+            return CacheStats(
+                self._hits, self._misses, self._evictions, len(self._entries)
+            )
+
+    def _is_fresh(self, entry: _Entry) -> bool:
+        outcome = entry.fiber._outcome
+        if outcome is None or entry.expires is None:
+            # Still running, or completed a moment ago and about to be stamped
+            return (
+                outcome is None or outcome[0] is None or self._failure_ttl is not None
+            )
+        return time.monotonic() < entry.expires
+
+    def _stamp(self, key: K, entry: _Entry) -> Callable[[Any, Any], None]:
+        """Sets the expiry of an entry once its lookup completes, dropping failures that are not to be cached."""
+
+        def completed(error: Any, value: Any) -> None:
+            ttl = self._ttl if error is None else self._failure_ttl
+            with self._lock:
+                if self._entries.get(key) is not entry:
+                    return
+                if error is not None and ttl is None:
+                    del self._entries[key]
+                else:
+                    entry.expires = (
+                        float("inf") if ttl is None else time.monotonic() + ttl
+                    )
+
+        return completed
+
+
+def _live_caches() -> list[tuple[str, EffectCache[Any, Any, Any]]]:
+    """The caches still in use, by name."""
+    with _caches_lock:
+        return list(_caches.items())
@@ -0,0 +1,267 @@
+"""
+Circuit breakers: failing fast while a dependency is down.
+
+A CircuitBreaker counts the consecutive failures of the effects it protects. Once there are too many, it opens
+and protected effects fail straight away with a CircuitOpenError instead of waiting on the dependency, e.g. for
+their own timeouts. After a cool-down period a few probe calls are let through; if they succeed the circuit closes
+again, if one fails it opens for another period.
+"""
+
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any, Optional, TypeVar, Union
+
+from .pyio import PYIO, Defer, Ensuring, Fail, Fold, Succeed, Sync, _log
+
+A = TypeVar("A")
+E = TypeVar("E", bound=Exception | None)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+_names = itertools.count(1)
+
+# Every live breaker by name, read by Runtime.circuit_breaker_stats(). Kept here rather than on the runtime, so that
+# creating a breaker, typically at import time, never creates the runtime before the application configures it.
+_breakers: weakref.WeakValueDictionary[str, CircuitBreaker] = (
+    weakref.WeakValueDictionary()
+)
+_breakers_lock = threading.Lock()
+
+
+class CircuitOpenError(Exception):
+    """The error a protected effect fails with, without being run, while its circuit breaker is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(
+            f"Circuit breaker {name!r} is open, retry after {retry_after:.2f}s"
+        )
+        self.name = name
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class CircuitStats:
+    """A snapshot of the state and counters of a CircuitBreaker."""
+
+    state: str
+    consecutive_failures: int
+    rejected: int
+    times_opened: int
+
+
+class CircuitBreaker:
+    """
+    Protects callers from a failing dependency by failing fast once it keeps failing.
+
+    The breaker starts closed, running every protected effect. After `max_failures` failures in a row it opens
+    and, for `reset_timeout` seconds, fails protected effects with a CircuitOpenError without running them. The
+    first call after that moves it to half-open: up to `half_open_probes` calls run as probes while the others
+    keep failing fast. The circuit closes once that many probes succeed, and opens again as soon as one fails.
+
+    A breaker is meant to be shared by every fiber and thread calling the dependency. Each state transition is
+    logged through the runtime logger with the breaker's name bound as `circuit`, and the breaker is
+    registered under its name, so its counters are available from `Runtime().circuit_breaker_stats()`.
+
+    Usage:
+        breaker = CircuitBreaker(max_failures=5, reset_timeout=30, name="weather-api")
+        weather = breaker.protect(fetch_weather(city).timeout(2))
+    """
+
+    def __init__(
+        self,
+        max_failures: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_probes: int = 1,
+        name: Optional[str] = None,
+    ):
+        """
+        Args:
+            max_failures: Number of consecutive failures that opens the circuit
+            reset_timeout: Seconds the circuit stays open before letting probes through
+            half_open_probes: Number of successful probes needed to close the circuit again, which is also the
+                number of probes allowed to run at the same time
+            name: Name used in logs and stats (if None, a generated "circuit-<n>")
+        """
+        if max_failures < 1:
+            raise ValueError(f"max_failures must be at least 1, got {max_failures}")
+        if reset_timeout < 0:
+            raise ValueError(f"reset_timeout must not be negative, got {reset_timeout}")
+        if half_open_probes < 1:
+            raise ValueError(
+                f"half_open_probes must be at least 1, got {half_open_probes}"
+            )
+        self.max_failures = max_failures
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        if name is None:
+            name = f"circuit-{next(_names)}"
+        self.name = name
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        # Bumped on every transition, so that calls admitted before it no longer count
+        self._generation = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self._rejected = 0
+        self._times_opened = 0
+        with _breakers_lock:
+            _breakers[self.name] = self
+
+    @property
+    def state(self) -> str:
+        """The current state: "closed", "open" or "half-open"."""
+        return self._state
+
+    def protect(self, effect: PYIO[E, A]) -> PYIO[Union[E, CircuitOpenError], A]:
+        """
+        Runs the effect if the circuit lets it through, recording whether it failed.
+
+        Any failure of the effect counts towards opening the circuit. An effect interrupted before it completes,
+        e.g. by an outer timeout, counts as neither a failure nor a success.
+
+        Args:
+            effect: The effect calling the protected dependency
+
+        Returns:
+            The effect, failing with CircuitOpenError instead of running while the circuit is open
+        """
+
+        def admit() -> PYIO[Any, Any]:
+            with self._lock:
+                rejection, transition = self._admit()
+                generation = self._generation
+            _log_transition(transition)
+            if rejection is not None:
+                return Fail(rejection)
+            recorded = [False]
+
+            def on_failure(error: Any) -> PYIO[Any, Any]:
+                recorded[0] = True
+                self._record(generation, failed=True)
+                return Fail(error)
+
+            def on_success(value: Any) -> PYIO[Any, Any]:
+                recorded[0] = True
+                self._record(generation, failed=False)
+                return Succeed(value)
+
+            def withdraw() -> None:
+                if not recorded[0]:
+                    self._record(generation, failed=None)
+
+            return Ensuring(Fold(effect, on_failure, on_success), Sync(withdraw))
+
+        return Defer(admit)
+
+    def stats(self) -> CircuitStats:
+        """Returns the current state, the run of consecutive failures and the rejection and opening counters."""
+        with self._lock:
+            return CircuitStats(
+                self._state, self._failures, self._rejected, self._times_opened
+            )
+
+    def _admit(self) -> tuple[Optional[CircuitOpenError], Optional[_Transition]]:
+        """
+        Decides whether a call may run, moving an open circuit whose time is up to half-open. Call under the lock.
+        Returns the rejection, if the call may not run, and the transition to log once the lock is released.
+        """
+        transition = None
+        if self._state == OPEN:
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                self._rejected += 1
+                return CircuitOpenError(self.name, remaining), None
+            transition = self._transition(HALF_OPEN)
+        if self._state == HALF_OPEN:
+            if self._probes >= self.half_open_probes:
+                self._rejected += 1
+                return CircuitOpenError(self.name, 0.0), transition
+            self._probes += 1
+        return None, transition
+
+    def _record(self, generation: int, failed: Optional[bool]) -> None:
+        """Counts the outcome of a call, or only frees its probe slot if it did not complete (failed is None)."""
+        with self._lock:
+            transition = self._count(generation, failed)
+        _log_transition(transition)
+
+    def _count(self, generation: int, failed: Optional[bool]) -> Optional[_Transition]:
+        """Updates the counters for the outcome of a call. Call under the lock."""
+        if generation != self._generation:
+            return None
+        if self._state == HALF_OPEN:
+            self._probes -= 1
+            if failed:
+                return self._open()
+            if failed is not None:
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    return self._transition(CLOSED)
+        elif failed:
+            self._failures += 1
+            if self._failures >= self.max_failures:
+                return self._open()
+        elif failed is not None:
+            self._failures = 0
+        return None
+
+    def _open(self) -> _Transition:
+        self._opened_at = time.monotonic()
+        self._times_opened += 1
+        return self._transition(OPEN)
+
+    def _transition(self, state: str) -> _Transition:
+        """Moves to a new state, resetting the counters of the old one. Call under the lock."""
+        previous, self._state = self._state, state
+        self._generation += 1
+        self._probes = 0
+        self._probe_successes = 0
+        if state == CLOSED:
+            self._failures = 0
+        return _Transition(self.name, previous, state, self._failures)
+
+
+@dataclass(frozen=True)
+class _Transition:
+    """A change of state of a breaker, logged once its lock is released so a slow sink never holds it."""
+
+    name: str
+    previous: str
+    state: str
+    failures: int
+
+
+def _log_transition(transition: Optional[_Transition]) -> None:
+    if transition is None:
+        return
+    name, previous, state = transition.name, transition.previous, transition.state
+    extra = {"circuit": name, "state": state}
+    if state == OPEN:
+        message = (
+            f"Circuit breaker {name!r} opened after {transition.failures} consecutive failures"
+            if previous == CLOSED
+            else f"Circuit breaker {name!r} reopened after a failed probe"
+        )
+        _log("WARNING", message, {}, extra)
+    else:
+        _log(
+            "INFO",
+            f"Circuit breaker {name!r} changed from {previous} to {state}",
+            {},
+            extra,
+        )
+
+
+def _live_breakers() -> list[tuple[str, CircuitBreaker]]:
+    """The circuit breakers still in use, by name."""
+    with _breakers_lock:
+        return list(_breakers.items())
@@ -5,14 +5,26 @@ This module provides functions for working with collections of PYIO effects or
 applying effects to collections of values, similar to ZIO's collection utilities.
 """
 
-from typing import Any, Callable, TypeVar
-
-from .pyio import PYIO
+import asyncio
+import math
+import os
+import threading
+from functools import partial
+from typing import Any, Awaitable, Callable, Iterable, Optional, TypeVar
+
+from .batching import _batched
+from .fiber import Fiber
+from .pyio import PYIO, FromAwaitable
+from .ratelimit import RateLimiter
+from .runtime import Runtime
 
 A = TypeVar("A")
 B = TypeVar("B")
 E = TypeVar("E", bound=Exception | None)
 
+# Default number of results buffered before they are handed to a sink by the streaming functions.
+DEFAULT_BATCH_SIZE = 1_000
+
 
 def forall(items: list[A], f: Callable[[A], PYIO[E, bool]]) -> PYIO[E, bool]:
     """
@@ -40,83 +52,299 @@ def forall(items: list[A], f: Callable[[A], PYIO[E, bool]]) -> PYIO[E, bool]:
             try:
                 result = f(item).run()
                 if isinstance(result, Exception):
-                    return result, None
+                    return PYIO.fail(result)
                 # interrupt the loop early, since the current predicate didn't pass
                 elif not result:
-                    return None, False
+                    return PYIO.success(False)
             except Exception as e:
-                return e, None
-        return None, True
+                return PYIO.fail(e)
+        return PYIO.success(True)
 
-    return PYIO(process_all)
+    return PYIO.defer(process_all)
 
 
-def foreach(items: list[A], f: Callable[[A], PYIO[E, B]]) -> PYIO[E, list[B]]:
+def foreach(
+    items: list[A],
+    f: Callable[[A], PYIO[E, B]],
+    throttle: Optional[RateLimiter] = None,
+) -> PYIO[E, list[B]]:
     """
     Applies the function f to each element in the list and collects the results.
     If any effect fails, the entire operation fails with that error.
 
+    Lookups made through a DataSource (see the batching module) are batched: the requests the items are waiting
+    on at the same time are sent as one bulk call, and each key is fetched only once.
+
     Args:
         items: A list of items to process
         f: A function that maps each item to a PYIO effect
+        throttle: Limits the rate at which items are started, see `ratelimit.throttle` (if None, no limit)
 
     Returns:
         A PYIO effect that produces a list of all results if successful
     """
+    if not items:
+        return PYIO.attempt(list)
+
+    return _batched(
+        [_throttled(throttle, PYIO.defer(partial(_apply, f, item))) for item in items]
+    )
+
+
+def foreach_par(
+    items: list[A],
+    f: Callable[[A], PYIO[E, B]],
+    max_concurrency: Optional[int] = None,
+    throttle: Optional[RateLimiter] = None,
+) -> PYIO[E, list[B]]:
+    """
+    Applies the function f to each element in the list concurrently and collects the results.
+
+    Items are processed by up to `max_concurrency` fibers scheduled on the runtime's worker pool (see
+    `Runtime(max_workers=...)`), each taking the next unprocessed item as soon as it is done with the previous one.
+    Results keep the order of the input list. If any effect fails, the entire operation fails with that error:
+    items that have not been started are skipped and the fibers still running are interrupted.
 
-    results: list[B] = []
+    Args:
+        items: A list of items to process
+        f: A function that maps each item to a PYIO effect
+        max_concurrency: Maximum number of items processed at the same time (if None, all items are started at once)
+        throttle: Limits the rate at which items are started, see `ratelimit.throttle` (if None, no limit)
+
+    Returns:
+        A PYIO effect that produces a list of all results in input order if successful
+    """
+    _check_concurrency(max_concurrency)
     if not items:
-        return PYIO.attempt(lambda: results)
+        return PYIO.attempt(list)
 
-    # Create a PYIO that processes all items and builds a result list
-    def process_all():
-        for item in items:
-            try:
-                effect = f(item)
-                result = effect.run()
+    def process_all() -> PYIO[E, list[B]]:
+        results: list[Any] = [None] * len(items)
+        entries = iter(enumerate(items))
+        lock = threading.Lock()
+
+        def take_next():
+            with lock:
+                return next(entries, None)
+
+        def worker() -> PYIO[E, None]:
+            # Keeps taking items until none are left, one effect at a time
+            def process(entry):
+                if entry is None:
+                    return PYIO.unit()
+                index, item = entry
+
+                def store(result):
+                    results[index] = result
+
+                effect = _throttled(throttle, _apply(f, item))
+                return effect.map(store).flat_map(lambda _: worker())
+
+            return PYIO.attempt(take_next).flat_map(process)
+
+        workers = min(max_concurrency or len(items), len(items))
+        forked: PYIO[E, list[Fiber[E, None]]] = PYIO.attempt(
+            lambda: [Fiber.start(worker()) for _ in range(workers)]
+        )
+        return forked.flat_map(Fiber.join_all).map(lambda _: results)
+
+    return PYIO.defer(process_all)
+
+
+def foreach_par_async(
+    items: list[A],
+    f: Callable[[A], PYIO[E, B]],
+    max_concurrency: Optional[int] = None,
+    throttle: Optional[RateLimiter] = None,
+) -> PYIO[E, list[B]]:
+    """
+    Applies the function f to each element in the list concurrently on an asyncio event loop and collects the
+    results.
+
+    The asyncio counterpart of `foreach_par`: items are processed by up to `max_concurrency` tasks, each running
+    its effects with `run_async()`. This suits effects built from `PYIO.from_awaitable`, which then all share one
+    thread. Run the returned effect with `run_async()` to use the caller's event loop. With `run()` or on a fiber
+    there is no loop of the caller's to use, and the items are processed by fibers as in `foreach_par` instead:
+    the runtime's background loop, which drives the timers of sleep and timeout, never runs them. Results keep the
+    order of the input list. If any effect fails, the entire operation fails with that error and the remaining
+    tasks are cancelled.
+
+    Args:
+        items: A list of items to process
+        f: A function that maps each item to a PYIO effect
+        max_concurrency: Maximum number of items processed at the same time (if None, all items are started at once)
+        throttle: Limits the rate at which items are started, see `ratelimit.throttle` (if None, no limit)
+
+    Returns:
+        A PYIO effect that produces a list of all results in input order if successful
+    """
+    _check_concurrency(max_concurrency)
+    if not items:
+        return PYIO.attempt(list)
+
+    async def process_all() -> list[B]:
+        results: list[Any] = [None] * len(items)
+        # Shared by all workers; safe without a lock since they all run on the same event loop
+        entries = iter(enumerate(items))
+
+        async def worker():
+            for index, item in entries:
+                result = await _throttled(throttle, _apply(f, item)).run_async()
                 if isinstance(result, Exception):
-                    return result, None
-                results.append(result)
-            except Exception as e:
-                return e, None
-        return None, results
+                    raise result
+                results[index] = result
+
+        workers = min(max_concurrency or len(items), len(items))
+        tasks = [asyncio.ensure_future(worker()) for _ in range(workers)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return results
+
+    return _AwaitedOrForked(
+        process_all, foreach_par(items, f, max_concurrency, throttle)
+    )
+
+
+class _AwaitedOrForked(FromAwaitable[E, A]):
+    """
+    An awaitable run directly on the caller's event loop by `run_async()`. The drivers without a loop of their own,
+    which would otherwise host it on the runtime's background loop, run the `fallback` effect on a fiber instead.
+    """
+
+    __slots__ = ("fallback",)
+
+    def __init__(
+        self, factory: Callable[[], Awaitable[A]], fallback: PYIO[E, A]
+    ) -> None:
+        super().__init__(factory)
+        self.fallback = fallback
 
-    return PYIO(process_all)
+    def register(
+        self, callback: Callable[[Any, Any], None]
+    ) -> Optional[Callable[[], object]]:
+        fiber = Fiber.start(self.fallback)
+        fiber._observe(callback)
+        return fiber._request_interruption
 
 
-def collect_all(effects: list[PYIO[E, Any]]) -> PYIO[E, list[Any]]:
+def foreach_process(
+    items: list[A], f: Callable[[A], B], chunksize: Optional[int] = None
+) -> PYIO[Exception | None, list[B]]:
+    """
+    Applies a CPU-bound function to each element in the list in the runtime's worker processes and collects the
+    results.
+
+    Items are shipped to the process pool in chunks, so the cost of sending work to another process is paid once
+    per chunk rather than once per item. Results keep the order of the input list. Like PYIO.attempt, an exception
+    raised by the function is captured in the error channel: the entire operation fails with the first error
+    reported and the chunks that have not started yet are cancelled.
+
+    Args:
+        items: A list of picklable items to process
+        f: A picklable function, i.e. one defined at module level, to apply to each item
+        chunksize: Number of items sent to a worker process at a time (if None, items are split into about four
+            chunks per worker process)
+
+    Returns:
+        A PYIO effect that produces a list of all results in input order if successful
+    """
+    if chunksize is not None and chunksize < 1:
+        raise ValueError(f"chunksize must be at least 1, got {chunksize}")
+    if not items:
+        return PYIO.attempt(list)
+
+    def register(callback):
+        runtime = Runtime()
+        processes = runtime.max_processes or os.cpu_count() or 1
+        size = chunksize or math.ceil(len(items) / (processes * 4))
+        futures = []
+        for start in range(0, len(items), size):
+            end = start + size
+            chunk = items[start:end]
+            futures.append(runtime.process_pool.submit(_apply_chunk, f, chunk))
+
+        lock = threading.Lock()
+        remaining = [len(futures)]
+        finished = [False]
+
+        def cancel_all():
+            for future in futures:
+                future.cancel()
+
+        def on_done(future):
+            error = None if future.cancelled() else future.exception()
+            with lock:
+                if finished[0] or future.cancelled():
+                    return
+                remaining[0] -= 1
+                finished[0] = error is not None or remaining[0] == 0
+                if not finished[0]:
+                    return
+            if error is not None:
+                cancel_all()
+                callback(error, None)
+            else:
+                callback(
+                    None, [result for future in futures for result in future.result()]
+                )
+
+        for future in futures:
+            future.add_done_callback(on_done)
+        return cancel_all
+
+    return PYIO.from_callback(register)
+
+
+def collect_all(
+    effects: list[PYIO[E, Any]], throttle: Optional[RateLimiter] = None
+) -> PYIO[E, list[Any]]:
     """
     Collects all effects into a single effect that produces a list of results.
 
     This function combines multiple PYIO effects into a single effect that, when run,
     will execute all effects in sequence and collect their results. If any effect
     fails, the entire operation fails with that error. The effects can return
-    different types of values.
+    different types of values. Like in foreach, lookups made through a DataSource
+    are batched and deduplicated.
 
     Args:
         effects: A list of PYIO effects to collect, potentially with different return types
+        throttle: Limits the rate at which effects are started, see `ratelimit.throttle` (if None, no limit)
 
     Returns:
         A PYIO effect that will produce a list of all results if all effects succeed,
         or fail with the first encountered error.
     """
-    results: list[Any] = []
     if not effects:
-        return PYIO.attempt(lambda: results)
+        return PYIO.attempt(list)
 
-    # Create a PYIO that processes all items and builds a result list
-    def process_all():
-        for effect in effects:
-            try:
-                result = effect.run()
-                if isinstance(result, Exception):
-                    return result, None
-                results.append(result)
-            except Exception as e:
-                return e, None
-        return None, results
+    return _batched([_throttled(throttle, effect) for effect in effects])
+
+
+def collect_all_par(
+    effects: list[PYIO[E, Any]],
+    max_concurrency: Optional[int] = None,
+    throttle: Optional[RateLimiter] = None,
+) -> PYIO[E, list[Any]]:
+    """
+    Runs independent effects concurrently and collects their results.
 
-    return PYIO(process_all)
+    The concurrent counterpart of `collect_all`, running the effects on up to `max_concurrency` fibers like
+    `foreach_par`. Results keep the order of the input list, whatever order the effects complete in. If any effect
+    fails, the entire operation fails with that error and the effects still running are interrupted.
+
+    Args:
+        effects: A list of PYIO effects to run, potentially with different return types
+        max_concurrency: Maximum number of effects running at the same time (if None, all are started at once)
+        throttle: Limits the rate at which effects are started, see `ratelimit.throttle` (if None, no limit)
+
+    Returns:
+        A PYIO effect that produces a list of all results in input order if successful
+    """
+    return foreach_par(effects, lambda effect: effect, max_concurrency, throttle)
 
 
 def filter_(items: list[A], f: Callable[[A], PYIO[E, bool]]) -> PYIO[E, list[A]]:
@@ -143,14 +371,14 @@ def filter_(items: list[A], f: Callable[[A], PYIO[E, bool]]) -> PYIO[E, list[A]]
             try:
                 result = f(item).run()
                 if isinstance(result, Exception):
-                    return result, None
+                    return PYIO.fail(result)
                 if result:
                     results.append(item)
             except Exception as e:
-                return e, None
-        return None, results
+                return PYIO.fail(e)
+        return PYIO.success(results)
 
-    return PYIO(process_all)
+    return PYIO.defer(process_all)
 
 
 def partition(
@@ -188,6 +416,223 @@ def partition(
                     successes.append(result)
             except Exception as e:
                 failures.append(e)
-        return None, (failures, successes)
+        return PYIO.success((failures, successes))
+
+    return PYIO.defer(process_all)
+
+
+def foreach_into(
+    items: Iterable[A],
+    f: Callable[[A], PYIO[E, B]],
+    sink: Callable[[list[B]], PYIO[E, Any]],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> PYIO[E, int]:
+    """
+    Streaming counterpart of `foreach`: applies the function f to each item and hands the results to a sink effect
+    in batches, instead of collecting them all in memory.
+
+    Items are pulled from the iterable one at a time when the effect runs, so any iterable works, including
+    generators and files larger than memory; only the current batch is held. A one-shot iterator such as a
+    generator is consumed by the first run. If any effect, the sink, or the iterable itself fails, the entire
+    operation fails with that error; batches already handed to the sink stay delivered.
+
+    Args:
+        items: An iterable of items to process
+        f: A function that maps each item to a PYIO effect
+        sink: A function that receives each batch of results and returns the effect that consumes it
+        batch_size: Maximum number of results per batch
+
+    Returns:
+        A PYIO effect that produces the number of results delivered to the sink if successful
+    """
+
+    def process(item: A, batch: list[Any]) -> Optional[Exception]:
+        result = f(item).run()
+        if isinstance(result, Exception):
+            return result
+        batch.append(result)
+        return None
 
-    return PYIO(process_all)
+    return _drain_into(items, process, sink, batch_size)
+
+
+def collect_all_into(
+    effects: Iterable[PYIO[E, Any]],
+    sink: Callable[[list[Any]], PYIO[E, Any]],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> PYIO[E, int]:
+    """
+    Streaming counterpart of `collect_all`: runs the effects in sequence and hands their results to a sink effect
+    in batches. The effects can come from a generator, so each one is only created when it is about to run.
+
+    Args:
+        effects: An iterable of PYIO effects to run
+        sink: A function that receives each batch of results and returns the effect that consumes it
+        batch_size: Maximum number of results per batch
+
+    Returns:
+        A PYIO effect that produces the number of results delivered to the sink if successful
+    """
+    return foreach_into(effects, lambda effect: effect, sink, batch_size)
+
+
+def filter_into(
+    items: Iterable[A],
+    f: Callable[[A], PYIO[E, bool]],
+    sink: Callable[[list[A]], PYIO[E, Any]],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> PYIO[E, int]:
+    """
+    Streaming counterpart of `filter_`: hands the items for which the predicate returns true to a sink effect in
+    batches. Items are pulled from the iterable one at a time and only the current batch is held in memory.
+
+    Args:
+        items: An iterable of items to filter
+        f: A function that takes an item and returns a PYIO effect containing a boolean
+        sink: A function that receives each batch of kept items and returns the effect that consumes it
+        batch_size: Maximum number of items per batch
+
+    Returns:
+        A PYIO effect that produces the number of items delivered to the sink if successful
+    """
+
+    def process(item: A, batch: list[A]) -> Optional[Exception]:
+        result = f(item).run()
+        if isinstance(result, Exception):
+            return result
+        if result:
+            batch.append(item)
+        return None
+
+    return _drain_into(items, process, sink, batch_size)
+
+
+def partition_into(
+    items: Iterable[A],
+    f: Callable[[A], PYIO[E, B]],
+    sink: Callable[[tuple[list[Exception], list[B]]], PYIO[Any, Any]],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> PYIO[Any, tuple[int, int]]:
+    """
+    Streaming counterpart of `partition`: processes every item and hands the outcomes to a sink effect in batches
+    of `(failures, successes)`, each covering up to `batch_size` items.
+
+    As with `partition`, failing items do not stop the operation. It only fails if the sink or the iterable itself
+    fails.
+
+    Args:
+        items: An iterable of items to process
+        f: A function that maps each item to a PYIO effect
+        sink: A function that receives each `(failures, successes)` batch and returns the effect that consumes it
+        batch_size: Maximum number of items per batch
+
+    Returns:
+        A PYIO effect that produces the total `(failure_count, success_count)` if successful
+    """
+    _check_batch_size(batch_size)
+
+    def process_all():
+        failure_count = success_count = 0
+        failures, successes = [], []
+
+        def deliver() -> Optional[Exception]:
+            nonlocal failure_count, success_count, failures, successes
+            error = _deliver(sink, (failures, successes))
+            failure_count += len(failures)
+            success_count += len(successes)
+            failures, successes = [], []
+            return error
+
+        try:
+            for item in items:
+                try:
+                    result = f(item).run()
+                except Exception as e:
+                    result = e
+                if isinstance(result, Exception):
+                    failures.append(result)
+                else:
+                    successes.append(result)
+                if len(failures) + len(successes) >= batch_size:
+                    error = deliver()
+                    if error is not None:
+                        return PYIO.fail(error)
+            if failures or successes:
+                error = deliver()
+                if error is not None:
+                    return PYIO.fail(error)
+        except Exception as e:
+            return PYIO.fail(e)
+        return PYIO.success((failure_count, success_count))
+
+    return PYIO.defer(process_all)
+
+
+def _throttled(limiter: Optional[RateLimiter], effect: PYIO[E, A]) -> PYIO[E, A]:
+    """Makes the effect wait for the limiter, if there is one, before it starts."""
+    return effect if limiter is None else limiter.limit(effect)
+
+
+def _apply(f: Callable[[A], PYIO[E, B]], item: A) -> PYIO[Any, Any]:
+    """Builds the effect for an item, turning an exception raised while building it into a failed effect."""
+    try:
+        return f(item)
+    except Exception as e:
+        return PYIO.fail(e)
+
+
+def _apply_chunk(f: Callable[[A], B], chunk: list[A]) -> list[B]:
+    """Runs in a worker process: applies the function to every item of a chunk."""
+    return [f(item) for item in chunk]
+
+
+def _drain_into(
+    items: Iterable[A],
+    process: Callable[[A, list[B]], Optional[Exception]],
+    sink: Callable[[list[B]], PYIO[Any, Any]],
+    batch_size: int,
+) -> PYIO[Any, int]:
+    """
+    Shared loop of the streaming functions: `process` handles one item, adding its output to the current batch or
+    returning an error, and every full batch is handed to the sink.
+    """
+    _check_batch_size(batch_size)
+
+    def process_all():
+        delivered = 0
+        batch = []
+        try:
+            for item in items:
+                error = process(item, batch)
+                if error is None and len(batch) >= batch_size:
+                    error = _deliver(sink, batch)
+                    delivered += len(batch)
+                    batch = []
+                if error is not None:
+                    return PYIO.fail(error)
+            if batch:
+                error = _deliver(sink, batch)
+                if error is not None:
+                    return PYIO.fail(error)
+                delivered += len(batch)
+        except Exception as e:
+            return PYIO.fail(e)
+        return PYIO.success(delivered)
+
+    return PYIO.defer(process_all)
+
+
+def _deliver(sink: Callable[[Any], PYIO[Any, Any]], batch: Any) -> Optional[Exception]:
+    """Runs the sink effect for a batch, returning its error if it fails."""
+    result = sink(batch).run()
+    return result if isinstance(result, Exception) else None
+
+
+def _check_batch_size(batch_size: int) -> None:
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+
+
+def _check_concurrency(max_concurrency: Optional[int]) -> None:
+    if max_concurrency is not None and max_concurrency < 1:
+        raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}")
@@ -0,0 +1,257 @@
+"""
+Fibers: lightweight, cooperatively scheduled executions of PYIO effects.
+
+A fiber is started with `PYIO.fork()` and runs on the runtime's worker pool. Fibers hand their worker thread
+back to the pool while they wait on other fibers or callbacks, and periodically during long computations,
+so many fibers can share a small number of threads.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import threading
+from typing import Any, Callable, Generic, Optional, TypeVar
+
+from .pyio import (
+    _ASYNC,
+    _AWAIT,
+    PYIO,
+    Async,
+    Fail,
+    FromAwaitable,
+    Succeed,
+    _finalize,
+    _interpret,
+    _is_masked,
+)
+from .runtime import Runtime
+
+A = TypeVar("A")
+E = TypeVar("E", bound=Exception | None)
+
+
+class FiberInterrupted(Exception):
+    """The error a fiber completes with when it is interrupted before finishing."""
+
+    pass
+
+
+class Fiber(Generic[E, A]):
+    """
+    Handle to an effect running concurrently on the runtime's worker pool.
+
+    All operations on a fiber are themselves effects, so they compose with the rest of a PYIO program.
+    Waiting on a fiber from another fiber suspends the waiter instead of blocking its thread.
+
+    Type Variables:
+        E: Error type of the forked effect
+        A: Return type of the forked effect
+    """
+
+    def __init__(self, effect: PYIO[E, A]):
+        self._lock = threading.Lock()
+        self._next: PYIO[Any, Any] = effect
+        self._stack: list[Any] = []
+        self._outcome: Optional[tuple[E, Optional[A]]] = None
+        self._observers: list[Callable[[Any, Any], None]] = []
+        self._interruption: Optional[FiberInterrupted] = None
+        # Identifies the Async node the fiber is currently suspended on, if any
+        self._suspension: Optional[object] = None
+        self._canceler: Optional[Callable[[], object]] = None
+        # Context variables, such as the current tracing span, as they were when the fiber last stopped running.
+        # Started from those of the code creating the fiber, so a forked effect continues its parent's context.
+        self._context = contextvars.copy_context()
+
+    @staticmethod
+    def start(effect: PYIO[E, A]) -> Fiber[E, A]:
+        """
+        Creates a fiber for the effect and schedules it on the runtime's worker pool.
+
+        Args:
+            effect: The effect the fiber will run
+        """
+        fiber: Fiber[E, A] = Fiber(effect)
+        fiber._schedule()
+        return fiber
+
+    def join(self) -> PYIO[E, A]:
+        """
+        Waits for the fiber to finish and completes with its outcome.
+        A failure of the fiber, including its interruption, is propagated through the error channel.
+        """
+        return Async(self._observe)
+
+    def poll(self) -> PYIO[None, Optional[tuple[Optional[E], Optional[A]]]]:
+        """
+        Checks on the fiber without waiting for it.
+        Produces None while the fiber is still running, or its `(error, value)` outcome once it has finished.
+        """
+        return PYIO.attempt(lambda: self._outcome)
+
+    def interrupt(self) -> PYIO[None, None]:
+        """
+        Interrupts the fiber and waits until it has stopped.
+
+        Interruption is cooperative: a running fiber stops at its next instruction, and a fiber waiting on a
+        callback is woken up immediately, cancelling the pending operation when possible. A blocking call inside
+        PYIO.attempt cannot be cut short, the fiber stops as soon as it returns. A fiber that is stopped this way
+        completes with FiberInterrupted; one that already finished keeps its outcome.
+        """
+        return (
+            PYIO.attempt(self._request_interruption)
+            .then(Async(self._observe))
+            .match(lambda _: None, lambda _: None)
+        )
+
+    @staticmethod
+    def join_all(fibers: list[Fiber[E, A]]) -> PYIO[E, list[A]]:
+        """
+        Waits for all fibers and collects their results in the order of the list.
+        Fails fast: as soon as any fiber fails, the others are interrupted and the effect fails with that error.
+        Interrupting the waiting fiber interrupts all of the joined fibers as well.
+
+        Args:
+            fibers: The fibers to wait for
+        """
+        if not fibers:
+            return PYIO.attempt(list)
+
+        def register(
+            callback: Callable[[Any, Optional[list[A]]], None],
+        ) -> Callable[[], None]:
+            lock = threading.Lock()
+            results: list[Any] = [None] * len(fibers)
+            remaining = [len(fibers)]
+            finished = [False]
+
+            def interrupt_all() -> None:
+                for fiber in fibers:
+                    fiber._request_interruption()
+
+            def observer(index: int) -> Callable[[Any, Any], None]:
+                def on_outcome(error: Any, value: Any) -> None:
+                    with lock:
+                        if finished[0]:
+                            return
+                        if error is None:
+                            results[index] = value
+                            remaining[0] -= 1
+                        finished[0] = error is not None or remaining[0] == 0
+                        if not finished[0]:
+                            return
+                    if error is not None:
+                        interrupt_all()
+                        callback(error, None)
+                    else:
+                        callback(None, results)
+
+                return on_outcome
+
+            for index, fiber in enumerate(fibers):
+                fiber._observe(observer(index))
+            return interrupt_all
+
+        return Async(register)
+
+    def is_done(self) -> bool:
+        """Returns True once the fiber has finished, successfully or not."""
+        return self._outcome is not None
+
+    def _schedule(self) -> None:
+        # Each turn runs in a fresh copy, since a context cannot be entered by two threads at once and the
+        # next turn may start before this one has returned
+        Runtime().executor.submit(self._context.copy().run, self._run)
+
+    def _run(self) -> None:
+        """Runs the fiber on the current worker thread until it completes, suspends or yields."""
+        try:
+            error, value, pending = _interpret(self._next, self._stack, self)
+        except Exception as e:
+            # Nobody up the stack could observe an exception escaping a worker thread, so it ends the fiber instead
+            _finalize(self._stack)
+            error, value, pending = e, None, None
+        self._context = contextvars.copy_context()
+        if pending is None:
+            self._complete(error, value)
+        elif pending._tag == _ASYNC or pending._tag == _AWAIT:
+            self._suspend(pending)
+        else:
+            # Out of budget: go to the back of the queue so other fibers get a turn
+            self._next = pending
+            self._schedule()
+
+    def _suspend(self, node: Async[Any, Any] | FromAwaitable[Any, Any]) -> None:
+        token = object()
+        with self._lock:
+            interrupted = self._interruption is not None and not _is_masked(self._stack)
+            if not interrupted:
+                self._suspension = token
+
+        def resume(error: Any, value: Any) -> None:
+            with self._lock:
+                if self._suspension is not token:
+                    return
+                self._suspension = None
+                self._canceler = None
+            self._resume(error, value)
+
+        if interrupted:
+            self._resume(None, None)
+            return
+        try:
+            canceler = node.register(resume)
+        except Exception as e:
+            resume(e, None)
+            return
+        with self._lock:
+            if self._suspension is token:
+                self._canceler = canceler
+                return
+            # Interrupted while `register` was running, so the canceler was not known yet
+            cancel_now = self._interruption is not None
+        if cancel_now and canceler is not None:
+            canceler()
+
+    def _resume(self, error: Any, value: Any) -> None:
+        self._next = Fail(error) if error is not None else Succeed(value)
+        self._schedule()
+
+    def _request_interruption(self) -> None:
+        with self._lock:
+            if self._outcome is not None or self._interruption is not None:
+                return
+            self._interruption = FiberInterrupted("Fiber was interrupted")
+            # A fiber waiting inside a finalizer or an uninterruptible region is left to finish waiting
+            suspended = self._suspension is not None and not _is_masked(self._stack)
+            if not suspended:
+                return
+            canceler = self._canceler
+            self._suspension = None
+            self._canceler = None
+        if canceler is not None:
+            canceler()
+        # The run loop notices the interruption before evaluating anything else
+        self._resume(None, None)
+
+    def _complete(self, error: Any, value: Any) -> None:
+        with self._lock:
+            self._outcome = (error, value)
+            observers, self._observers = self._observers, []
+        for observer in observers:
+            observer(error, value)
+
+    def _observe(self, callback: Callable[[Any, Any], None]) -> Callable[[], None]:
+        """Invokes the callback with the fiber's outcome once it is available."""
+        with self._lock:
+            outcome = self._outcome
+            if outcome is None:
+                self._observers.append(callback)
+        if outcome is not None:
+            callback(*outcome)
+
+        def cancel() -> None:
+            with self._lock:
+                if callback in self._observers:
+                    self._observers.remove(callback)
+
+        return cancel
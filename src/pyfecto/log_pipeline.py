@@ -0,0 +1,211 @@
+"""
+A non-blocking pipeline for the records logged by PYIO.log_* effects.
+
+Without a pipeline, a log effect formats its record and writes it to every sink on the thread running the effect,
+so a slow file or network sink adds its latency to the effect. With `Runtime(log_pipeline=LogPipeline())`, a log
+effect only appends the record to a bounded in-memory buffer; a background writer thread drains the buffer in
+batches and hands the records to the logger, which formats them and writes them to the sinks as usual. Records
+keep the time they were logged at, not the time they were written.
+"""
+
+from __future__ import annotations
+
+import atexit
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Optional
+
+from .runtime import LOGGER
+
+
+@dataclass(frozen=True)
+class LogPipelineStats:
+    """A snapshot of the counters of a LogPipeline."""
+
+    submitted: int
+    written: int
+    dropped: int
+    pending: int
+
+
+class _Record:
+    __slots__ = ("level", "message", "kwargs", "extra", "logged_at")
+
+    def __init__(
+        self,
+        level: str,
+        message: str,
+        kwargs: dict[str, Any],
+        extra: Optional[dict[str, Any]],
+    ):
+        self.level = level
+        self.message = message
+        self.kwargs = kwargs
+        self.extra = extra
+        self.logged_at = time.monotonic()
+
+
+class LogPipeline:
+    """
+    A bounded buffer of log records drained by a background writer.
+
+    When the buffer is full, the `overflow` policy decides what happens to a new record: "drop" discards it, so
+    logging never waits, and "block" makes the logging thread wait until the writer has made room, so no record is
+    lost. Dropped records are counted in `stats()`. The writer starts with the first record and is a daemon
+    thread; whatever is still buffered when the interpreter exits is written out first.
+
+    Usage:
+        runtime = Runtime(sinks=[{"sink": "app.log"}], log_pipeline=LogPipeline(capacity=50_000))
+    """
+
+    def __init__(
+        self, capacity: int = 10_000, batch_size: int = 256, overflow: str = "drop"
+    ):
+        """
+        Args:
+            capacity: Maximum number of records buffered
+            batch_size: Maximum number of records the writer takes from the buffer at a time
+            overflow: What to do with a record when the buffer is full: "drop" or "block"
+        """
+        if capacity < 1:
+            raise ValueError(f"capacity must be at least 1, got {capacity}")
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+        if overflow not in ("drop", "block"):
+            raise ValueError(f"unknown overflow policy {overflow!r}")
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.overflow = overflow
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._idle = threading.Condition(self._lock)
+        self._buffer: deque[_Record] = deque()
+        self._writing = 0
+        self._writer: Optional[threading.Thread] = None
+        self._closed = False
+        self._submitted = 0
+        self._written = 0
+        self._dropped = 0
+
+    def submit(
+        self,
+        level: str,
+        message: str,
+        kwargs: dict[str, Any],
+        extra: Optional[dict[str, Any]] = None,
+    ) -> bool:
+        """
+        Buffers a record for the writer.
+
+        Args:
+            level: Name of the log level, e.g. "INFO"
+            message: The message, formatted with `kwargs` when it is written
+            kwargs: Keyword arguments of the log call
+            extra: Context to bind to the record, like `logger.bind(**extra)`
+
+        Returns:
+            False if the record was dropped because the buffer was full or the pipeline is closed
+        """
+        record = _Record(level, message, kwargs, extra)
+        with self._lock:
+            while len(self._buffer) >= self.capacity and not self._closed:
+                if self.overflow == "drop":
+                    self._dropped += 1
+                    return False
+                self._not_full.wait()
+            if self._closed:
+                self._dropped += 1
+                return False
+            self._buffer.append(record)
+            self._submitted += 1
+            if self._writer is None:
+                self._start_writer()
+            self._not_empty.notify()
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until every buffered record has been written.
+
+        Args:
+            timeout: Maximum number of seconds to wait (if None, no limit)
+
+        Returns:
+            False if the timeout expired first
+        """
+        with self._lock:
+            return self._idle.wait_for(
+                lambda: not self._buffer and not self._writing, timeout
+            )
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """
+        Writes out the buffered records and stops the writer. Records submitted afterwards are dropped.
+
+        Args:
+            timeout: Maximum number of seconds to wait for the buffer to drain (if None, no limit)
+
+        Returns:
+            False if the timeout expired before everything was written
+        """
+        flushed = self.flush(timeout)
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        return flushed
+
+    def stats(self) -> LogPipelineStats:
+        """Returns the number of records submitted, written, dropped and still buffered."""
+        with self._lock:
+            return LogPipelineStats(
+                self._submitted, self._written, self._dropped, len(self._buffer)
+            )
+
+    def _start_writer(self) -> None:
+        """Starts the writer thread. Call under the lock."""
+        self._writer = threading.Thread(
+            target=self._drain, name="pyfecto-log-writer", daemon=True
+        )
+        self._writer.start()
+        atexit.register(self.close, 5.0)
+
+    def _drain(self) -> None:
+        while True:
+            with self._lock:
+                while not self._buffer and not self._closed:
+                    self._not_empty.wait()
+                if not self._buffer:
+                    return
+                count = min(self.batch_size, len(self._buffer))
+                batch = [self._buffer.popleft() for _ in range(count)]
+                self._writing = count
+                self._not_full.notify_all()
+            for record in batch:
+                _write(record)
+            with self._lock:
+                self._writing = 0
+                self._written += count
+                if not self._buffer:
+                    self._idle.notify_all()
+
+
+def _write(record: _Record) -> None:
+    # Backdate the record to when it was logged, since the sinks format it only now
+    delay = timedelta(seconds=time.monotonic() - record.logged_at)
+
+    def backdate(r: Any) -> None:
+        r["time"] -= delay
+
+    record_logger = LOGGER.patch(backdate)
+    if record.extra:
+        record_logger = record_logger.bind(**record.extra)
+    try:
+        record_logger.log(record.level, record.message, **record.kwargs)
+    except Exception:
+        # A record that cannot be formatted must not stop the writer
+        pass
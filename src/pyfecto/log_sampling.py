@@ -0,0 +1,173 @@
+"""
+Sampling of the records logged by PYIO.log_* effects and PYIO.log_span.
+
+An effect that logs once per item of a large collection can spend most of its time in the logger. With
+`Runtime(log_sampler=LogSampler(...))`, only a sample of those records is written: one in every `every` records of
+a level, at most `per_second` records of a level per second, or both. Errors are always logged by default, and
+so are log spans whose operation failed. A suppressed record costs a counter increment: its message is never
+built. Every `summary_interval` seconds, a summary record reports how many records of each level were suppressed.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from .pyio import _log
+from .runtime import _LEVEL_NUMBERS, _level_number
+
+
+@dataclass(frozen=True)
+class LogSamplerStats:
+    """A snapshot of the counters of a LogSampler."""
+
+    logged: int
+    suppressed: int
+
+
+class _LevelState:
+    __slots__ = ("seen", "tokens", "refilled_at", "suppressed")
+
+    def __init__(self, tokens: float, now: float):
+        self.seen = 0
+        self.tokens = tokens
+        self.refilled_at = now
+        self.suppressed = 0
+
+
+class LogSampler:
+    """
+    Decides which records of the log effects are written, separately for each level.
+
+    The 1-in-N policy (`every`) lets the first of every N records of a level through. The token bucket policy
+    (`per_second`) lets up to `burst` records of a level through at once and refills at `per_second` records a
+    second. When both are set, a record must pass both. Records at ERROR level and above, and log spans of failed
+    operations, bypass sampling unless `always_log_errors` is False.
+
+    Suppressed records are counted per level and reported in a summary record at that level, with the count
+    bound as `suppressed`, once `summary_interval` seconds have passed since the last summary. The check happens
+    when a log effect runs, and runtime.shutdown() reports what is left.
+
+    Usage:
+        runtime = Runtime(log_sampler=LogSampler(every=100, per_second=50))
+    """
+
+    def __init__(
+        self,
+        every: int = 1,
+        per_second: Optional[float] = None,
+        burst: Optional[int] = None,
+        always_log_errors: bool = True,
+        summary_interval: float = 60.0,
+    ):
+        """
+        Args:
+            every: Write one in every `every` records of a level
+            per_second: Maximum rate of records of a level written, per second (if None, no limit)
+            burst: Number of records of a level that can be written at once under the rate limit (if None,
+                `per_second` rounded up)
+            always_log_errors: Whether records at ERROR level and above, and log spans of failed operations,
+                are always written
+            summary_interval: Minimum number of seconds between summaries of the suppressed records
+        """
+        if every < 1:
+            raise ValueError(f"every must be at least 1, got {every}")
+        if per_second is not None and per_second <= 0:
+            raise ValueError(f"per_second must be positive, got {per_second}")
+        if burst is not None and burst < 1:
+            raise ValueError(f"burst must be at least 1, got {burst}")
+        if summary_interval <= 0:
+            raise ValueError(
+                f"summary_interval must be positive, got {summary_interval}"
+            )
+        self.every = every
+        self.per_second = per_second
+        if burst is None and per_second is not None:
+            burst = math.ceil(per_second)
+        self.burst = burst
+        self.always_log_errors = always_log_errors
+        self.summary_interval = summary_interval
+        self._lock = threading.Lock()
+        self._levels: dict[str, _LevelState] = {}
+        self._logged = 0
+        self._suppressed = 0
+        self._summarized_at = time.monotonic()
+
+    def allow(self, level: str, failed: bool = False) -> bool:
+        """
+        Decides whether a record is written, and counts it as logged or suppressed.
+
+        Args:
+            level: Name of the log level, e.g. "INFO"
+            failed: Whether the record reports a failure, like the log span of a failed operation
+
+        Returns:
+            True if the record should be written
+        """
+        if self.always_log_errors and (
+            failed or _level_number(level) >= _LEVEL_NUMBERS["ERROR"]
+        ):
+            with self._lock:
+                self._logged += 1
+            return True
+        now = time.monotonic()
+        due: list[tuple[str, int]] = []
+        with self._lock:
+            state = self._levels.get(level)
+            if state is None:
+                state = self._levels[level] = _LevelState(self.burst or 0, now)
+            state.seen += 1
+            allowed = (state.seen - 1) % self.every == 0
+            if allowed and self.per_second is not None:
+                state.tokens = min(
+                    self.burst or 0,
+                    state.tokens + (now - state.refilled_at) * self.per_second,
+                )
+                state.refilled_at = now
+                allowed = state.tokens >= 1
+                if allowed:
+                    state.tokens -= 1
+            if allowed:
+                self._logged += 1
+            else:
+                state.suppressed += 1
+                self._suppressed += 1
+            if now - self._summarized_at >= self.summary_interval:
+                due, elapsed = self._take_summary(now)
+        if due:
+            _report(due, elapsed)
+        return allowed
+
+    def flush(self) -> None:
+        """Writes the summary of the records suppressed since the last one now, if any were."""
+        with self._lock:
+            due, elapsed = self._take_summary(time.monotonic())
+        _report(due, elapsed)
+
+    def stats(self) -> LogSamplerStats:
+        """Returns the number of records written and suppressed so far."""
+        with self._lock:
+            return LogSamplerStats(self._logged, self._suppressed)
+
+    def _take_summary(self, now: float) -> tuple[list[tuple[str, int]], float]:
+        """Collects and resets the suppressed counts of each level. Call under the lock."""
+        due = []
+        for level, state in self._levels.items():
+            if state.suppressed:
+                due.append((level, state.suppressed))
+                state.suppressed = 0
+        elapsed = now - self._summarized_at
+        self._summarized_at = now
+        return due, elapsed
+
+
+def _report(due: list[tuple[str, int]], elapsed: float) -> None:
+    for level, suppressed in due:
+        message = (
+            f"Sampling suppressed {suppressed} {level} log records "
+            f"in the last {elapsed:.1f}s"
+        )
+        _log(level, message, {}, {"suppressed": suppressed})
@@ -0,0 +1,618 @@
+"""
+Metrics: counters, gauges and latency histograms, exported in the Prometheus text format.
+
+Metrics live in a MetricsRegistry. The runtime has one, `Runtime().metrics`, which `effect.timed(name)` and
+`effect.counted(name)` record to, creating the metric on first use:
+
+    fetch_user = api.get_user(user_id).timed("user_fetch_seconds").counted("user_fetches_total")
+
+Recording is built to stay cheap when many fibers record at once. Counters and histograms keep one shard per
+recording thread, which only that thread writes, so recording takes no lock; reading a metric sums the shards.
+Histograms are HDR-style: values are counted in buckets whose width grows with the value, so any quantile is
+reported within a fixed relative error whatever the range of values, in a bounded amount of memory.
+
+`registry.to_prometheus()` renders every metric in the Prometheus text exposition format, `write_prometheus(path)`
+writes it to a file (e.g. for node_exporter's textfile collector) and `serve(port)` exposes it on /metrics.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional, TypeVar, Union
+
+from .pyio import PYIO, Defer, Ensuring, Sync
+from .runtime import Runtime
+
+A = TypeVar("A")
+E = TypeVar("E", bound=Exception | None)
+M = TypeVar("M", bound="Metric")
+
+_NAME = re.compile(r"[a-zA-Z_:][a-zA-Z0-9_:]*")
+_LABEL_NAME = re.compile(r"[a-zA-Z_][a-zA-Z0-9_]*")
+
+
+class Metric(ABC):
+    """
+    Base class of the metrics: a name, a description and constant labels.
+
+    Attributes:
+        name: Name the metric is exported under
+        description: Help text of the metric
+        labels: Label names and values that distinguish this metric from others of the same name
+    """
+
+    kind = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        description: str = "",
+        labels: Optional[dict[str, str]] = None,
+    ):
+        if not _NAME.fullmatch(name):
+            raise ValueError(f"invalid metric name {name!r}")
+        for label in labels or {}:
+            if not _LABEL_NAME.fullmatch(label) or label.startswith("__"):
+                raise ValueError(f"invalid label name {label!r}")
+        self.name = name
+        self.description = description
+        self.labels = dict(labels or {})
+
+    @abstractmethod
+    def _samples(self) -> list[tuple[str, dict[str, str], float]]:
+        """The (name suffix, extra labels, value) of each line this metric is exported as."""
+        pass
+
+
+class Counter(Metric):
+    """
+    A value that only goes up, such as a number of requests served.
+
+    Usage:
+        requests = registry.counter("requests_total", "Requests served")
+        requests.inc()
+    """
+
+    kind = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        description: str = "",
+        labels: Optional[dict[str, str]] = None,
+    ):
+        super().__init__(name, description, labels)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cells: list[list[float]] = []
+
+    def inc(self, amount: float = 1) -> None:
+        """
+        Adds to the counter.
+
+        Args:
+            amount: How much to add, not negative
+        """
+        if amount < 0:
+            raise ValueError(f"a counter cannot decrease, got {amount}")
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._local.cell = [0]
+            with self._lock:
+                self._cells.append(cell)
+        cell[0] += amount
+
+    @property
+    def value(self) -> float:
+        """The total of the counter."""
+        with self._lock:
+            cells = list(self._cells)
+        return sum(cell[0] for cell in cells)
+
+    def count(self, effect: PYIO[E, A]) -> PYIO[E, A]:
+        """
+        Wraps an effect so that each of its runs adds one to the counter once it completes, fails or is
+        interrupted.
+
+        Args:
+            effect: The effect to count
+        """
+        return Ensuring(effect, Sync(self.inc))
+
+    def _samples(self) -> list[tuple[str, dict[str, str], float]]:
+        return [("", {}, self.value)]
+
+
+class Gauge(Metric):
+    """
+    A value that goes up and down, such as a number of open connections.
+
+    Usage:
+        connections = registry.gauge("open_connections", "Connections currently open")
+        connections.inc()
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        description: str = "",
+        labels: Optional[dict[str, str]] = None,
+    ):
+        super().__init__(name, description, labels)
+        self._lock = threading.Lock()
+        self._value: float = 0
+
+    def set(self, value: float) -> None:
+        """Sets the gauge to the given value."""
+        self._value = value
+
+    def inc(self, amount: float = 1) -> None:
+        """Adds to the gauge."""
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        """Subtracts from the gauge."""
+        with self._lock:
+            self._value -= amount
+
+    @property
+    def value(self) -> float:
+        """The current value of the gauge."""
+        return self._value
+
+    def track(self, effect: PYIO[E, A]) -> PYIO[E, A]:
+        """
+        Wraps an effect so that the gauge counts its runs in progress: it goes up when a run starts and back
+        down when it completes, fails or is interrupted.
+
+        Args:
+            effect: The effect to track
+        """
+
+        def start() -> PYIO[E, A]:
+            self.inc()
+            return Ensuring(effect, Sync(self.dec))
+
+        return Defer(start)
+
+    def _samples(self) -> list[tuple[str, dict[str, str], float]]:
+        return [("", {}, self._value)]
+
+
+@dataclass(frozen=True)
+class HistogramSnapshot:
+    """The values recorded in a Histogram at one point in time."""
+
+    count: int
+    sum: float
+    min: float
+    max: float
+    quantiles: dict[float, float]
+
+
+class _HistogramShard:
+    __slots__ = ("counts", "zeros", "sum", "min", "max")
+
+    def __init__(self) -> None:
+        self.counts: dict[int, int] = {}
+        self.zeros = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+
+class Histogram(Metric):
+    """
+    The distribution of recorded values, such as request latencies in seconds, summarized by quantiles.
+
+    Values are counted in buckets that split each power of two into the same number of equal parts, the way an
+    HDR histogram does, so a quantile is within 10^-significant_figures of its true value, relative to it, for
+    values of any magnitude. The histogram is exported as a Prometheus summary: one line per quantile in
+    `quantiles`, plus the sum and count of the recorded values.
+
+    Usage:
+        latency = registry.histogram("query_seconds", "Query latency")
+        latency.record(0.012)
+        latency.quantile(0.99)
+    """
+
+    kind = "summary"
+
+    def __init__(
+        self,
+        name: str,
+        description: str = "",
+        labels: Optional[dict[str, str]] = None,
+        significant_figures: int = 2,
+        quantiles: tuple[float, ...] = (0.5, 0.9, 0.99, 0.999),
+    ):
+        """
+        Args:
+            name: Name the histogram is exported under
+            description: Help text of the histogram
+            labels: Label names and values that distinguish this histogram from others of the same name
+            significant_figures: Number of significant decimal digits the quantiles are accurate to, 1 to 5
+            quantiles: The quantiles exported, between 0 and 1
+        """
+        super().__init__(name, description, labels)
+        if not 1 <= significant_figures <= 5:
+            raise ValueError(
+                f"significant_figures must be between 1 and 5, got {significant_figures}"
+            )
+        for q in quantiles:
+            if not 0 <= q <= 1:
+                raise ValueError(f"quantiles must be between 0 and 1, got {q}")
+        self.significant_figures = significant_figures
+        self.quantiles = tuple(quantiles)
+        # Buckets per power of two, so that a bucket is at most 10^-significant_figures of its lower bound wide
+        self._sub_buckets = 2 ** math.ceil(math.log2(10**significant_figures))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: list[_HistogramShard] = []
+
+    def record(self, value: float) -> None:
+        """
+        Records a value.
+
+        Args:
+            value: The value, not negative
+        """
+        if not value >= 0:
+            raise ValueError(f"a histogram records values from 0 up, got {value}")
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _HistogramShard()
+            with self._lock:
+                self._shards.append(shard)
+        if value == 0:
+            shard.zeros += 1
+        else:
+            key = self._bucket(value)
+            shard.counts[key] = shard.counts.get(key, 0) + 1
+        shard.sum += value
+        if value < shard.min:
+            shard.min = value
+        if value > shard.max:
+            shard.max = value
+
+    def time(self, effect: PYIO[E, A]) -> PYIO[E, A]:
+        """
+        Wraps an effect so that the duration of each of its runs, in seconds, is recorded once it completes,
+        fails or is interrupted.
+
+        Args:
+            effect: The effect to time
+        """
+
+        def start() -> PYIO[E, A]:
+            started = time.perf_counter()
+            return Ensuring(
+                effect, Sync(lambda: self.record(time.perf_counter() - started))
+            )
+
+        return Defer(start)
+
+    @property
+    def count(self) -> int:
+        """Number of values recorded."""
+        return self.snapshot(()).count
+
+    def quantile(self, q: float) -> float:
+        """
+        The value below which the given fraction of the recorded values fall, or NaN if none were recorded.
+
+        Args:
+            q: The quantile, between 0 and 1, e.g. 0.99
+        """
+        return self.snapshot((q,)).quantiles[q]
+
+    def snapshot(
+        self, quantiles: Optional[tuple[float, ...]] = None
+    ) -> HistogramSnapshot:
+        """
+        The count, sum, extremes and quantiles of the values recorded so far.
+
+        Args:
+            quantiles: The quantiles to compute (if None, those the histogram exports)
+        """
+        with self._lock:
+            shards = list(self._shards)
+        counts: dict[int, int] = {}
+        zeros = 0
+        total = 0.0
+        low, high = math.inf, -math.inf
+        for shard in shards:
+            for key, n in dict(shard.counts).items():
+                counts[key] = counts.get(key, 0) + n
+            zeros += shard.zeros
+            total += shard.sum
+            low = min(low, shard.min)
+            high = max(high, shard.max)
+        count = zeros + sum(counts.values())
+        buckets = sorted(counts.items())
+        values = {
+            q: self._value_at(q, count, zeros, buckets, low, high)
+            for q in (self.quantiles if quantiles is None else quantiles)
+        }
+        if not count:
+            low = high = math.nan
+        return HistogramSnapshot(count, total, low, high, values)
+
+    def _bucket(self, value: float) -> int:
+        # value = mantissa * 2^exponent with 0.5 <= mantissa < 1; split [0.5, 1) into sub-buckets
+        mantissa, exponent = math.frexp(value)
+        sub = int((mantissa - 0.5) * 2 * self._sub_buckets)
+        return exponent * self._sub_buckets + sub
+
+    def _upper_bound(self, key: int) -> float:
+        exponent, sub = divmod(key, self._sub_buckets)
+        return math.ldexp(0.5 + (sub + 1) / (2 * self._sub_buckets), exponent)
+
+    def _value_at(
+        self,
+        q: float,
+        count: int,
+        zeros: int,
+        buckets: list[tuple[int, int]],
+        low: float,
+        high: float,
+    ) -> float:
+        if not count:
+            return math.nan
+        rank = max(1, math.ceil(q * count))
+        if rank <= zeros:
+            return 0.0
+        seen = zeros
+        for key, n in buckets:
+            seen += n
+            if seen >= rank:
+                # The highest value the bucket stands for, kept within the values actually recorded
+                return min(max(self._upper_bound(key), low), high)
+        return high
+
+    def _samples(self) -> list[tuple[str, dict[str, str], float]]:
+        snapshot = self.snapshot()
+        samples: list[tuple[str, dict[str, str], float]] = [
+            ("", {"quantile": _format_value(q)}, value)
+            for q, value in snapshot.quantiles.items()
+        ]
+        samples.append(("_sum", {}, snapshot.sum))
+        samples.append(("_count", {}, snapshot.count))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    The metrics of an application, by name and labels, and their export in the Prometheus text format.
+
+    Asking for a metric that already exists returns it, so every part of the application can look its metrics up
+    by name. A name can only be used for one kind of metric.
+
+    Usage:
+        registry = Runtime().metrics
+        registry.counter("jobs_total", "Jobs processed", labels={"queue": "emails"}).inc()
+        server = registry.serve(9464)
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: dict[tuple[str, tuple[tuple[str, str], ...]], Metric] = {}
+
+    def counter(
+        self,
+        name: str,
+        description: str = "",
+        labels: Optional[dict[str, str]] = None,
+    ) -> Counter:
+        """
+        The counter with the given name and labels, created if it does not exist yet.
+
+        Args:
+            name: Name of the counter, e.g. "requests_total"
+            description: Help text, used if the counter is created
+            labels: Label names and values of the counter
+        """
+        return self._get(
+            Counter, name, labels, lambda: Counter(name, description, labels)
+        )
+
+    def gauge(
+        self,
+        name: str,
+        description: str = "",
+        labels: Optional[dict[str, str]] = None,
+    ) -> Gauge:
+        """
+        The gauge with the given name and labels, created if it does not exist yet.
+
+        Args:
+            name: Name of the gauge, e.g. "open_connections"
+            description: Help text, used if the gauge is created
+            labels: Label names and values of the gauge
+        """
+        return self._get(Gauge, name, labels, lambda: Gauge(name, description, labels))
+
+    def histogram(
+        self,
+        name: str,
+        description: str = "",
+        labels: Optional[dict[str, str]] = None,
+        significant_figures: int = 2,
+        quantiles: tuple[float, ...] = (0.5, 0.9, 0.99, 0.999),
+    ) -> Histogram:
+        """
+        The histogram with the given name and labels, created if it does not exist yet.
+
+        Args:
+            name: Name of the histogram, e.g. "request_seconds"
+            description: Help text, used if the histogram is created
+            labels: Label names and values of the histogram
+            significant_figures: Accuracy of the quantiles, used if the histogram is created
+            quantiles: The quantiles exported, used if the histogram is created
+        """
+        return self._get(
+            Histogram,
+            name,
+            labels,
+            lambda: Histogram(
+                name, description, labels, significant_figures, quantiles
+            ),
+        )
+
+    def metrics(self) -> list[Metric]:
+        """Every metric of the registry, in the order they were created."""
+        with self._lock:
+            return list(self._metrics.values())
+
+    def to_prometheus(self) -> str:
+        """Renders every metric in the Prometheus text exposition format, version 0.0.4."""
+        families: dict[str, list[Metric]] = {}
+        for metric in self.metrics():
+            families.setdefault(metric.name, []).append(metric)
+        lines = []
+        for name, members in families.items():
+            description = next((m.description for m in members if m.description), "")
+            if description:
+                lines.append(f"# HELP {name} {_escape(description)}")
+            lines.append(f"# TYPE {name} {members[0].kind}")
+            for metric in members:
+                for suffix, extra, value in metric._samples():
+                    labels = _format_labels({**metric.labels, **extra})
+                    lines.append(f"{name}{suffix}{labels} {_format_value(value)}")
+        return "".join(line + "\n" for line in lines)
+
+    def write_prometheus(self, path: str) -> None:
+        """
+        Writes every metric to a file in the Prometheus text format. The file is replaced at once, so a
+        collector reading it never sees half of it.
+
+        Args:
+            path: The file to write, e.g. "/var/lib/node_exporter/textfile/app.prom"
+        """
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            file.write(self.to_prometheus())
+        os.replace(temporary, path)
+
+    def serve(self, port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        Serves the metrics in the Prometheus text format on http://host:port/metrics, from a background daemon
+        thread.
+
+        Args:
+            port: Port to listen on (0 picks a free one, see the returned server's server_port)
+            host: Address to listen on
+
+        Returns:
+            The server; call its shutdown() method to stop it
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header(
+                    "Content-Type", "text/plain; version=0.0.4; charset=utf-8"
+                )
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(
+            target=server.serve_forever, name="pyfecto-metrics", daemon=True
+        ).start()
+        return server
+
+    def _get(
+        self,
+        kind: type[M],
+        name: str,
+        labels: Optional[dict[str, str]],
+        create: Callable[[], M],
+    ) -> M:
+        key = (name, tuple(sorted((labels or {}).items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    for other in self._metrics.values():
+                        if other.name == name and type(other) is not kind:
+                            raise ValueError(
+                                f"{name!r} is already a {type(other).__name__.lower()}"
+                            )
+                    metric = self._metrics[key] = create()
+        if not isinstance(metric, kind):
+            raise ValueError(f"{name!r} is already a {type(metric).__name__.lower()}")
+        return metric
+
+
+def timed(effect: PYIO[E, A], metric: Union[Histogram, str]) -> PYIO[E, A]:
+    """
+    Records the duration of each run of the effect, in seconds, in a histogram.
+
+    Args:
+        effect: The effect to time
+        metric: The histogram, or the name of a histogram of the runtime's registry
+    """
+    if isinstance(metric, Histogram):
+        return metric.time(effect)
+    return Defer(lambda: Runtime().metrics.histogram(metric).time(effect))
+
+
+def counted(effect: PYIO[E, A], metric: Union[Counter, str]) -> PYIO[E, A]:
+    """
+    Counts the runs of the effect in a counter.
+
+    Args:
+        effect: The effect to count
+        metric: The counter, or the name of a counter of the runtime's registry
+    """
+    if isinstance(metric, Counter):
+        return metric.count(effect)
+    return Defer(lambda: Runtime().metrics.counter(metric).count(effect))
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = (
+        '{}="{}"'.format(name, _escape(str(value)).replace('"', '\\"'))
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer() and abs(value) < 2**53:
+        return str(int(value))
+    return repr(float(value))
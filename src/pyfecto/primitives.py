@@ -0,0 +1,501 @@
+"""
+Concurrency primitives as effects: Ref, Promise, Semaphore and Queue.
+
+All operations return PYIO effects. Operations that may have to wait, such as taking from an empty queue, suspend
+the waiting fiber without holding a worker thread, and under run_async() wait without blocking the event loop.
+Waiting can be interrupted, e.g. by PYIO.timeout, without losing a permit or an item on the way.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import Any, Callable, Generic, Optional, TypeVar, cast
+
+from .pyio import (
+    PYIO,
+    Async,
+    Defer,
+    Ensuring,
+    Interruptible,
+    Succeed,
+    Sync,
+    Uninterruptible,
+)
+
+A = TypeVar("A")
+B = TypeVar("B")
+E = TypeVar("E", bound=Exception | None)
+
+
+class Ref(Generic[A]):
+    """
+    A mutable reference shared between effects, updated atomically.
+
+    The functions passed to update and modify run while the reference is locked, so they must be quick and free
+    of side effects.
+
+    Type Variables:
+        A: Type of the value held by the reference
+    """
+
+    def __init__(self, value: A):
+        """
+        Args:
+            value: The initial value
+        """
+        self._value = value
+        self._lock = threading.Lock()
+
+    def get(self) -> PYIO[None, A]:
+        """Reads the current value."""
+        return PYIO.attempt(lambda: self._value)
+
+    def set(self, value: A) -> PYIO[None, None]:
+        """
+        Replaces the value.
+
+        Args:
+            value: The new value
+        """
+        return self.modify(lambda _: (None, value))
+
+    def update(self, f: Callable[[A], A]) -> PYIO[None, None]:
+        """
+        Atomically replaces the value with the result of applying f to it.
+
+        Args:
+            f: Computes the new value from the current one
+        """
+        return self.modify(lambda current: (None, f(current)))
+
+    def update_and_get(self, f: Callable[[A], A]) -> PYIO[None, A]:
+        """
+        Atomically updates the value and produces the new value.
+
+        Args:
+            f: Computes the new value from the current one
+        """
+
+        def both(current: A) -> tuple[A, A]:
+            new = f(current)
+            return new, new
+
+        return self.modify(both)
+
+    def modify(self, f: Callable[[A], tuple[B, A]]) -> PYIO[None, B]:
+        """
+        Atomically replaces the value and produces a result computed along the way, e.g. to take the next id from
+        a counter: `counter.modify(lambda n: (n, n + 1))`.
+
+        Args:
+            f: Maps the current value to a `(result, new value)` pair
+        """
+
+        def run() -> B:
+            with self._lock:
+                result, self._value = f(self._value)
+                return result
+
+        return PYIO.attempt(run)
+
+
+class Promise(Generic[E, A]):
+    """
+    A value or error that is set exactly once and can be waited on by any number of effects.
+
+    Type Variables:
+        E: Error type the promise can be failed with
+        A: Type of the value the promise can be completed with
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._outcome: Optional[tuple[Any, Any]] = None
+        self._waiters: list[Callable[[Any, Any], None]] = []
+
+    def succeed(self, value: A) -> PYIO[None, bool]:
+        """
+        Completes the promise with a value, waking up everyone waiting on it.
+        Produces False, and changes nothing, if the promise was already completed.
+
+        Args:
+            value: The value to complete the promise with
+        """
+        return PYIO.attempt(lambda: self._complete(None, value))
+
+    def fail(self, error: Exception) -> PYIO[None, bool]:
+        """
+        Completes the promise with an error, which every waiter then fails with.
+        Produces False, and changes nothing, if the promise was already completed.
+
+        Args:
+            error: The error to complete the promise with
+        """
+        return PYIO.attempt(lambda: self._complete(error, None))
+
+    def wait(self) -> PYIO[E, A]:
+        """Waits until the promise is completed and then succeeds or fails like it."""
+
+        def register(callback: Callable[[Any, Any], None]) -> Callable[[], None]:
+            with self._lock:
+                outcome = self._outcome
+                if outcome is None:
+                    self._waiters.append(callback)
+            if outcome is not None:
+                callback(*outcome)
+
+            def cancel() -> None:
+                with self._lock:
+                    if callback in self._waiters:
+                        self._waiters.remove(callback)
+
+            return cancel
+
+        return Async(register)
+
+    def is_done(self) -> PYIO[None, bool]:
+        """Checks whether the promise has been completed, without waiting."""
+        return PYIO.attempt(lambda: self._outcome is not None)
+
+    def _complete(self, error: Any, value: Any) -> bool:
+        with self._lock:
+            if self._outcome is not None:
+                return False
+            self._outcome = (error, value)
+            waiters, self._waiters = self._waiters, []
+        for callback in waiters:
+            callback(error, value)
+        return True
+
+
+class Semaphore:
+    """
+    Limits how many effects use something at the same time, e.g. connections to a rate sensitive service.
+
+    Permits are handed out in the order they were asked for. An effect waiting for permits does not hold a
+    thread, and permits are always given back, including when the effect fails or is interrupted.
+    """
+
+    def __init__(self, permits: int):
+        """
+        Args:
+            permits: Number of permits available
+        """
+        if permits < 1:
+            raise ValueError(f"permits must be at least 1, got {permits}")
+        self._lock = threading.Lock()
+        self.permits = permits
+        self._available = permits
+        self._waiters: deque[_Waiter] = deque()
+
+    def available(self) -> PYIO[None, int]:
+        """Produces the number of permits not currently taken."""
+        return PYIO.attempt(lambda: self._available)
+
+    def with_permits(self, n: int, effect: PYIO[E, A]) -> PYIO[E, A]:
+        """
+        Runs the effect once `n` permits are available, holding them until it completes.
+
+        Args:
+            n: Number of permits the effect needs, at most the number the semaphore has
+            effect: The effect to run
+        """
+        if n < 1:
+            raise ValueError(f"n must be at least 1, got {n}")
+        if n > self.permits:
+            # It could never be granted, and would hold up every request queued behind it
+            raise ValueError(
+                f"n must be at most the {self.permits} permits of the semaphore, got {n}"
+            )
+
+        def try_grant(waiter: _Waiter, woken: list[_Waiter]) -> bool:
+            # Later requests never overtake the ones already waiting
+            if self._waiters or self._available < n:
+                return False
+            self._available -= n
+            return True
+
+        # A waiter leaving the head of the line may let the smaller requests behind it through
+        acquire = _wait_for(
+            self._lock,
+            self._waiters,
+            n,
+            try_grant,
+            lambda _: self._release(n),
+            lambda: self._release(0),
+        )
+        release: PYIO[None, None] = Sync(lambda: self._release(n))
+        return cast(
+            PYIO[E, A],
+            Uninterruptible(acquire.then(Ensuring(Interruptible(effect), release))),
+        )
+
+    def with_permit(self, effect: PYIO[E, A]) -> PYIO[E, A]:
+        """
+        Runs the effect once a permit is available, holding it until the effect completes.
+
+        Args:
+            effect: The effect to run
+        """
+        return self.with_permits(1, effect)
+
+    def _release(self, n: int) -> None:
+        woken: list[_Waiter] = []
+        with self._lock:
+            self._available += n
+            while self._waiters and self._waiters[0].request <= self._available:
+                waiter = self._waiters.popleft()
+                self._available -= waiter.request
+                _grant(waiter, None, woken)
+        _wake(woken)
+
+
+class Queue(Generic[A]):
+    """
+    A first in, first out queue for handing values from producing to consuming effects.
+
+    What happens when a producer offers to a full queue depends on how the queue was created: a bounded queue
+    makes the producer wait for room (back-pressure), a sliding queue drops its oldest value, and a dropping queue
+    rejects the new one. Consumers taking from an empty queue wait for a value. Waiting producers and consumers
+    are served in order and do not hold a thread.
+
+    Type Variables:
+        A: Type of the queued values
+    """
+
+    def __init__(self, capacity: Optional[int], strategy: str = "bounded"):
+        """
+        Prefer the bounded, sliding, dropping and unbounded constructors.
+
+        Args:
+            capacity: Maximum number of values held (None for no limit)
+            strategy: What offer does when the queue is full: "bounded", "sliding" or "dropping"
+        """
+        if capacity is not None and capacity < 1:
+            raise ValueError(f"capacity must be at least 1, got {capacity}")
+        if strategy not in ("bounded", "sliding", "dropping"):
+            raise ValueError(f"unknown strategy {strategy!r}")
+        self.capacity = capacity
+        self._strategy = strategy
+        self._lock = threading.Lock()
+        self._items: deque[A] = deque()
+        self._takers: deque[_Waiter] = deque()
+        # Producers waiting for room in a full bounded queue, each with the value it offers
+        self._putters: deque[_Waiter] = deque()
+
+    @staticmethod
+    def bounded(capacity: int) -> Queue[A]:
+        """
+        A queue holding up to `capacity` values; offering to a full queue waits until a value is taken.
+
+        Args:
+            capacity: Maximum number of values held
+        """
+        return Queue(capacity, "bounded")
+
+    @staticmethod
+    def sliding(capacity: int) -> Queue[A]:
+        """
+        A queue keeping the latest `capacity` values; offering to a full queue drops the oldest value.
+
+        Args:
+            capacity: Maximum number of values held
+        """
+        return Queue(capacity, "sliding")
+
+    @staticmethod
+    def dropping(capacity: int) -> Queue[A]:
+        """
+        A queue holding up to `capacity` values; offering to a full queue drops the offered value.
+
+        Args:
+            capacity: Maximum number of values held
+        """
+        return Queue(capacity, "dropping")
+
+    @staticmethod
+    def unbounded() -> Queue[A]:
+        """A queue without a size limit, whose producers never wait."""
+        return Queue(None)
+
+    def offer(self, item: A) -> PYIO[None, bool]:
+        """
+        Adds a value to the queue. Produces False if a dropping queue was full and the value was discarded.
+
+        Args:
+            item: The value to add
+        """
+
+        def try_offer() -> PYIO[None, bool]:
+            woken: list[_Waiter] = []
+            with self._lock:
+                if self._takers:
+                    _grant(self._takers.popleft(), item, woken)
+                    accepted: Optional[bool] = True
+                elif self.capacity is None or len(self._items) < self.capacity:
+                    self._items.append(item)
+                    accepted = True
+                elif self._strategy == "sliding":
+                    self._items.popleft()
+                    self._items.append(item)
+                    accepted = True
+                elif self._strategy == "dropping":
+                    accepted = False
+                else:
+                    accepted = None
+            _wake(woken)
+            if accepted is not None:
+                return _TRUE if accepted else _FALSE
+            return self._wait_for_room(item)
+
+        return Defer(try_offer)
+
+    def take(self) -> PYIO[None, A]:
+        """Removes and produces the oldest value, waiting for one if the queue is empty."""
+
+        def try_grant(waiter: _Waiter, woken: list[_Waiter]) -> bool:
+            if self._takers or not self._items:
+                return False
+            waiter.value = self._items.popleft()
+            self._admit_putter(woken)
+            return True
+
+        def give_back(item: A) -> None:
+            # A consumer was interrupted after being handed a value: return it to the front of the queue
+            woken: list[_Waiter] = []
+            with self._lock:
+                if self._takers:
+                    _grant(self._takers.popleft(), item, woken)
+                else:
+                    self._items.appendleft(item)
+            _wake(woken)
+
+        return _wait_for(self._lock, self._takers, None, try_grant, give_back)
+
+    def poll(self) -> PYIO[None, Optional[A]]:
+        """Removes and produces the oldest value if there is one, or produces None without waiting."""
+
+        def run() -> Optional[A]:
+            woken: list[_Waiter] = []
+            with self._lock:
+                if not self._items:
+                    return None
+                item = self._items.popleft()
+                self._admit_putter(woken)
+            _wake(woken)
+            return item
+
+        return PYIO.attempt(run)
+
+    def size(self) -> PYIO[None, int]:
+        """Produces the number of values currently in the queue."""
+        return PYIO.attempt(lambda: len(self._items))
+
+    def _wait_for_room(self, item: A) -> PYIO[None, bool]:
+        def try_grant(waiter: _Waiter, woken: list[_Waiter]) -> bool:
+            if self._putters or len(self._items) >= cast(int, self.capacity):
+                return False
+            self._items.append(item)
+            return True
+
+        # A producer admitted into the queue has nothing to give back
+        wait = _wait_for(self._lock, self._putters, item, try_grant, lambda _: None)
+        return wait.map(lambda _: True)
+
+    def _admit_putter(self, woken: list[_Waiter]) -> None:
+        """Moves the value of the first waiting producer into the queue after a value was taken. Call under the lock."""
+        if self._putters:
+            putter = self._putters.popleft()
+            self._items.append(putter.request)
+            _grant(putter, None, woken)
+
+
+class _Waiter:
+    """An effect waiting on a primitive: what it asked for, what it was handed, and whether it took it."""
+
+    __slots__ = ("request", "callback", "granted", "value", "taken")
+
+    def __init__(self, request: Any):
+        self.request = request
+        self.callback: Optional[Callable[[Any, Any], None]] = None
+        self.granted = False
+        self.value: Any = None
+        self.taken = False
+
+
+def _grant(waiter: _Waiter, value: Any, woken: list[_Waiter]) -> None:
+    """Grants a queued waiter its request, to be woken up by _wake. Call under the primitive's lock."""
+    waiter.granted = True
+    waiter.value = value
+    woken.append(waiter)
+
+
+def _wake(woken: list[_Waiter]) -> None:
+    """Resumes the waiters granted their request. Call after releasing the lock."""
+    for waiter in woken:
+        if waiter.callback is not None:
+            waiter.callback(None, None)
+
+
+def _wait_for(
+    lock: threading.Lock,
+    waiters: deque[_Waiter],
+    request: Any,
+    try_grant: Callable[[_Waiter, list[_Waiter]], bool],
+    give_back: Callable[[Any], None],
+    withdrawn: Optional[Callable[[], None]] = None,
+) -> PYIO[Any, Any]:
+    """
+    Builds an effect that gets what it asks for from a primitive, waiting in line if it cannot have it right away.
+
+    `try_grant` runs under the lock and either grants the request at once, storing any value in `waiter.value`
+    and adding the waiters this wakes up to its second argument, or returns False to queue the waiter. Whoever
+    grants a queued waiter later pops it from `waiters` and hands it over with _grant and _wake.
+
+    The wait itself is interruptible. If the waiter is interrupted after something was granted to it, `give_back`
+    returns it to the primitive so that nothing is lost; if it is interrupted while still in line, it leaves the
+    line and `withdrawn`, if given, is called.
+    """
+
+    def start() -> PYIO[Any, Any]:
+        waiter = _Waiter(request)
+
+        def register(callback: Callable[[Any, Any], None]) -> None:
+            woken: list[_Waiter] = []
+            with lock:
+                waiter.granted = try_grant(waiter, woken)
+                if not waiter.granted:
+                    waiter.callback = callback
+                    waiters.append(waiter)
+            _wake(woken)
+            if waiter.granted:
+                callback(None, None)
+
+        def take(_: Any) -> Any:
+            with lock:
+                waiter.taken = True
+                return waiter.value
+
+        def abandon() -> None:
+            with lock:
+                if waiter.taken:
+                    return
+                granted = waiter.granted
+                # Not in line if it was interrupted before it even got to ask
+                if not granted and waiter in waiters:
+                    waiters.remove(waiter)
+            if granted:
+                give_back(waiter.value)
+            elif withdrawn is not None:
+                withdrawn()
+
+        return Uninterruptible(
+            Ensuring(Interruptible(Async(register)).map(take), Sync(abandon))
+        )
+
+    return Defer(start)
+
+
+_TRUE: PYIO[None, bool] = Succeed(True)
+_FALSE: PYIO[None, bool] = Succeed(False)
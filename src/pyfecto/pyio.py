@@ -1,28 +1,97 @@
 from __future__ import annotations
 
+import asyncio
+import concurrent.futures
+import threading
 import time
-from dataclasses import dataclass
-from typing import Callable, Generic, Optional, TypeVar
-
-from .runtime import LOGGER
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Generic,
+    Hashable,
+    Optional,
+    TypeVar,
+    cast,
+)
+
+from .runtime import LOGGER, Runtime
+
+# Import Fiber only for type checking, fiber.py itself builds on PYIO
+if TYPE_CHECKING:
+    from .cache import EffectCache
+    from .fiber import Fiber
+    from .metrics import Counter, Histogram
+    from .resource import Scoped
+    from .schedule import Schedule
+    from .tracing import Span
 
 A = TypeVar("A")
 B = TypeVar("B")
+C = TypeVar("C")
+K = TypeVar("K", bound=Hashable)
+R = TypeVar("R")
 E = TypeVar("E", bound=Exception | None)
 
+# A log message, or a function building it that is only called when the message is actually logged
+LogMessage = str | Callable[[], str]
+
+
+class EffectTimeoutError(TimeoutError):
+    """The error an effect fails with when it does not complete within the time given to PYIO.timeout()."""
+
+    def __init__(self, seconds: float):
+        super().__init__(f"Effect timed out after {seconds}s")
+        self.seconds = seconds
+
+
+# Instruction tags, one per node type. The run loop dispatches on these plain ints rather than on isinstance checks.
+_SUCCEED = 0
+_FAIL = 1
+_SYNC = 2
+_DEFER = 3
+_ASYNC = 4
+_AWAIT = 5
+# Continuation nodes: everything from _MAP upwards wraps a `source` effect
+_MAP = 6
+_FLAT_MAP = 7
+_FOLD = 8
+_ENSURING = 9
+_UNINTERRUPTIBLE = 10
+_INTERRUPTIBLE = 11
+# Frame only: the outcome a finalizer is running for, restored once the finalizer is done
+_RESTORE = 12
+
+# Upper bound on the number of functions fused into a single Map node. Keeps the cost of extending a fused node
+# constant, while long map chains still collapse into a handful of nodes.
+_MAX_FUSED = 32
+
+# Number of instructions a fiber or an async run executes before handing its thread or event loop back.
+_YIELD_BUDGET = 1024
+
 
-@dataclass
 class PYIO(Generic[E, A]):
     """
     Encapsulates operations that may either complete successfully with a value or encounter an error.
     Operations remain dormant until explicitly executed via run().
 
+    A PYIO is a small instruction tree: every constructor and combinator returns one of the node types defined
+    below (Succeed, Fail, Sync, Defer, Async, FromAwaitable, Map, FlatMap, Fold), and run() interprets that tree
+    with a single loop. Nodes are plain `__slots__` objects, so effects are cheap to build and can be inspected
+    with repr().
+
     Type Variables:
         E: Error type (must be None or inherit from Exception)
         A: Return type for successful operations
     """
 
-    _compute: Callable[[], tuple[E, Optional[A]]]
+    __slots__: tuple[str, ...] = ()
+    _tag: int
+
+    def __repr__(self) -> str:
+        fields = ", ".join(repr(getattr(self, name)) for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
 
     @staticmethod
     def success(value: A) -> PYIO[None, A]:
@@ -34,7 +103,7 @@ class PYIO(Generic[E, A]):
         Args:
             value: The data to wrap in a successful computation
         """
-        return PYIO(lambda: (None, value))
+        return Succeed(value)
 
     @staticmethod
     def fail(error: Exception) -> PYIO[Exception, None]:
@@ -45,7 +114,7 @@ class PYIO(Generic[E, A]):
         Args:
             error: The error that caused the failure
         """
-        return PYIO(lambda: (error, None))
+        return Fail(error)
 
     @staticmethod
     def attempt(f: Callable[[], A]) -> PYIO[E, A]:
@@ -58,14 +127,87 @@ class PYIO(Generic[E, A]):
         Args:
             f: A function that could raise an exception
         """
+        return Sync(f)
 
-        def safe_compute():
-            try:
-                return None, f()
-            except Exception as e:
-                return e, None
+    @staticmethod
+    def defer(f: Callable[[], PYIO[E, A]]) -> PYIO[E, A]:
+        """
+        Delays the construction of an effect until it is run.
+        Useful when building the effect itself depends on state that should be read at execution time,
+        or for recursive definitions that would otherwise be built eagerly.
+
+        Args:
+            f: A function producing the effect to run
+        """
+        return Defer(f)
+
+    @staticmethod
+    def from_callback(
+        register: Callable[
+            [Callable[[E, Optional[A]], None]], Optional[Callable[[], object]]
+        ],
+    ) -> PYIO[E, A]:
+        """
+        Creates an effect that completes when an external callback is invoked.
+        This is the bridge to callback based APIs: run() blocks the calling thread until the callback fires, while
+        a fiber suspends and releases its worker thread until then.
+
+        Args:
+            register: Receives a `callback(error, value)` to invoke exactly once with the outcome. It may return
+                a function that cancels the pending operation, which is called if the waiting fiber is interrupted.
+        """
+        return Async(register)
+
+    @staticmethod
+    def from_awaitable(factory: Callable[[], Awaitable[A]]) -> PYIO[E, A]:
+        """
+        Creates an effect that awaits a coroutine or other awaitable, capturing anything it raises in the
+        error channel.
+
+        Under run_async() the awaitable runs directly on the caller's event loop. Under run() or on a fiber it runs
+        on the runtime's background event loop: run() blocks until it completes, while a fiber suspends without
+        holding a worker thread.
+
+        Args:
+            factory: A function creating a fresh awaitable each time the effect runs, e.g. `lambda: fetch(url)`
+        """
+        return FromAwaitable(factory)
+
+    @staticmethod
+    def on_process_pool(f: Callable[..., A], *args: Any) -> PYIO[E, A]:
+        """
+        Runs a CPU-bound function in one of the runtime's worker processes, sidestepping the GIL.
+        Like attempt(), anything the function raises ends up in the error channel. While the function runs, a
+        fiber waiting on it releases its worker thread.
+
+        Args:
+            f: A picklable function, i.e. one defined at module level
+            *args: Picklable arguments to call the function with
+        """
+
+        def register(callback: Callable[[Any, Any], None]) -> Callable[[], bool]:
+            future = Runtime().process_pool.submit(f, *args)
+            return _notify_when_done(future, callback)
+
+        return Async(register)
+
+    @staticmethod
+    def sleep(seconds: float) -> PYIO[None, None]:
+        """
+        Completes after the given delay.
+        run() blocks the calling thread for the duration, while a fiber or an effect under run_async() waits
+        without holding a thread: the delay is timed on the runtime's background event loop.
+
+        Args:
+            seconds: How long to wait
+        """
+        if seconds <= 0:
+            return _UNIT
 
-        return PYIO(safe_compute)
+        def register(callback: Callable[[Any, Any], None]) -> Callable[[], None]:
+            return _call_later(seconds, lambda: callback(None, None))
+
+        return Async(register)
 
     @staticmethod
     def unit() -> PYIO[None, None]:
@@ -73,7 +215,7 @@ class PYIO(Generic[E, A]):
         Creates an empty successful computation. Serves as an identity element when composing PYIO operations.
         Similar to an empty list or zero in other contexts.
         """
-        return PYIO.success(None)
+        return _UNIT
 
     def map(self, f: Callable[[A], B]) -> PYIO[E, B]:
         """
@@ -84,14 +226,7 @@ class PYIO(Generic[E, A]):
         Args:
             f: Function to apply to successful results
         """
-
-        def new_compute():
-            error, value = self._compute()
-            if error is not None:
-                return error, None
-            return None, f(value)
-
-        return PYIO(new_compute)
+        return Map(self, (f,))
 
     def map_to(self, f: Callable[[], B]) -> PYIO[E, B]:
         """
@@ -110,21 +245,166 @@ class PYIO(Generic[E, A]):
         Args:
             f: Function that uses the successful result to decide what to do next
         """
-
-        def new_compute():
-            error, value = self._compute()
-            if error is not None:
-                return error, None
-            return f(value)._compute()
-
-        return PYIO(new_compute)
+        return FlatMap(self, f)
 
     def then(self, that: PYIO[E, B]) -> PYIO[E, B]:
         """
         Similar to 'flat_map', but it throws away the input.
         """
+        if that._tag == _SUCCEED:
+            # Sequencing into a known value is just a map, which can then fuse with neighbouring maps
+            value = cast(Succeed[B], that).value
+            return self.map(lambda _: value)
         return self.flat_map(lambda _: that)
 
+    def fork(self) -> PYIO[None, Fiber[E, A]]:
+        """
+        Starts this effect on a new fiber and immediately returns a handle to it.
+        The fiber is scheduled on the runtime's worker pool, so independent effects overlap instead of running one
+        after another. Use the returned Fiber to join, poll or interrupt it.
+        """
+        from .fiber import Fiber
+
+        return Sync(lambda: Fiber.start(self))
+
+    def timeout(self, seconds: float) -> PYIO[E, A]:
+        """
+        Fails with EffectTimeoutError if the effect does not complete within the given time.
+
+        The effect runs on its own fiber and is interrupted when the time is up, which cancels any callback,
+        awaitable or sleep it is waiting on. A blocking call inside PYIO.attempt cannot be cut short: the caller
+        gets the timeout error on time, and the worker thread stuck in the call is abandoned until it returns.
+        Such effects are counted by Runtime().abandoned_effects.
+
+        Args:
+            seconds: Time limit for the effect
+        """
+        from .fiber import Fiber
+
+        def register(callback: Callable[[Any, Any], None]) -> Callable[[], None]:
+            lock = threading.Lock()
+            finished = [False]
+
+            def finish(error: Any, value: Any) -> bool:
+                with lock:
+                    if finished[0]:
+                        return False
+                    finished[0] = True
+                callback(error, value)
+                return True
+
+            def on_timeout() -> None:
+                if finish(EffectTimeoutError(seconds), None):
+                    fiber._request_interruption()
+                    Runtime()._track_abandoned(fiber)
+
+            def on_outcome(error: Any, value: Any) -> None:
+                cancel_timer()
+                finish(error, value)
+
+            def cancel() -> None:
+                cancel_timer()
+                stop_observing()
+                fiber._request_interruption()
+
+            fiber = Fiber.start(self)
+            cancel_timer = _call_later(seconds, on_timeout)
+            stop_observing = fiber._observe(on_outcome)
+            return cancel
+
+        return Async(register)
+
+    @staticmethod
+    def race(first: PYIO[E, A], second: PYIO[E, A]) -> PYIO[E, A]:
+        """
+        Runs two effects concurrently and completes with whichever succeeds first, interrupting the other.
+        Fails only if both fail, with the error of the one failing last.
+
+        Args:
+            first: One of the competing effects
+            second: The other competing effect
+        """
+        return PYIO.race_all([first, second])
+
+    @staticmethod
+    def race_all(effects: list[PYIO[E, A]]) -> PYIO[E, A]:
+        """
+        Runs effects concurrently on fibers and completes with the first success, interrupting the losers as soon
+        as the winner is known. Fails only if every effect fails, with the error of the one failing last.
+        Interrupting the race interrupts all of the competing effects.
+
+        Args:
+            effects: The competing effects, at least one
+        """
+        if not effects:
+            raise ValueError("race_all needs at least one effect")
+        from .fiber import Fiber
+
+        def register(callback: Callable[[Any, Any], None]) -> Callable[[], None]:
+            lock = threading.Lock()
+            remaining = [len(effects)]
+            finished = [False]
+            fibers: list[Fiber[Any, Any]] = []
+
+            def interrupt_all() -> None:
+                for fiber in fibers:
+                    fiber._request_interruption()
+
+            def on_outcome(error: Any, value: Any) -> None:
+                with lock:
+                    if finished[0]:
+                        return
+                    remaining[0] -= 1
+                    finished[0] = error is None or remaining[0] == 0
+                    if not finished[0]:
+                        return
+                interrupt_all()
+                callback(error, value)
+
+            for effect in effects:
+                fiber = Fiber(effect)
+                fibers.append(fiber)
+                fiber._observe(on_outcome)
+            for fiber in fibers:
+                fiber._schedule()
+            return interrupt_all
+
+        return Async(register)
+
+    @staticmethod
+    def hedge(effect: PYIO[E, A], after: float) -> PYIO[E, A]:
+        """
+        Runs the effect and, if it has not completed after the given delay, races it against a second copy.
+        The first success wins and the other copy is interrupted, which cuts the tail latency of calls to
+        replicated services at the cost of an occasional duplicate request. An effect completing before the
+        delay, successfully or not, is never run twice; once both copies run, the hedge fails only if both fail.
+
+        Args:
+            effect: The effect to hedge, which must be safe to run twice
+            after: Seconds to wait before launching the second copy
+        """
+        from .fiber import Fiber
+
+        def start() -> PYIO[E, A]:
+            copies: list[Fiber[Any, Any]] = [Fiber.start(effect)]
+
+            def interrupt_copies() -> None:
+                for fiber in copies:
+                    fiber._request_interruption()
+
+            def hedge_if_running(outcome: Optional[PYIO[E, A]]) -> PYIO[E, A]:
+                if outcome is not None:
+                    return outcome
+                copies.append(Fiber.start(effect))
+                return PYIO.race(copies[0].join(), copies[1].join())
+
+            completed: PYIO[Any, Any] = copies[0].join().match(Fail, Succeed)
+            waited: PYIO[Any, Any] = PYIO.sleep(after).map(lambda _: None)
+            hedged = PYIO.race(completed, waited).flat_map(hedge_if_running)
+            return hedged.ensuring(PYIO.attempt(interrupt_copies))
+
+        return Defer(start)
+
     def zip(self, that: PYIO[E, B]) -> PYIO[E, tuple[A, B]]:
         """
         Pairs the results of two computations. When you need the results from two independent operations,
@@ -135,6 +415,152 @@ class PYIO(Generic[E, A]):
         """
         return self.flat_map(lambda a: that.map(lambda b: (a, b)))
 
+    def zip_par(self, that: PYIO[E, B]) -> PYIO[E, tuple[A, B]]:
+        """
+        Like zip, but runs both computations concurrently, each on its own fiber.
+        If either fails, the other is interrupted and the pair fails with that error.
+
+        Args:
+            that: Another computation to run alongside this one
+        """
+        return self.zip_with_par(that, lambda a, b: (a, b))
+
+    def zip_with_par(self, that: PYIO[E, B], f: Callable[[A, B], C]) -> PYIO[E, C]:
+        """
+        Runs both computations concurrently and combines their results with f.
+        If either fails, the other is interrupted and the combination fails with that error.
+
+        Args:
+            that: Another computation to run alongside this one
+            f: Combines the result of this computation with the result of the other
+        """
+        from .fiber import Fiber
+
+        def start() -> PYIO[E, C]:
+            fibers: list[Fiber[Any, Any]] = [Fiber.start(self), Fiber.start(that)]
+            return Fiber.join_all(fibers).map(lambda results: f(*results))
+
+        return Defer(start)
+
+    def memoize(self) -> PYIO[E, A]:
+        """
+        Returns an effect that runs this one at most once and then replays its outcome, success or failure, to
+        every later run. Callers arriving while the first run is in flight wait for it instead of starting their
+        own, without holding a thread when they are fibers. Useful for expensive one-off work such as loading
+        configuration that many parts of a program depend on.
+
+        The run happens on a fiber of its own, so interrupting one of the waiting callers does not cancel the work
+        shared with the others.
+        """
+        return _shared(self, None, True)
+
+    def cached(self, ttl: float) -> PYIO[E, A]:
+        """
+        Returns an effect that reuses the value of this one for `ttl` seconds after it was produced, and runs it
+        again on the first use after that. Like memoize(), concurrent callers share a single in-flight run, so an
+        expired token is only refreshed once however many callers ask for it. Failures are passed on to the
+        callers that waited for the failed run, but never cached: the next use runs the effect again.
+
+        Args:
+            ttl: Seconds a successful result stays fresh
+        """
+        if ttl <= 0:
+            raise ValueError(f"ttl must be positive, got {ttl}")
+        return _shared(self, ttl, False)
+
+    @staticmethod
+    def cache_by_key(
+        lookup: Callable[[K], PYIO[E, A]],
+        max_size: int = 1_024,
+        ttl: Optional[float] = None,
+        failure_ttl: Optional[float] = None,
+    ) -> EffectCache[K, E, A]:
+        """
+        Wraps an effectful lookup function in an EffectCache, so that repeated lookups of the same key reuse the
+        first outcome instead of calling the backend again:
+
+            get_weather = PYIO.cache_by_key(service.get_weather, max_size=100, ttl=60).get
+
+        Args:
+            lookup: A function that maps each key to the PYIO effect looking it up
+            max_size: Maximum number of keys kept, the least recently used is evicted first
+            ttl: Seconds a successful result stays cached (if None, until it is evicted)
+            failure_ttl: Seconds a failure stays cached (if None, failures are not cached)
+        """
+        from .cache import EffectCache
+
+        return EffectCache(lookup, max_size, ttl, failure_ttl)
+
+    def traced(self, name: str, **attributes: Any) -> PYIO[E, A]:
+        """
+        Runs the effect inside a tracing span, nested in the span it is started in, if any.
+        See the tracing module for how spans are collected and exported.
+
+        Args:
+            name: Name of the span
+            **attributes: Initial attributes of the span
+        """
+        from .tracing import span
+
+        return span(name, self, attributes)
+
+    def timed(self, metric: Histogram | str) -> PYIO[E, A]:
+        """
+        Records how long each run of the effect takes, in seconds, in a histogram, whether it succeeds, fails or
+        is interrupted. See the metrics module for how metrics are kept and exported.
+
+        Args:
+            metric: The histogram, or the name of a histogram of the runtime's metrics registry, created on
+                first use
+        """
+        from .metrics import timed
+
+        return timed(self, metric)
+
+    def counted(self, metric: Counter | str) -> PYIO[E, A]:
+        """
+        Adds one to a counter each time a run of the effect ends, whether it succeeds, fails or is interrupted.
+
+        Args:
+            metric: The counter, or the name of a counter of the runtime's metrics registry, created on first use
+        """
+        from .metrics import counted
+
+        return counted(self, metric)
+
+    def ensuring(self, finalizer: PYIO[Any, Any]) -> PYIO[E, A]:
+        """
+        Runs the finalizer once this effect completes, whether it succeeds, fails or is interrupted.
+        The finalizer itself cannot be interrupted. If it fails after this effect succeeded, the combined effect
+        fails with the finalizer's error; otherwise the outcome of this effect is kept.
+
+        Args:
+            finalizer: The clean-up to run, e.g. closing a file
+        """
+        return Ensuring(self, finalizer)
+
+    @staticmethod
+    def acquire_release(
+        acquire: PYIO[E, R], release: Callable[[R], PYIO[Any, Any]]
+    ) -> Scoped[E, R]:
+        """
+        Describes a resource that must be released after use, such as a connection or a file handle.
+        The returned Scoped only acquires the resource when it is used, and guarantees that `release` runs once
+        the use completes, even if it fails or is interrupted:
+
+            connection = PYIO.acquire_release(PYIO.attempt(db.connect), lambda c: PYIO.attempt(c.close))
+            rows = connection.use(lambda c: PYIO.attempt(lambda: c.execute(query)))
+
+        Acquiring and releasing cannot be interrupted, so a resource is never leaked half acquired.
+
+        Args:
+            acquire: The effect acquiring the resource
+            release: A function returning the effect that releases the resource
+        """
+        from .resource import Scoped
+
+        return Scoped.acquire_release(acquire, release)
+
     def recover(self, handler: Callable[[E], PYIO[E, A]]) -> PYIO[E, A]:
         """
         Recovers from errors using the provided handler. Like a catch block, this lets you intercept errors and try
@@ -143,14 +569,7 @@ class PYIO(Generic[E, A]):
         Args:
             handler: Function that takes an error and provides a recovery strategy.
         """
-
-        def new_compute():
-            error, value = self._compute()
-            if error is not None:
-                return handler(error)._compute()
-            return None, value
-
-        return PYIO(new_compute)
+        return Fold(self, handler, None)
 
     def match(
         self, failure: Callable[[E], B], success: Callable[[A], B]
@@ -163,14 +582,11 @@ class PYIO(Generic[E, A]):
             failure: How to handle the error case
             success: How to handle the success case
         """
-
-        def fold_compute():
-            error, value = self._compute()
-            if error is not None:
-                return None, failure(error)
-            return None, success(value)
-
-        return PYIO(fold_compute)
+        return Fold(
+            self,
+            lambda error: Succeed(failure(error)),
+            lambda value: Succeed(success(value)),
+        )
 
     def match_pyio(
         self, success: Callable[[A], PYIO[E, B]], failure: Callable[[E], PYIO[E, B]]
@@ -183,38 +599,71 @@ class PYIO(Generic[E, A]):
             success: What to do next if this succeeds
             failure: What to do next if this fails
         """
+        return Fold(self, failure, success)
+
+    def retry(self, schedule: Schedule) -> PYIO[E, A]:
+        """
+        Runs the effect again after each failure, for as long as the schedule allows.
+        The schedule is consulted with each error and decides how long to wait before the next attempt; once it
+        stops, the effect fails with the last error. The attempts run in a loop, so a schedule that recurs
+        thousands of times does not grow the stack, and the waits are non-blocking on fibers and under
+        run_async().
+
+        Args:
+            schedule: The retry policy, e.g. `Schedule.exponential(0.1) & Schedule.recurs(5)`
+        """
+
+        def start() -> PYIO[E, A]:
+            next_delay = schedule._start()
+
+            def on_failure(error):
+                delay = next_delay(error)
+                if delay is None:
+                    return Fail(error)
+                return FlatMap(PYIO.sleep(delay), lambda _: attempt)
+
+            attempt: PYIO[E, A] = Fold(self, on_failure, None)
+            return attempt
+
+        return Defer(start)
+
+    def repeat(self, schedule: Schedule) -> PYIO[E, A]:
+        """
+        Runs the effect again after each success, for as long as the schedule allows, and completes with the
+        value of the last run. The schedule is consulted with each value and decides how long to wait before the
+        next run. The first failure stops the repetition and is propagated.
+
+        Args:
+            schedule: The repetition policy, e.g. `Schedule.fixed(60) & Schedule.recurs(10)`
+        """
+
+        def start() -> PYIO[E, A]:
+            next_delay = schedule._start()
 
-        def fold_compute():
-            error, value = self._compute()
-            if error is not None:
-                return failure(error)._compute()
-            return success(value)._compute()
+            def on_success(value):
+                delay = next_delay(value)
+                if delay is None:
+                    return Succeed(value)
+                return FlatMap(PYIO.sleep(delay), lambda _: run_once)
 
-        return PYIO(fold_compute)
+            run_once: PYIO[E, A] = FlatMap(self, on_success)
+            return run_once
+
+        return Defer(start)
 
     def is_success(self) -> PYIO[None, bool]:
         """
         Checks if the computation succeeded.
         A safe way to test the outcome without actually handling the success value or error.
         """
-
-        def compute() -> tuple[None, bool]:
-            error, _ = self._compute()
-            return None, error is None
-
-        return PYIO(compute)
+        return Fold(self, lambda _: _FALSE, lambda _: _TRUE)
 
     def is_failure(self) -> PYIO[None, bool]:
         """
         Checks if the computation failed.
         A safe way to test the outcome without actually handling the success value or error.
         """
-
-        def compute() -> tuple[None, bool]:
-            error, _ = self._compute()
-            return None, error is not None
-
-        return PYIO(compute)
+        return Fold(self, lambda _: _TRUE, lambda _: _FALSE)
 
     @staticmethod
     def chain_all(*effects: PYIO[E, A]) -> PYIO[E, A] | PYIO[None, None]:
@@ -259,103 +708,728 @@ class PYIO(Generic[E, A]):
         Executes the computation and returns the final outcome.
         This is where the actual work happens - everything else just builds up the recipe for what to do.
         """
-        error, value = self._compute()
+        error, value = self._evaluate()
+        if error is not None:
+            return error
+
+        return value
+
+    def _evaluate(self) -> tuple[E, Optional[A]]:
+        """
+        Interprets the effect on the calling thread and returns the final `(error, value)` pair, blocking whenever
+        the effect waits on an asynchronous callback.
+        """
+        stack: list[Any] = []
+        current: Any = self
+        while True:
+            try:
+                error, value, pending = _interpret(current, stack, None)
+            except BaseException:
+                _finalize(stack)
+                raise
+            if pending is None:
+                return error, value
+            error, value = _await_callback(pending)
+            current = Fail(error) if error is not None else Succeed(value)
+
+    async def run_async(self) -> E | Optional[A]:
+        """
+        Executes the computation on the running asyncio event loop and returns the final outcome.
+
+        Awaitables created with from_awaitable() are awaited directly and callbacks from from_callback() are waited
+        on without blocking the loop, so many effects can run concurrently on a single thread. Long computations
+        periodically yield to the event loop. Cancelling the task running this coroutine cancels the awaitable or
+        callback the effect is currently waiting on.
+        """
+        error, value = await self._evaluate_async()
         if error is not None:
             return error
 
         return value
 
+    async def _evaluate_async(self) -> tuple[E, Optional[A]]:
+        """
+        Interprets the effect on the running event loop and returns the final `(error, value)` pair.
+        """
+        stack: list[Any] = []
+        try:
+            return await _interpret_async(self, stack)
+        except BaseException:
+            # Includes the cancellation of the task running the effect
+            await _finalize_async(stack)
+            raise
+
     @staticmethod
-    def log_trace(message: str, **kwargs) -> PYIO[None, None]:
+    def log_trace(message: LogMessage, **kwargs) -> PYIO[None, None]:
         """
         Log a trace message as an effect.
 
         Args:
-            message: The message to log
+            message: The message to log, or a function building it
             **kwargs: Additional context to include in the log
         """
-        return PYIO.attempt(lambda: LOGGER.trace(message, **kwargs))
+        return _log_effect("TRACE", message, kwargs)
 
     @staticmethod
-    def log_debug(message: str, **kwargs) -> PYIO[None, None]:
+    def log_debug(message: LogMessage, **kwargs) -> PYIO[None, None]:
         """
         Log a debug message as an effect.
 
         Args:
-            message: The message to log
+            message: The message to log, or a function building it
             **kwargs: Additional context to include in the log
         """
-        return PYIO.attempt(lambda: LOGGER.debug(message, **kwargs))
+        return _log_effect("DEBUG", message, kwargs)
 
     @staticmethod
-    def log_info(message: str, **kwargs) -> PYIO[None, None]:
+    def log_info(message: LogMessage, **kwargs) -> PYIO[None, None]:
         """
         Log an info message as an effect.
 
         Args:
-            message: The message to log
+            message: The message to log, or a function building it
             **kwargs: Additional context to include in the log
         """
-        return PYIO.attempt(lambda: LOGGER.info(message, **kwargs))
+        return _log_effect("INFO", message, kwargs)
 
     @staticmethod
-    def log_warning(message: str, **kwargs) -> PYIO[None, None]:
+    def log_warning(message: LogMessage, **kwargs) -> PYIO[None, None]:
         """
         Log a warning message as an effect.
 
         Args:
-            message: The message to log
+            message: The message to log, or a function building it
             **kwargs: Additional context to include in the log
         """
-        return PYIO.attempt(lambda: LOGGER.warning(message, **kwargs))
+        return _log_effect("WARNING", message, kwargs)
 
     @staticmethod
-    def log_error(message: str, **kwargs) -> PYIO[None, None]:
+    def log_error(message: LogMessage, **kwargs) -> PYIO[None, None]:
         """
         Log an error message as an effect.
 
         Args:
-            message: The message to log
+            message: The message to log, or a function building it
             **kwargs: Additional context to include in the log
         """
-        return PYIO.attempt(lambda: LOGGER.error(message, **kwargs))
+        return _log_effect("ERROR", message, kwargs)
 
     @staticmethod
-    def log_critical(message: str, **kwargs) -> PYIO[None, None]:
+    def log_critical(message: LogMessage, **kwargs) -> PYIO[None, None]:
         """
         Log a critical message as an effect.
 
         Args:
-            message: The message to log
+            message: The message to log, or a function building it
             **kwargs: Additional context to include in the log
         """
-        return PYIO.attempt(lambda: LOGGER.critical(message, **kwargs))
+        return _log_effect("CRITICAL", message, kwargs)
 
     @staticmethod
-    def log_span(name: str, log_msg: str, operation: PYIO[E, A]) -> PYIO[E, A]:
+    def log_span(name: str, log_msg: LogMessage, operation: PYIO[E, A]) -> PYIO[E, A]:
         """
         Creates a composed effect that logs timing information after the operation completes.
 
-        This implementation uses logger.bind() to create a contextual logger with span information.
-        Spans will appear in the log output where {extra} is specified in the format string.
+        The operation runs in a tracing span (see `traced`), so log spans nested through flat_map are linked to
+        each other. The log record binds the duration in milliseconds as `spans={name: duration}`, along with
+        `trace_id`, `span_id` and `parent_span_id`; they appear in the log output where {extra} is specified in
+        the format string. With a log sampler on the runtime, the record is sampled like those of the log effects,
+        and counts as an error when the operation failed. The span is opened even when the runtime does not log
+        at INFO level, so that the spans nested in the operation keep their parent; only the record is skipped.
 
         Args:
             name: A descriptive name for the span
-            log_msg: The message to log
+            log_msg: The message to log, or a function building it
             operation: The effect to wrap with logging
 
         Returns:
             A composed effect that includes timing and logging after the original operation
         """
+        from .tracing import _current_span, span
+
+        def log_elapsed(outcome: PYIO[Any, Any]) -> PYIO[Any, Any]:
+            active = cast("Span", _current_span.get())
+            elapsed_ms = (time.perf_counter_ns() - active.start_ns) / 1_000_000
+            extra = {
+                "spans": {name: round(elapsed_ms, 3)},
+                "trace_id": active.trace_id,
+                "span_id": active.span_id,
+                "parent_span_id": active.parent_id,
+            }
+            _log(
+                "INFO",
+                log_msg,
+                {},
+                extra,
+                sampled=True,
+                failed=isinstance(outcome, Fail),
+            )
+            return outcome
+
+        timed = Fold(
+            operation,
+            lambda error: log_elapsed(Fail(error)),
+            lambda value: log_elapsed(Succeed(value)),
+        )
+        return span(name, timed)
+
+
+class Succeed(PYIO[None, A]):
+    """An effect that completes with an already known value."""
+
+    __slots__ = ("value",)
+    _tag = _SUCCEED
+
+    def __init__(self, value: A):
+        self.value = value
+
+    def flat_map(self, f: Callable[[A], PYIO[Any, B]]) -> PYIO[Any, B]:
+        value = self.value
+        return Defer(lambda: f(value))
 
-        def execute_with_timing() -> tuple[E, A | None]:
-            start_time = time.time_ns()
-            error, value = operation._compute()
-            # Calculate elapsed time in milliseconds
-            elapsed_ms = (time.time_ns() - start_time) / 1_000_000
-            span_logger = LOGGER.bind(spans={name: f"{elapsed_ms:.2f}ms"})
-            span_logger.info(log_msg)
+    def then(self, that: PYIO[E, B]) -> PYIO[E, B]:
+        # A known value has no effects to run before `that`
+        return that
 
-            return error, value
 
-        return PYIO(execute_with_timing)
+class Fail(PYIO[E, None]):
+    """An effect that completes with an already known error."""
+
+    __slots__ = ("error",)
+    _tag = _FAIL
+
+    def __init__(self, error: E):
+        self.error = error
+
+    def map(self, f: Callable[[Any], B]) -> PYIO[E, B]:
+        return cast(PYIO[E, B], self)
+
+    def flat_map(self, f: Callable[[Any], PYIO[E, B]]) -> PYIO[E, B]:
+        return cast(PYIO[E, B], self)
+
+    def then(self, that: PYIO[E, B]) -> PYIO[E, B]:
+        return cast(PYIO[E, B], self)
+
+
+class Sync(PYIO[E, A]):
+    """An effect that calls a function when run, capturing anything it raises in the error channel."""
+
+    __slots__ = ("thunk",)
+    _tag = _SYNC
+
+    def __init__(self, thunk: Callable[[], A]):
+        self.thunk = thunk
+
+
+class Defer(PYIO[E, A]):
+    """An effect whose instructions are produced by a function when run."""
+
+    __slots__ = ("thunk",)
+    _tag = _DEFER
+
+    def __init__(self, thunk: Callable[[], PYIO[E, A]]):
+        self.thunk = thunk
+
+
+class Async(PYIO[E, A]):
+    """An effect that completes once the callback handed to `register` is invoked."""
+
+    __slots__ = ("register",)
+    _tag = _ASYNC
+
+    def __init__(
+        self,
+        register: Callable[
+            [Callable[[E, Optional[A]], None]], Optional[Callable[[], object]]
+        ],
+    ):
+        self.register = register
+
+
+class FromAwaitable(PYIO[E, A]):
+    """An effect that awaits the awaitable created by `factory`."""
+
+    __slots__ = ("factory",)
+    _tag = _AWAIT
+
+    def __init__(self, factory: Callable[[], Awaitable[A]]):
+        self.factory = factory
+
+    def register(
+        self, callback: Callable[[Any, Any], None]
+    ) -> Optional[Callable[[], object]]:
+        """
+        Runs the awaitable on the runtime's background event loop and reports its outcome to `callback`, so that
+        drivers without an event loop of their own can wait on it like on an Async node.
+        """
+
+        async def await_it() -> A:
+            return await self.factory()
+
+        future = asyncio.run_coroutine_threadsafe(await_it(), Runtime().event_loop)
+        return _notify_when_done(future, callback)
+
+
+class Map(PYIO[E, B]):
+    """
+    Transforms the successful value of `source` by applying the functions in `fs` in order.
+    Consecutive map() calls are fused into a single node, up to `_MAX_FUSED` functions per node.
+    """
+
+    __slots__ = ("source", "fs")
+    _tag = _MAP
+
+    def __init__(self, source: PYIO[E, Any], fs: tuple[Callable[[Any], Any], ...]):
+        self.source = source
+        self.fs = fs
+
+    def map(self, f: Callable[[B], Any]) -> PYIO[E, Any]:
+        if len(self.fs) < _MAX_FUSED:
+            return Map(self.source, self.fs + (f,))
+        return Map(self, (f,))
+
+
+class FlatMap(PYIO[E, B]):
+    """Continues with the effect returned by `f` once `source` succeeds."""
+
+    __slots__ = ("source", "f")
+    _tag = _FLAT_MAP
+
+    def __init__(self, source: PYIO[E, Any], f: Callable[[Any], PYIO[E, B]]):
+        self.source = source
+        self.f = f
+
+
+class Fold(PYIO[E, B]):
+    """
+    Continues with the effect returned by the handler matching the outcome of `source`.
+    A missing handler passes that outcome through unchanged.
+    """
+
+    __slots__ = ("source", "on_failure", "on_success")
+    _tag = _FOLD
+
+    def __init__(
+        self,
+        source: PYIO[Any, Any],
+        on_failure: Optional[Callable[[Any], PYIO[E, B]]],
+        on_success: Optional[Callable[[Any], PYIO[E, B]]],
+    ):
+        self.source = source
+        self.on_failure = on_failure
+        self.on_success = on_success
+
+
+class Ensuring(PYIO[E, A]):
+    """Runs `finalizer` once `source` has completed, whether it succeeded, failed or was interrupted."""
+
+    __slots__ = ("source", "finalizer")
+    _tag = _ENSURING
+
+    def __init__(self, source: PYIO[E, A], finalizer: PYIO[Any, Any]):
+        self.source = source
+        self.finalizer = finalizer
+
+
+class Uninterruptible(PYIO[E, A]):
+    """Runs `source` shielded from interruption; a pending interruption takes effect once it completes."""
+
+    __slots__ = ("source",)
+    _tag = _UNINTERRUPTIBLE
+
+    def __init__(self, source: PYIO[E, A]):
+        self.source = source
+
+
+class Interruptible(PYIO[E, A]):
+    """Makes `source` interruptible again inside an Uninterruptible region."""
+
+    __slots__ = ("source",)
+    _tag = _INTERRUPTIBLE
+
+    def __init__(self, source: PYIO[E, A]):
+        self.source = source
+
+
+class _Restore:
+    """Stack frame holding the outcome an Ensuring finalizer runs for. Shields the finalizer from interruption."""
+
+    __slots__ = ("error", "value")
+    _tag = _RESTORE
+
+    def __init__(self, error: Any, value: Any):
+        self.error = error
+        self.value = value
+
+
+_UNIT: PYIO[None, None] = Succeed(None)
+_TRUE: PYIO[None, bool] = Succeed(True)
+_FALSE: PYIO[None, bool] = Succeed(False)
+
+
+class _Cooperative:
+    """Run loop context for drivers that yield periodically but are never interrupted by the loop itself."""
+
+    __slots__ = ()
+    _interruption = None
+
+
+_COOPERATIVE = _Cooperative()
+
+
+def _interpret(
+    current: Any, stack: list[Any], fiber: Optional[Fiber[Any, Any] | _Cooperative]
+) -> tuple[Any, Any, Any]:
+    """
+    The run loop shared by every way of executing an effect.
+
+    Map, FlatMap and Fold nodes are pushed onto `stack` while descending to the next leaf. Once a leaf produces its
+    outcome, frames are popped until one applies to it: Map frames transform the value in place, while FlatMap and
+    Fold frames yield the next node to evaluate. No Python frame is kept per step, so the depth of a chain only
+    costs heap. A Map directly over a Succeed is applied without touching the stack at all.
+
+    The loop returns `(error, value, None)` once the effect completes. It returns `(None, None, node)` when it has to
+    hand control back to its caller, leaving `stack` in place so evaluation can resume from `node`: either `node` is
+    an Async or FromAwaitable the caller has to wait on, or, when running on a fiber or an event loop, the yield
+    budget ran out.
+
+    A fiber that has been interrupted stops at the next instruction outside of an Uninterruptible region or a
+    finalizer. Its stack is unwound without running any handlers except Ensuring finalizers, and the fiber
+    completes with its interruption error.
+    """
+    budget = _YIELD_BUDGET
+    error: Any
+    value: Any
+    while True:
+        if fiber is not None:
+            if fiber._interruption is not None and not _is_masked(stack):
+                current = _unwind(stack, fiber._interruption)
+                if current is None:
+                    return fiber._interruption, None, None
+                continue
+            budget -= 1
+            if budget == 0:
+                return None, None, current
+
+        tag = current._tag
+        if tag == _MAP and current.source._tag == _SUCCEED:
+            error, value = None, current.source.value
+            for f in current.fs:
+                value = f(value)
+        elif tag >= _MAP:
+            stack.append(current)
+            current = current.source
+            continue
+        elif tag == _SUCCEED:
+            error, value = None, current.value
+        elif tag == _FAIL:
+            error, value = current.error, None
+        elif tag == _SYNC:
+            try:
+                error, value = None, current.thunk()
+            except Exception as e:
+                error, value = e, None
+        elif tag == _DEFER:
+            current = current.thunk()
+            continue
+        else:
+            return None, None, current
+
+        while stack:
+            frame = stack.pop()
+            tag = frame._tag
+            if tag > _FOLD:
+                if tag == _ENSURING:
+                    stack.append(_Restore(error, value))
+                    current = frame.finalizer
+                    break
+                if tag == _INTERRUPTIBLE:
+                    continue
+                if tag == _RESTORE and (frame.error is not None or error is None):
+                    # A failing finalizer only replaces a success
+                    error, value = frame.error, frame.value
+                # Leaving a region shielded from interruption: check for one before going on
+                current = Fail(error) if error is not None else Succeed(value)
+                break
+            if error is None:
+                if tag == _MAP:
+                    for f in frame.fs:
+                        value = f(value)
+                    continue
+                if tag == _FLAT_MAP:
+                    current = frame.f(value)
+                    break
+                if frame.on_success is not None:
+                    current = frame.on_success(value)
+                    break
+            elif tag == _FOLD and frame.on_failure is not None:
+                current = frame.on_failure(error)
+                break
+        else:
+            return error, value, None
+
+
+def _is_masked(stack: list[Any]) -> bool:
+    """Tells whether the innermost region on the stack is shielded from interruption."""
+    for frame in reversed(stack):
+        tag = frame._tag
+        if tag == _UNINTERRUPTIBLE or tag == _RESTORE:
+            return True
+        if tag == _INTERRUPTIBLE:
+            return False
+    return False
+
+
+def _unwind(stack: list[Any], interruption: Exception) -> Optional[PYIO[Any, Any]]:
+    """
+    Pops frames after an interruption up to the next Ensuring finalizer, returning the finalizer to run, or up to
+    an Uninterruptible region, returning the failure that region continues with. Returns None once the stack is
+    empty.
+    """
+    while stack:
+        frame = stack.pop()
+        if frame._tag == _ENSURING:
+            stack.append(_Restore(interruption, None))
+            return frame.finalizer
+        if frame._tag == _UNINTERRUPTIBLE:
+            stack.append(frame)
+            return Fail(interruption)
+    return None
+
+
+def _finalize(stack: list[Any]) -> None:
+    """
+    Runs the pending Ensuring finalizers on the stack, innermost first, when an exception is about to escape the run
+    loop. Their own outcomes are ignored, the exception takes precedence.
+    """
+    while stack:
+        frame = stack.pop()
+        if frame._tag == _ENSURING:
+            try:
+                frame.finalizer._evaluate()
+            except Exception:
+                pass
+
+
+async def _finalize_async(stack: list[Any]) -> None:
+    """Like _finalize, for an effect running on an event loop whose task is being cancelled."""
+    while stack:
+        frame = stack.pop()
+        if frame._tag == _ENSURING:
+            try:
+                await frame.finalizer._evaluate_async()
+            except Exception:
+                pass
+
+
+async def _interpret_async(current: Any, stack: list[Any]) -> tuple[Any, Any]:
+    """Drives the run loop on the running event loop, awaiting what it suspends on."""
+    while True:
+        error, value, pending = _interpret(current, stack, _COOPERATIVE)
+        if pending is None:
+            return error, value
+        tag = pending._tag
+        if tag == _AWAIT:
+            try:
+                error, value = None, await pending.factory()
+            except Exception as e:
+                error, value = e, None
+        elif tag == _ASYNC:
+            error, value = await _await_callback_async(pending)
+        else:
+            # Out of budget: let other tasks on the loop run before continuing
+            await asyncio.sleep(0)
+            current = pending
+            continue
+        current = Fail(error) if error is not None else Succeed(value)
+
+
+def _notify_when_done(
+    future: concurrent.futures.Future[Any], callback: Callable[[Any, Any], None]
+) -> Callable[[], bool]:
+    """Reports the outcome of a future to an Async callback once it is done. Returns the future's canceler."""
+
+    def done(f: concurrent.futures.Future[Any]) -> None:
+        if f.cancelled():
+            callback(concurrent.futures.CancelledError(), None)
+        elif f.exception() is not None:
+            callback(f.exception(), None)
+        else:
+            callback(None, f.result())
+
+    future.add_done_callback(done)
+    return future.cancel
+
+
+def _shared(
+    effect: PYIO[E, A], ttl: Optional[float], keep_failures: bool
+) -> PYIO[E, A]:
+    """
+    Builds an effect whose runs share a single fiber running `effect`. A new fiber is only started once the
+    current one's outcome has gone stale: its success is older than `ttl`, or it failed and `keep_failures` is off.
+    """
+    from .fiber import Fiber
+
+    lock = threading.Lock()
+    # The fiber whose outcome is shared, and the time after which its success is stale (None until it completes)
+    current: list[Any] = [None]
+    expires: list[Optional[float]] = [None]
+
+    def is_fresh(fiber: Fiber[Any, Any]) -> bool:
+        outcome = fiber._outcome
+        if outcome is None:
+            return True
+        if outcome[0] is not None:
+            return keep_failures
+        return ttl is None or expires[0] is None or time.monotonic() < expires[0]
+
+    def stamp(fiber: Fiber[Any, Any]) -> Callable[[Any, Any], None]:
+        def completed(error: Any, value: Any) -> None:
+            if ttl is not None:
+                with lock:
+                    if current[0] is fiber:
+                        expires[0] = time.monotonic() + ttl
+
+        return completed
+
+    def share() -> PYIO[E, A]:
+        with lock:
+            fiber = current[0]
+            started = fiber is None or not is_fresh(fiber)
+            if started:
+                fiber = Fiber(effect)
+                current[0], expires[0] = fiber, None
+        if started:
+            fiber._observe(stamp(fiber))
+            fiber._schedule()
+        outcome = fiber._outcome
+        if outcome is not None:
+            # Fast path: replay the outcome without waiting on the fiber
+            error, value = outcome
+            return cast(
+                PYIO[E, A], Fail(error) if error is not None else Succeed(value)
+            )
+        return fiber.join()
+
+    return Defer(share)
+
+
+def _configured_runtime() -> Optional[Runtime]:
+    """The runtime, or None if the application has not created it yet."""
+    runtime = Runtime._instance
+    if runtime is None or not runtime._initialized:
+        return None
+    return runtime
+
+
+def _log_level_enabled(level: str) -> bool:
+    """
+    Checks a level when a log effect is built. Until the runtime has been configured the answer is yes, so that
+    building an effect never creates the runtime with its default settings; _log checks again when it runs.
+    """
+    runtime = _configured_runtime()
+    return runtime is None or runtime.log_enabled(level)
+
+
+def _log_effect(
+    level: str, message: LogMessage, kwargs: dict[str, Any]
+) -> PYIO[None, None]:
+    if not _log_level_enabled(level):
+        return _UNIT
+    return Sync(lambda: _log(level, message, kwargs, sampled=True))
+
+
+def _log(
+    level: str,
+    message: LogMessage,
+    kwargs: dict[str, Any],
+    extra: Optional[dict[str, Any]] = None,
+    sampled: bool = False,
+    failed: bool = False,
+) -> None:
+    """
+    Logs a record for the log effects, through the runtime's log pipeline if it has one. A `sampled` record is
+    first offered to the runtime's log sampler, if it has one, which may suppress it.
+    """
+    # Until the application configures the runtime, records go straight to loguru: creating the runtime here
+    # would apply its default settings, which replace the sinks the application may have added itself
+    runtime = _configured_runtime()
+    pipeline = None
+    if runtime is not None:
+        if not runtime.log_enabled(level):
+            return
+        sampler = runtime.log_sampler
+        if sampled and sampler is not None and not sampler.allow(level, failed):
+            return
+        pipeline = runtime.log_pipeline
+    if callable(message):
+        message = message()
+    if pipeline is not None:
+        pipeline.submit(level, message, kwargs, extra)
+    elif extra:
+        LOGGER.bind(**extra).log(level, message, **kwargs)
+    else:
+        LOGGER.log(level, message, **kwargs)
+
+
+def _call_later(seconds: float, f: Callable[[], None]) -> Callable[[], None]:
+    """Calls `f` on the runtime's background event loop after a delay. Returns a function cancelling the call."""
+    loop = Runtime().event_loop
+    handle: list[asyncio.TimerHandle] = []
+    cancelled = threading.Event()
+
+    def schedule() -> None:
+        if not cancelled.is_set():
+            handle.append(loop.call_later(seconds, f))
+
+    def cancel_handle() -> None:
+        if handle:
+            handle[0].cancel()
+
+    def cancel() -> None:
+        cancelled.set()
+        loop.call_soon_threadsafe(cancel_handle)
+
+    loop.call_soon_threadsafe(schedule)
+    return cancel
+
+
+def _await_callback(node: Async[Any, Any] | FromAwaitable[Any, Any]) -> tuple[Any, Any]:
+    """Registers a callback for an Async or FromAwaitable node and blocks the calling thread until it fires."""
+    done = threading.Event()
+    outcome: list[tuple[Any, Any]] = []
+
+    def callback(error: Any, value: Any) -> None:
+        outcome.append((error, value))
+        done.set()
+
+    try:
+        node.register(callback)
+    except Exception as e:
+        return e, None
+    done.wait()
+    return outcome[0]
+
+
+async def _await_callback_async(node: Async[Any, Any]) -> tuple[Any, Any]:
+    """Registers a callback for an Async node and waits for it without blocking the running event loop."""
+    loop = asyncio.get_running_loop()
+    future: asyncio.Future[tuple[Any, Any]] = loop.create_future()
+
+    def set_outcome(outcome: tuple[Any, Any]) -> None:
+        if not future.done():
+            future.set_result(outcome)
+
+    def callback(error: Any, value: Any) -> None:
+        loop.call_soon_threadsafe(set_outcome, (error, value))
+
+    try:
+        canceler = node.register(callback)
+    except Exception as e:
+        return e, None
+    try:
+        return await future
+    except asyncio.CancelledError:
+        if canceler is not None:
+            canceler()
+        raise
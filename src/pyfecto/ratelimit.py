@@ -0,0 +1,99 @@
+"""
+Rate limiting of effects with a token bucket.
+
+A RateLimiter holds a bucket that refills at a steady rate. Every limited effect takes a token before it starts;
+when the bucket is empty it waits its turn with PYIO.sleep, so a fiber or an effect under run_async() waits
+without holding a thread. The bucket is shared by everything that uses the limiter, across fibers and threads.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, TypeVar
+
+from .pyio import PYIO
+
+A = TypeVar("A")
+E = TypeVar("E", bound=Exception | None)
+
+
+class RateLimiter:
+    """
+    Lets effects start at no more than `n` per `per` seconds.
+
+    By default the starts are spread out evenly, one every `per / n` seconds, so a downstream API never sees a
+    burst. Raising `burst` lets up to that many effects start at once after the limiter has been idle, while the
+    long-run rate stays the same. Waiting effects are served in the order they asked.
+
+    Usage:
+        limiter = RateLimiter(10, per=1.0)
+        foreach_par(user_ids, lambda user_id: limiter.limit(fetch_user(user_id)))
+    """
+
+    def __init__(self, n: int, per: float = 1.0, burst: int = 1):
+        """
+        Args:
+            n: Number of effects allowed to start per period
+            per: Length of the period, in seconds
+            burst: Number of effects allowed to start at once after the limiter has been idle
+        """
+        if n < 1:
+            raise ValueError(f"n must be at least 1, got {n}")
+        if per <= 0:
+            raise ValueError(f"per must be positive, got {per}")
+        if burst < 1:
+            raise ValueError(f"burst must be at least 1, got {burst}")
+        self.rate = n / per
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def acquire(self, cost: int = 1) -> PYIO[None, None]:
+        """
+        Waits until `cost` tokens are available and takes them.
+
+        Args:
+            cost: Number of tokens to take, e.g. the number of items in a bulk request
+        """
+        if cost < 1:
+            raise ValueError(f"cost must be at least 1, got {cost}")
+        return PYIO.defer(lambda: PYIO.sleep(self._reserve(cost)))
+
+    def limit(self, effect: PYIO[E, A], cost: int = 1) -> PYIO[E, A]:
+        """
+        Runs the effect once the limiter lets it start.
+
+        Args:
+            effect: The effect to limit
+            cost: Number of tokens the effect takes
+        """
+        # Typed loosely, so that the wait adopts the error type of the effect
+        wait: PYIO[Any, None] = self.acquire(cost)
+        return wait.then(effect)
+
+    def _reserve(self, cost: int) -> float:
+        """
+        Takes the tokens right away, letting the bucket go into debt, and returns how long the caller has to wait
+        for the debt to be paid off. Later callers wait behind it, which keeps the order fair without a queue.
+        """
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._updated = now
+            self._tokens -= cost
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+def throttle(n: int, per: float = 1.0) -> RateLimiter:
+    """
+    Creates the limiter for the `throttle` argument of the collection functions, starting at most `n` items per
+    `per` seconds, evenly spaced. Pass the same limiter to several calls to share the budget between them.
+
+    Args:
+        n: Number of items allowed to start per period
+        per: Length of the period, in seconds
+    """
+    return RateLimiter(n, per)
@@ -0,0 +1,434 @@
+"""
+Safe handling of resources that must be released after use, and pooling of expensive ones.
+
+Scoped describes how to acquire a resource and how to release it. Using it runs an effect with the resource and
+guarantees the release, even if the effect fails or is interrupted. ResourcePool keeps released resources around
+so that thousands of effect runs can share a handful of connections instead of opening one each.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Generic, Optional, TypeVar, cast
+
+from .fiber import Fiber
+from .pyio import (
+    PYIO,
+    Async,
+    Defer,
+    Ensuring,
+    Fail,
+    Interruptible,
+    Succeed,
+    Sync,
+    Uninterruptible,
+    _call_later,
+)
+
+A = TypeVar("A")
+B = TypeVar("B")
+R = TypeVar("R")
+E = TypeVar("E", bound=Exception | None)
+
+# Runs an effect with a resource: receives the function using the resource and returns the complete effect
+UseWith = Callable[[Callable[[Any], PYIO[Any, Any]]], PYIO[Any, Any]]
+
+
+class Scoped(Generic[E, R]):
+    """
+    A resource, or several, bound to the region of code using it.
+
+    Nothing is acquired until `use` runs. Scoped resources compose with map, flat_map and zip; a combined Scoped
+    acquires its resources in order and releases them in reverse order, each release running even if the use, a
+    later acquisition or another release fails.
+
+    Type Variables:
+        E: Error type of the acquisition
+        R: Type of the resource
+    """
+
+    def __init__(self, use_with: UseWith):
+        """
+        Args:
+            use_with: Runs an effect with the resource and releases the resource afterwards
+        """
+        self._use_with = use_with
+
+    @staticmethod
+    def acquire_release(
+        acquire: PYIO[E, R], release: Callable[[R], PYIO[Any, Any]]
+    ) -> Scoped[E, R]:
+        """
+        Describes a resource acquired by one effect and released by another. See PYIO.acquire_release.
+
+        Args:
+            acquire: The effect acquiring the resource
+            release: A function returning the effect that releases the resource
+        """
+
+        def use_with(use: Callable[[R], PYIO[Any, Any]]) -> PYIO[Any, Any]:
+            def bracket(resource: R) -> PYIO[Any, Any]:
+                return Ensuring(
+                    Interruptible(Defer(lambda: use(resource))),
+                    Defer(lambda: release(resource)),
+                )
+
+            return Uninterruptible(acquire.flat_map(bracket))
+
+        return Scoped(use_with)
+
+    def use(self, f: Callable[[R], PYIO[E, A]]) -> PYIO[E, A]:
+        """
+        Acquires the resource, runs the effect returned by f with it, and releases the resource.
+
+        Args:
+            f: A function that maps the resource to the effect using it
+        """
+        return cast(PYIO[E, A], Defer(lambda: self._use_with(f)))
+
+    def map(self, f: Callable[[R], B]) -> Scoped[E, B]:
+        """
+        Transforms the resource handed to the user, e.g. to wrap a connection in a repository.
+
+        Args:
+            f: Function to apply to the resource
+        """
+        return Scoped(lambda use: self._use_with(lambda resource: use(f(resource))))
+
+    def flat_map(self, f: Callable[[R], Scoped[E, B]]) -> Scoped[E, B]:
+        """
+        Acquires a second resource that depends on the first; both stay acquired while the second is used, and the
+        second is released before the first.
+
+        Args:
+            f: A function that maps the first resource to the Scoped describing the second
+        """
+        return Scoped(
+            lambda use: self._use_with(lambda resource: f(resource)._use_with(use))
+        )
+
+    def zip(self, that: Scoped[E, B]) -> Scoped[E, tuple[R, B]]:
+        """
+        Acquires both resources, this one first, and hands them over as a pair.
+
+        Args:
+            that: Another resource to acquire
+        """
+        return self.flat_map(lambda a: that.map(lambda b: (a, b)))
+
+
+class _Waiter:
+    """A checkout from a ResourcePool: what it was granted, and whether the grant has been taken over."""
+
+    __slots__ = ("grant", "callback", "taken")
+
+    def __init__(self) -> None:
+        # ("idle", resource) for a pooled resource, ("new", None) for the right to create one
+        self.grant: Optional[tuple[str, Any]] = None
+        self.callback: Optional[Callable[[Any, Any], None]] = None
+        self.taken = False
+
+
+class ResourcePool(Generic[E, R]):
+    """
+    A pool of reusable resources, such as database connections, created with `acquire` and destroyed with
+    `release`.
+
+    At most `max_size` resources exist at a time. Checking out a resource reuses an idle one when there is one,
+    creates a new one while below `max_size`, and otherwise waits for another user to return one. Waiting fibers
+    do not hold a thread and can be interrupted, e.g. by a timeout. Resources idle for longer than `idle_timeout`
+    are released on a timer, whether or not the pool is still used, keeping at least `min_size` of them, and an
+    idle resource failing `health_check` is replaced instead of being handed out.
+
+    Usage:
+        pool = ResourcePool(PYIO.attempt(db.connect), lambda c: PYIO.attempt(c.close), max_size=10)
+        rows = pool.use(lambda c: PYIO.attempt(lambda: c.execute(query)))
+
+    Type Variables:
+        E: Error type of creating a resource
+        R: Type of the pooled resources
+    """
+
+    def __init__(
+        self,
+        acquire: PYIO[E, R],
+        release: Callable[[R], PYIO[Any, Any]],
+        min_size: int = 0,
+        max_size: int = 10,
+        idle_timeout: Optional[float] = None,
+        health_check: Optional[Callable[[R], PYIO[Any, bool]]] = None,
+    ):
+        """
+        Args:
+            acquire: The effect creating a new resource
+            release: A function returning the effect that destroys a resource
+            min_size: Number of resources kept even when idle for longer than `idle_timeout`
+            max_size: Maximum number of resources in existence, in use or idle
+            idle_timeout: Seconds after which an idle resource is released (if None, idle resources are kept)
+            health_check: A function returning an effect that tells whether an idle resource is still usable; it
+                runs before the resource is handed out, and failing it counts as unhealthy
+        """
+        if max_size < 1:
+            raise ValueError(f"max_size must be at least 1, got {max_size}")
+        if not 0 <= min_size <= max_size:
+            raise ValueError(f"min_size must be between 0 and max_size, got {min_size}")
+        self._acquire = acquire
+        self._release = release
+        self.min_size = min_size
+        self.max_size = max_size
+        self._idle_timeout = idle_timeout
+        self._health_check = health_check
+        self._lock = threading.Lock()
+        # Idle resources with the time they were returned, most recently returned last
+        self._idle: deque[tuple[R, float]] = deque()
+        self._waiters: deque[_Waiter] = deque()
+        # Resources in existence, including those being created
+        self._size = 0
+        self._closed = False
+        # Cancels the timer evicting expired idle resources, while one is scheduled
+        self._eviction: Optional[Callable[[], None]] = None
+
+    @property
+    def size(self) -> int:
+        """Number of resources currently in existence, idle or in use."""
+        return self._size
+
+    @property
+    def idle(self) -> int:
+        """Number of idle resources ready to be handed out."""
+        return len(self._idle)
+
+    def get(self) -> Scoped[E, R]:
+        """A resource from the pool, returned to the pool once its use completes."""
+        return Scoped(self._use_with)
+
+    def use(self, f: Callable[[R], PYIO[E, A]]) -> PYIO[E, A]:
+        """
+        Checks out a resource, runs the effect returned by f with it, and returns the resource to the pool.
+
+        Args:
+            f: A function that maps the resource to the effect using it
+        """
+        return self.get().use(f)
+
+    def warm_up(self) -> PYIO[E, None]:
+        """Creates resources until the pool holds at least `min_size`, so the first users do not wait for them."""
+
+        def reserve() -> bool:
+            with self._lock:
+                if self._closed or self._size >= self.min_size:
+                    return False
+                self._size += 1
+                return True
+
+        def create(reserved: bool) -> PYIO[Any, None]:
+            if not reserved:
+                return PYIO.unit()
+            return self._create().flat_map(self._give_back)
+
+        effect: PYIO[Any, None] = PYIO.unit()
+        for _ in range(self.min_size):
+            effect = effect.then(Uninterruptible(Sync(reserve).flat_map(create)))
+        return cast(PYIO[E, None], effect)
+
+    def close(self) -> PYIO[None, None]:
+        """
+        Releases the idle resources and stops pooling: resources still in use are released when they are returned,
+        and checkouts waiting for a resource fail.
+        """
+
+        def drain() -> list[R]:
+            with self._lock:
+                self._closed = True
+                idle = [resource for resource, _ in self._idle]
+                self._size -= len(idle)
+                self._idle.clear()
+                waiters = list(self._waiters)
+                self._waiters.clear()
+                eviction, self._eviction = self._eviction, None
+            if eviction is not None:
+                eviction()
+            for waiter in waiters:
+                if waiter.callback is not None:
+                    waiter.callback(_closed_error(), None)
+            return idle
+
+        return Uninterruptible(Sync(drain).flat_map(self._release_all))
+
+    def _use_with(self, use: Callable[[R], PYIO[Any, Any]]) -> PYIO[Any, Any]:
+        """
+        Checks out a resource for `use`. The whole checkout is uninterruptible except for the wait for a free
+        resource, and whatever the waiter was granted is handed back to the pool if it is interrupted.
+        """
+        waiter = _Waiter()
+
+        def take(_: Any) -> tuple[str, Any]:
+            with self._lock:
+                waiter.taken = True
+                return cast(tuple[str, Any], waiter.grant)
+
+        def lease(grant: tuple[str, Any]) -> PYIO[Any, R]:
+            kind, resource = grant
+            if kind == "new" or self._health_check is None:
+                return self._create() if kind == "new" else Succeed(resource)
+
+            def checked(healthy: bool) -> PYIO[Any, R]:
+                if healthy:
+                    return Succeed(resource)
+                # Replace the broken resource, reusing its slot
+                return self._release_quietly(resource).then(self._create())
+
+            return (
+                self._health_check(resource)
+                .match(lambda _: False, bool)
+                .flat_map(checked)
+            )
+
+        def bracket(resource: R) -> PYIO[Any, Any]:
+            return Ensuring(
+                Interruptible(Defer(lambda: use(resource))),
+                Defer(lambda: self._give_back(resource)),
+            )
+
+        checkout: PYIO[Any, tuple[str, Any]] = Ensuring(
+            Interruptible(Async(lambda callback: self._wait(waiter, callback))).map(
+                take
+            ),
+            Defer(lambda: self._abandon(waiter)),
+        )
+        return Uninterruptible(checkout.flat_map(lease).flat_map(bracket))
+
+    def _wait(self, waiter: _Waiter, callback: Callable[[Any, Any], None]) -> None:
+        """Grants the waiter an idle resource or a new slot right away, or queues it until one is available."""
+        error: Optional[Exception] = None
+        with self._lock:
+            queued = False
+            if self._closed:
+                error = _closed_error()
+            elif self._idle:
+                waiter.grant = ("idle", self._idle.pop()[0])
+            elif self._size < self.max_size:
+                self._size += 1
+                waiter.grant = ("new", None)
+            else:
+                waiter.callback = callback
+                self._waiters.append(waiter)
+                queued = True
+        if not queued:
+            callback(error, None)
+
+    def _abandon(self, waiter: _Waiter) -> PYIO[None, None]:
+        """Runs once a checkout's wait is over: hands back what the waiter got if it was interrupted first."""
+        with self._lock:
+            if waiter.taken:
+                return PYIO.unit()
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                return PYIO.unit()
+            grant = waiter.grant
+        if grant is None:
+            return PYIO.unit()
+        if grant[0] == "idle":
+            return self._give_back(grant[1])
+        self._free_slot()
+        return PYIO.unit()
+
+    def _create(self) -> PYIO[Any, R]:
+        """Creates a resource in a slot reserved beforehand, freeing the slot if that fails."""
+
+        def free_slot(error):
+            self._free_slot()
+            return Fail(error)
+
+        return self._acquire.recover(free_slot)
+
+    def _give_back(self, resource: R) -> PYIO[None, None]:
+        """
+        Hands a returned resource to the next waiter, or keeps it idle. Returns the effect releasing it if the pool
+        has been closed in the meantime.
+        """
+        with self._lock:
+            if self._closed:
+                self._size -= 1
+                return self._release_quietly(resource)
+            if not self._waiters:
+                self._idle.append((resource, time.monotonic()))
+                self._schedule_eviction()
+                return PYIO.unit()
+            waiter = self._waiters.popleft()
+            waiter.grant = ("idle", resource)
+            callback = waiter.callback
+        if callback is not None:
+            callback(None, None)
+        return PYIO.unit()
+
+    def _free_slot(self) -> None:
+        """Gives up a slot whose resource is gone, letting the next waiter create a resource in it."""
+        with self._lock:
+            if not self._waiters or self._closed:
+                self._size -= 1
+                return
+            waiter = self._waiters.popleft()
+            waiter.grant = ("new", None)
+            callback = waiter.callback
+        if callback is not None:
+            callback(None, None)
+
+    def _schedule_eviction(self) -> None:
+        """
+        Starts the timer evicting the oldest idle resource once it expires, unless one is running or no idle
+        resource can be evicted. Call under the lock.
+        """
+        if (
+            self._idle_timeout is None
+            or self._eviction is not None
+            or not self._idle
+            or self._size <= self.min_size
+        ):
+            return
+        expires_at = self._idle[0][1] + self._idle_timeout
+        self._eviction = _call_later(
+            max(expires_at - time.monotonic(), 0.0), self._evict_expired
+        )
+
+    def _evict_expired(self) -> None:
+        """
+        Runs on the eviction timer: removes the resources idle for longer than the idle timeout, down to min_size,
+        releases them on a fiber, and starts the timer again for the resources still idle.
+        """
+        deadline = time.monotonic() - cast(float, self._idle_timeout)
+        expired: list[R] = []
+        with self._lock:
+            self._eviction = None
+            if self._closed:
+                return
+            # The least recently returned resources are at the front
+            while (
+                self._idle
+                and self._idle[0][1] <= deadline
+                and self._size > self.min_size
+            ):
+                expired.append(self._idle.popleft()[0])
+                self._size -= 1
+            self._schedule_eviction()
+        if expired:
+            Fiber.start(self._release_all(expired))
+
+    def _release_all(self, resources: list[R]) -> PYIO[Any, None]:
+        """Releases resources the pool is dropping, one after another."""
+        effect: PYIO[Any, None] = PYIO.unit()
+        for resource in resources:
+            effect = effect.then(self._release_quietly(resource))
+        return effect
+
+    def _release_quietly(self, resource: R) -> PYIO[None, None]:
+        """Releases a resource the pool is dropping; nobody is waiting on the outcome, so failures are ignored."""
+        return Defer(lambda: self._release(resource)).match(
+            lambda _: None, lambda _: None
+        )
+
+
+def _closed_error() -> RuntimeError:
+    return RuntimeError("ResourcePool is closed")
@@ -1,16 +1,35 @@
+import asyncio
 import sys
-from typing import (TYPE_CHECKING, Any, Callable, Dict, List, Optional,
-                    TypeVar, Union)
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, TypeVar, Union
 
 from loguru import logger as loguru_logger
 
 # Import PyfectoApp only for type checking
 if TYPE_CHECKING:
     from .app import PyfectoApp
+    from .cache import CacheStats
+    from .circuit import CircuitStats
+    from .log_pipeline import LogPipeline
+    from .log_sampling import LogSampler
+    from .metrics import MetricsRegistry
+    from .tracing import Tracer
 
 LOGGER = loguru_logger
 E = TypeVar("E", bound=Exception)
 
+# Severity of loguru's built-in levels, so that checking whether a level is enabled needs no call into loguru
+_LEVEL_NUMBERS = {
+    "TRACE": 5,
+    "DEBUG": 10,
+    "INFO": 20,
+    "SUCCESS": 25,
+    "WARNING": 30,
+    "ERROR": 40,
+    "CRITICAL": 50,
+}
+
 
 class Runtime:
     """
@@ -27,12 +46,25 @@ class Runtime:
     Features:
         - Singleton instance management
         - Configurable logging with multiple sinks
+        - Level checks that skip disabled log effects without building their messages
+        - Optional non-blocking log pipeline for the log effects
+        - Optional sampling of high-volume log effects
         - Support for span timing
+        - Export of tracing spans
+        - Registry of counters, gauges and histograms
         - Application execution with error handling
+        - Worker thread pool for running forked fibers
+        - Background event loop for awaitables run outside of asyncio
+        - Running applications under asyncio
+        - Process pool for CPU-bound work
+        - Accounting of timed out effects still holding a worker thread
+        - Counters of the effect caches in use
+        - State of the circuit breakers in use
     """
 
     _instance = None
     _initialized = False
+    _executor_lock = threading.Lock()
 
     def __new__(cls, *args, **kwargs):
         """
@@ -54,6 +86,12 @@ class Runtime:
         log_level: str = "INFO",
         log_format: Optional[str] = None,
         sinks: Optional[List[Union[Dict[str, Any], Callable]]] = None,
+        max_workers: Optional[int] = None,
+        max_processes: Optional[int] = None,
+        log_pipeline: Optional["LogPipeline"] = None,
+        log_sampler: Optional["LogSampler"] = None,
+        tracer: Optional["Tracer"] = None,
+        metrics: Optional["MetricsRegistry"] = None,
     ):
         """
         Initialize the runtime with configurable logging.
@@ -69,6 +107,15 @@ class Runtime:
                 Each sink can be either:
                 - A callable function that accepts a message string
                 - A dict with parameters to pass to logger.add() (must include 'sink')
+            max_workers: Number of worker threads fibers are scheduled on (if None, the ThreadPoolExecutor
+                default is used)
+            max_processes: Number of worker processes for CPU-bound effects (if None, the number of CPUs)
+            log_pipeline: Buffer the records of the log effects are handed to, to be written by a background
+                thread (if None, they are written by the thread running the effect)
+            log_sampler: Decides which records of the log effects and log spans are written, reporting how many
+                were suppressed (if None, all are written)
+            tracer: Exports the spans of traced effects (if None, spans are not exported)
+            metrics: Registry timed and counted effects record to (if None, an empty one is created on first use)
 
         Example:
             # Custom runtime with file logging
@@ -83,6 +130,16 @@ class Runtime:
         if self._initialized:
             return
         self.log_level = log_level
+        self.max_workers = max_workers
+        self.max_processes = max_processes
+        self.log_pipeline = log_pipeline
+        self.log_sampler = log_sampler
+        self.tracer = tracer
+        self._metrics = metrics
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._event_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._abandoned = 0
         self._configure_logger(log_format, sinks)
         self.logger = loguru_logger
         self._initialized = True
@@ -137,12 +194,159 @@ class Runtime:
 
         if not sinks:
             loguru_logger.add(sink=sys.stderr, format=log_format, level=self.log_level)
+            levels = [self.log_level]
         else:
             configure_sinks()
+            levels = [
+                self.log_level if callable(sink) else sink.get("level", self.log_level)
+                for sink in sinks
+            ]
+        self._min_log_level = min(_level_number(level) for level in levels)
+
+    def log_enabled(self, level: str) -> bool:
+        """
+        Whether a record at the given level reaches any of the runtime's sinks.
+        The log effects check this first, so a disabled one neither builds its message nor calls the logger.
+
+        Args:
+            level: Name of the log level, e.g. "DEBUG"
+        """
+        number = _LEVEL_NUMBERS.get(level)
+        if number is None:
+            number = _level_number(level)
+        return number >= self._min_log_level
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """
+        The worker pool forked fibers are scheduled on, created on first use.
+
+        Fibers run cooperatively on these threads: a fiber gives its thread back to the pool whenever it waits
+        on another fiber or a callback, and periodically while running long computations.
+        """
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="pyfecto-fiber"
+                    )
+        return self._executor
+
+    @property
+    def event_loop(self) -> asyncio.AbstractEventLoop:
+        """
+        An event loop running on a background daemon thread, started on first use.
+
+        Awaitables wrapped with PYIO.from_awaitable run on this loop when the effect is executed with run() or on
+        a fiber, so they never need an event loop of their own.
+        """
+        if self._event_loop is None:
+            with self._executor_lock:
+                if self._event_loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(
+                        target=loop.run_forever, name="pyfecto-event-loop", daemon=True
+                    ).start()
+                    self._event_loop = loop
+        return self._event_loop
+
+    @property
+    def process_pool(self) -> ProcessPoolExecutor:
+        """
+        The pool of worker processes CPU-bound effects are shipped to, created on first use.
+
+        Work submitted here must be picklable: module-level functions and their arguments.
+        """
+        if self._process_pool is None:
+            with self._executor_lock:
+                if self._process_pool is None:
+                    self._process_pool = ProcessPoolExecutor(
+                        max_workers=self.max_processes
+                    )
+        return self._process_pool
+
+    @property
+    def metrics(self) -> "MetricsRegistry":
+        """
+        The registry of the application's metrics, which PYIO.timed and PYIO.counted record to. Created on first
+        use unless one was given to the constructor.
+        """
+        if self._metrics is None:
+            with self._executor_lock:
+                if self._metrics is None:
+                    from .metrics import MetricsRegistry
+
+                    self._metrics = MetricsRegistry()
+        return self._metrics
+
+    @property
+    def abandoned_effects(self) -> int:
+        """
+        Number of effects that exceeded their PYIO.timeout() but are still holding a worker thread, typically
+        stuck in a blocking call. A steadily growing number means the pool is being drained by hung calls.
+        """
+        return self._abandoned
+
+    def _track_abandoned(self, fiber: Any) -> None:
+        """Counts a timed out fiber as abandoned until it actually stops."""
+
+        def stopped(error: Any, value: Any) -> None:
+            with self._executor_lock:
+                self._abandoned -= 1
+
+        with self._executor_lock:
+            self._abandoned += 1
+        fiber._observe(stopped)
+
+    def cache_stats(self) -> Dict[str, "CacheStats"]:
+        """
+        The hit, miss and eviction counters of every live EffectCache, by cache name.
+        """
+        from .cache import _live_caches
+
+        return {name: cache.stats() for name, cache in _live_caches()}
+
+    def circuit_breaker_stats(self) -> Dict[str, "CircuitStats"]:
+        """
+        The state and counters of every live CircuitBreaker, by breaker name.
+        """
+        from .circuit import _live_breakers
+
+        return {name: breaker.stats() for name, breaker in _live_breakers()}
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Shut down the worker pool, the process pool and the background event loop. Each is recreated if it is
+        needed again.
+
+        Args:
+            wait: If True, block until all scheduled fiber and process work has finished, then write the log
+                sampler's summary of suppressed records, and wait until the log pipeline and the tracer, if any,
+                have written out their buffered records and spans
+        """
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+            process_pool, self._process_pool = self._process_pool, None
+            loop, self._event_loop = self._event_loop, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+        if process_pool is not None:
+            process_pool.shutdown(wait=wait)
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+        if wait and self.log_sampler is not None:
+            self.log_sampler.flush()
+        if wait and self.log_pipeline is not None:
+            self.log_pipeline.flush()
+        if wait and self.tracer is not None:
+            self.tracer.flush()
 
     @staticmethod
     def run_app(
-        app: "PyfectoApp[E]", exit_on_error: bool = True, error_code: int = 1
+        app: "PyfectoApp[E]",
+        exit_on_error: bool = True,
+        error_code: int = 1,
+        use_asyncio: bool = False,
     ) -> None:
         """
         Execute a PyfectoApp with the runtime environment.
@@ -156,11 +360,16 @@ class Runtime:
             app: The PyfectoApp instance to run
             exit_on_error: If True, will exit the process when an error occurs
             error_code: Exit code to use when exiting on error
+            use_asyncio: If True, run the effect with run_async() under asyncio.run(), so awaitables in the
+                application share a single event loop
 
         Returns:
             None
         """
-        result = app.run().run()
+        if use_asyncio:
+            result = asyncio.run(app.run().run_async())
+        else:
+            result = app.run().run()
         if isinstance(result, Exception):
             LOGGER.error(f"Application failed: {result}")
             if exit_on_error:
@@ -169,3 +378,13 @@ class Runtime:
                 raise result
         else:
             LOGGER.info("Application completed successfully")
+
+
+def _level_number(level: Union[str, int]) -> int:
+    """The severity of a level given by name or number, including custom levels registered with loguru."""
+    if isinstance(level, int):
+        return level
+    number = _LEVEL_NUMBERS.get(level)
+    if number is None:
+        number = loguru_logger.level(level).no
+    return number
@@ -0,0 +1,189 @@
+"""
+Schedules: composable policies deciding whether, and after how long, to retry or repeat an effect.
+
+A Schedule is an immutable description. Each time a retried or repeated effect runs, the schedule starts a fresh
+driver that is consulted after every attempt with that attempt's error (retry) or value (repeat). The driver
+answers with the delay in seconds before the next attempt, or None to stop.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from typing import Any, Callable, Optional
+
+# Consulted after each attempt with its input; returns the delay before the next one, or None to stop
+Driver = Callable[[Any], Optional[float]]
+
+
+class Schedule:
+    """
+    A policy for retrying failed effects with PYIO.retry or repeating successful ones with PYIO.repeat.
+
+    Schedules are built from the constructors below and combined with intersect (`&`: continue while both do,
+    waiting the longer delay) and union (`|`: continue while either does, waiting the shorter delay):
+
+        # Exponential backoff starting at 100ms, with jitter, at most 5 retries and never past 10 seconds
+        policy = Schedule.exponential(0.1).jittered() & Schedule.recurs(5) & Schedule.up_to(10)
+    """
+
+    __slots__ = ("_start",)
+
+    def __init__(self, start: Callable[[], Driver]):
+        """
+        Args:
+            start: Creates a fresh driver each time the schedule is used
+        """
+        self._start = start
+
+    @staticmethod
+    def fixed(seconds: float) -> Schedule:
+        """
+        Recurs forever, waiting the same delay between attempts.
+
+        Args:
+            seconds: Delay before each new attempt
+        """
+        _check_non_negative("seconds", seconds)
+        return Schedule(lambda: lambda _: seconds)
+
+    @staticmethod
+    def exponential(
+        base: float, factor: float = 2.0, max_delay: Optional[float] = None
+    ) -> Schedule:
+        """
+        Recurs forever, waiting `base`, then `base * factor`, `base * factor ** 2` and so on between attempts.
+
+        Args:
+            base: Delay before the first new attempt, in seconds
+            factor: Growth of the delay from one attempt to the next
+            max_delay: Upper bound on the delay, if any
+        """
+        _check_non_negative("base", base)
+        if factor < 1:
+            raise ValueError(f"factor must be at least 1, got {factor}")
+
+        def start() -> Driver:
+            delay = [base]
+
+            def next_delay(_: Any) -> float:
+                current = delay[0]
+                delay[0] = current * factor
+                return current if max_delay is None else min(current, max_delay)
+
+            return next_delay
+
+        return Schedule(start)
+
+    @staticmethod
+    def recurs(n: int) -> Schedule:
+        """
+        Recurs `n` times without delay: retries a failing effect up to `n` times, or repeats a successful one
+        `n` more times.
+
+        Args:
+            n: Maximum number of recurrences
+        """
+        if n < 0:
+            raise ValueError(f"n must not be negative, got {n}")
+
+        def start() -> Driver:
+            remaining = [n]
+
+            def next_delay(_: Any) -> Optional[float]:
+                if remaining[0] == 0:
+                    return None
+                remaining[0] -= 1
+                return 0.0
+
+            return next_delay
+
+        return Schedule(start)
+
+    @staticmethod
+    def up_to(seconds: float) -> Schedule:
+        """
+        Recurs without delay until `seconds` have passed since the first attempt started.
+        Intersect it with another schedule to put a deadline on that schedule.
+
+        Args:
+            seconds: Time budget for all attempts together
+        """
+        _check_non_negative("seconds", seconds)
+
+        def start() -> Driver:
+            deadline = time.monotonic() + seconds
+            return lambda _: 0.0 if time.monotonic() < deadline else None
+
+        return Schedule(start)
+
+    def intersect(self, other: Schedule) -> Schedule:
+        """
+        Recurs only while both schedules recur, waiting the longer of their two delays.
+
+        Args:
+            other: The schedule to combine with
+        """
+        return Schedule(lambda: _combine(self._start(), other._start(), max, True))
+
+    def union(self, other: Schedule) -> Schedule:
+        """
+        Recurs while either schedule recurs, waiting the shorter of the delays of those that do.
+
+        Args:
+            other: The schedule to combine with
+        """
+        return Schedule(lambda: _combine(self._start(), other._start(), min, False))
+
+    def __and__(self, other: Schedule) -> Schedule:
+        return self.intersect(other)
+
+    def __or__(self, other: Schedule) -> Schedule:
+        return self.union(other)
+
+    def jittered(self, fraction: float = 0.5) -> Schedule:
+        """
+        Randomizes each delay by up to `fraction` of its value in either direction, so that many clients backing
+        off at the same time do not retry in lockstep.
+
+        Args:
+            fraction: How far a delay may move, between 0 and 1
+        """
+        if not 0 <= fraction <= 1:
+            raise ValueError(f"fraction must be between 0 and 1, got {fraction}")
+
+        def start() -> Driver:
+            driver = self._start()
+
+            def next_delay(input: Any) -> Optional[float]:
+                delay = driver(input)
+                if delay is None:
+                    return None
+                return delay * random.uniform(1 - fraction, 1 + fraction)
+
+            return next_delay
+
+        return Schedule(start)
+
+
+def _combine(
+    left: Driver,
+    right: Driver,
+    pick: Callable[[float, float], float],
+    both: bool,
+) -> Driver:
+    def next_delay(input: Any) -> Optional[float]:
+        # Both drivers see every attempt so their state stays in step
+        first, second = left(input), right(input)
+        if first is None or second is None:
+            if both:
+                return None
+            return first if second is None else second
+        return pick(first, second)
+
+    return next_delay
+
+
+def _check_non_negative(name: str, seconds: float) -> None:
+    if seconds < 0:
+        raise ValueError(f"{name} must not be negative, got {seconds}")
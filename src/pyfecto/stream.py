@@ -0,0 +1,385 @@
+"""
+Effectful streams built on PYIO.
+
+A PStream describes a sequence of values that is produced lazily, in chunks, when one of its run_* methods is
+executed. Elements are pulled from the source only as fast as the end of the pipeline consumes them, so a stream
+over millions of records holds a bounded number of chunks in memory at any time. Failures of the effects inside
+a stream travel through the usual PYIO error channel.
+
+Pulling a chunk is itself an effect, chained to the next one with flat_map, so a stream waiting on its effects,
+such as those of map_par, suspends like any other effect instead of blocking the thread running it.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from functools import partial
+from typing import Any, Callable, Generic, Iterable, Iterator, Optional, TypeVar
+
+from .collections import foreach
+from .fiber import Fiber
+from .pyio import PYIO
+
+A = TypeVar("A")
+B = TypeVar("B")
+S = TypeVar("S")
+E = TypeVar("E", bound=Exception | None)
+
+# Number of elements per chunk when a stream is created from an iterable.
+DEFAULT_CHUNK_SIZE = 1_024
+
+
+class _Pull(Generic[E, A]):
+    """
+    One run of a stream. `pull()` builds the effect producing the next chunk, or None once the stream has ended,
+    and `close()` releases what the run still holds, such as the fibers of map_par, when it stops.
+    """
+
+    __slots__ = ("pull", "close")
+
+    def __init__(
+        self,
+        pull: Callable[[], PYIO[Any, Optional[list[A]]]],
+        close: Callable[[], None] = lambda: None,
+    ):
+        self.pull = pull
+        self.close = close
+
+
+class PStream(Generic[E, A]):
+    """
+    A lazy, chunked stream of values of type A whose processing may fail with an error of type E.
+
+    Transformations return new streams and do nothing by themselves; the stream is only pulled when an effect
+    returned by run_fold, run_collect or run_foreach is run. Pure transformations such as map and filter work on
+    whole chunks at once, while map_pyio, filter_pyio and map_par run an effect per element.
+
+    Type Variables:
+        E: Error type (must be None or inherit from Exception)
+        A: Type of the stream's elements
+    """
+
+    def __init__(self, open: Callable[[], _Pull[E, A]]):
+        """
+        Args:
+            open: A function that starts a fresh run of the stream, returning the _Pull producing its chunks
+        """
+        self._open = open
+
+    @staticmethod
+    def from_iterable(
+        items: Iterable[A], chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> PStream[None, A]:
+        """
+        Creates a stream of the items of an iterable, grouped into chunks of up to `chunk_size` elements.
+        Items are only read while the stream is running. A one-shot iterator such as a generator can only be
+        streamed once.
+
+        Args:
+            items: Any iterable, including generators and file objects
+            chunk_size: Maximum number of elements per chunk
+        """
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+
+        def open() -> _Pull[None, A]:
+            # A generator: the items are only read once the stream is pulled
+            chunks = _chunked(items, chunk_size)
+            return _Pull(lambda: PYIO.attempt(lambda: next(chunks, None)))
+
+        return PStream(open)
+
+    def map(self, f: Callable[[A], B]) -> PStream[E, B]:
+        """
+        Transforms each element with a pure function, one chunk at a time.
+
+        Args:
+            f: Function to apply to each element
+        """
+
+        def open() -> _Pull[E, B]:
+            upstream = self._open()
+
+            def transform(chunk: Optional[list[A]]) -> PYIO[Any, Optional[list[B]]]:
+                if chunk is None:
+                    return PYIO.success(None)
+                return PYIO.attempt(lambda: [f(item) for item in chunk])
+
+            return _Pull(lambda: upstream.pull().flat_map(transform), upstream.close)
+
+        return PStream(open)
+
+    def filter(self, f: Callable[[A], bool]) -> PStream[E, A]:
+        """
+        Keeps the elements satisfying a pure predicate, one chunk at a time.
+
+        Args:
+            f: Predicate deciding which elements to keep
+        """
+
+        def open() -> _Pull[E, A]:
+            upstream = self._open()
+
+            def pull() -> PYIO[Any, Optional[list[A]]]:
+                return upstream.pull().flat_map(keep)
+
+            def keep(chunk: Optional[list[A]]) -> PYIO[Any, Optional[list[A]]]:
+                if chunk is None:
+                    return PYIO.success(None)
+                kept: PYIO[Any, list[A]] = PYIO.attempt(
+                    lambda: [item for item in chunk if f(item)]
+                )
+                return kept.flat_map(partial(_unless_empty, pull))
+
+            return _Pull(pull, upstream.close)
+
+        return PStream(open)
+
+    def map_pyio(self, f: Callable[[A], PYIO[E, B]]) -> PStream[E, B]:
+        """
+        Transforms each element with an effect, in order. The stream fails with the first error encountered.
+        The effects of a chunk run like those of `collections.foreach`, so their DataSource lookups are batched.
+
+        Args:
+            f: A function that maps each element to a PYIO effect
+        """
+
+        def open() -> _Pull[E, B]:
+            upstream = self._open()
+
+            def transform(chunk: Optional[list[A]]) -> PYIO[Any, Any]:
+                if chunk is None:
+                    return PYIO.success(None)
+                return foreach(chunk, f)
+
+            return _Pull(lambda: upstream.pull().flat_map(transform), upstream.close)
+
+        return PStream(open)
+
+    def filter_pyio(self, f: Callable[[A], PYIO[E, bool]]) -> PStream[E, A]:
+        """
+        Keeps the elements for which an effectful predicate returns true. The stream fails with the first error
+        encountered.
+
+        Args:
+            f: A function that takes an element and returns a PYIO effect containing a boolean
+        """
+
+        def open() -> _Pull[E, A]:
+            upstream = self._open()
+
+            def pull() -> PYIO[Any, Optional[list[A]]]:
+                return upstream.pull().flat_map(keep)
+
+            def keep(chunk: Optional[list[A]]) -> PYIO[Any, Optional[list[A]]]:
+                if chunk is None:
+                    return PYIO.success(None)
+                kept = foreach(chunk, f).map(
+                    lambda keeps: [item for item, k in zip(chunk, keeps) if k]
+                )
+                return kept.flat_map(partial(_unless_empty, pull))
+
+            return _Pull(pull, upstream.close)
+
+        return PStream(open)
+
+    def grouped(self, n: int) -> PStream[E, list[A]]:
+        """
+        Groups consecutive elements into lists of `n` elements; the last group may be smaller.
+
+        Args:
+            n: Number of elements per group
+        """
+        if n < 1:
+            raise ValueError(f"group size must be at least 1, got {n}")
+
+        def open() -> _Pull[E, list[A]]:
+            upstream = self._open()
+            group: list[A] = []
+            ended = [False]
+
+            def pull() -> PYIO[Any, Optional[list[list[A]]]]:
+                if ended[0]:
+                    return PYIO.success(None)
+                return upstream.pull().flat_map(split)
+
+            def split(chunk: Optional[list[A]]) -> PYIO[Any, Optional[list[list[A]]]]:
+                nonlocal group
+                if chunk is None:
+                    ended[0] = True
+                    last, group = group, []
+                    return PYIO.success([last] if last else None)
+                groups = []
+                for item in chunk:
+                    group.append(item)
+                    if len(group) == n:
+                        groups.append(group)
+                        group = []
+                return _unless_empty(pull, groups)
+
+            return _Pull(pull, upstream.close)
+
+        return PStream(open)
+
+    def map_par(self, n: int, f: Callable[[A], PYIO[E, B]]) -> PStream[E, B]:
+        """
+        Transforms each element with an effect, running up to `n` effects concurrently on fibers while keeping
+        the order of the elements.
+
+        At most `n` effects are in flight at any time: the next element is only pulled from upstream once the
+        oldest running effect has completed. The stream fails with the first error, in stream order, and the
+        effects still running are interrupted. Waiting on the fibers suspends the stream, so a stream running on
+        a fiber hands its worker thread back to the effects it waits on.
+
+        Args:
+            n: Maximum number of effects running at the same time
+            f: A function that maps each element to a PYIO effect
+        """
+        if n < 1:
+            raise ValueError(f"n must be at least 1, got {n}")
+
+        def open() -> _Pull[E, B]:
+            upstream = self._open()
+            in_flight: deque[Fiber[E, B]] = deque()
+            ended = [False]
+
+            def pull() -> PYIO[Any, Optional[list[B]]]:
+                if ended[0]:
+                    return join_rest([])
+                return upstream.pull().flat_map(start)
+
+            def start(chunk: Optional[list[A]]) -> PYIO[Any, Optional[list[B]]]:
+                if chunk is None:
+                    ended[0] = True
+                    return join_rest([])
+                started = start_each(deque(chunk), [])
+                return started.flat_map(partial(_unless_empty, pull))
+
+            def start_each(pending: deque[A], results: list[B]) -> PYIO[Any, list[B]]:
+                """Starts a fiber per element, first joining the oldest one whenever `n` are in flight."""
+                while pending:
+                    if len(in_flight) >= n:
+                        joined = in_flight[0].join()
+                        return joined.flat_map(
+                            lambda value: start_each(pending, collect(results, value))
+                        )
+                    in_flight.append(Fiber.start(_effect_for(f, pending.popleft())))
+                return PYIO.success(results)
+
+            def join_rest(results: list[B]) -> PYIO[Any, Optional[list[B]]]:
+                """Joins the fibers still in flight, in stream order."""
+                if not in_flight:
+                    return PYIO.success(results or None)
+                joined = in_flight[0].join()
+                return joined.flat_map(lambda value: join_rest(collect(results, value)))
+
+            def collect(results: list[B], value: B) -> list[B]:
+                in_flight.popleft()
+                results.append(value)
+                return results
+
+            def close() -> None:
+                for fiber in in_flight:
+                    fiber._request_interruption()
+                in_flight.clear()
+                upstream.close()
+
+            return _Pull(pull, close)
+
+        return PStream(open)
+
+    def run_fold(self, initial: S, f: Callable[[S, A], S]) -> PYIO[E, S]:
+        """
+        Runs the stream, combining its elements into a single value.
+
+        Args:
+            initial: The starting value
+            f: Combines the value so far with the next element
+        """
+
+        def fold() -> PYIO[E, S]:
+            state = [initial]
+
+            def combine(chunk: list[A]) -> None:
+                for item in chunk:
+                    state[0] = f(state[0], item)
+
+            consumed = self._consume(lambda chunk: PYIO.attempt(lambda: combine(chunk)))
+            return consumed.map(lambda _: state[0])
+
+        return PYIO.defer(fold)
+
+    def run_collect(self) -> PYIO[E, list[A]]:
+        """
+        Runs the stream and collects all of its elements into a list.
+        Only use this for streams known to fit in memory; prefer run_fold or run_foreach otherwise.
+        """
+
+        def collect() -> PYIO[E, list[A]]:
+            results: list[A] = []
+            consumed = self._consume(
+                lambda chunk: PYIO.attempt(lambda: results.extend(chunk))
+            )
+            return consumed.map(lambda _: results)
+
+        return PYIO.defer(collect)
+
+    def run_foreach(self, f: Callable[[A], PYIO[E, Any]]) -> PYIO[E, None]:
+        """
+        Runs the stream, running an effect for each element, e.g. to write it to a sink.
+        The stream stops with the first error encountered.
+
+        Args:
+            f: A function that maps each element to the PYIO effect consuming it
+        """
+        return self._consume(lambda chunk: foreach(chunk, f))
+
+    def _consume(self, consume: Callable[[list[A]], PYIO[E, Any]]) -> PYIO[E, None]:
+        """Runs the stream, passing each chunk to `consume` once the previous one has been consumed."""
+
+        def run() -> PYIO[E, None]:
+            pulled = self._open()
+
+            def step(_: Any) -> PYIO[Any, None]:
+                return pulled.pull().flat_map(next_chunk)
+
+            def next_chunk(chunk: Optional[list[A]]) -> PYIO[Any, None]:
+                if chunk is None:
+                    return PYIO.unit()
+                return consume(chunk).flat_map(step)
+
+            return step(None).ensuring(PYIO.attempt(pulled.close))
+
+        return PYIO.defer(run)
+
+
+def _chunked(items: Iterable[A], chunk_size: int) -> Iterator[list[A]]:
+    """Groups the items into lists of up to `chunk_size` elements."""
+    if isinstance(items, list):
+        for start in range(0, len(items), chunk_size):
+            end = start + chunk_size
+            yield items[start:end]
+        return
+    chunk: list[A] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _unless_empty(
+    pull: Callable[[], PYIO[Any, Optional[list[A]]]], chunk: list[A]
+) -> PYIO[Any, Optional[list[A]]]:
+    """Produces the chunk, or pulls the next one if it is empty, so that streams never produce empty chunks."""
+    return PYIO.success(chunk) if chunk else pull()
+
+
+def _effect_for(f: Callable[[A], PYIO[E, B]], item: A) -> PYIO[Any, Any]:
+    """Builds the effect for an element, turning an exception raised while building it into a failed effect."""
+    try:
+        return f(item)
+    except Exception as e:
+        return PYIO.fail(e)
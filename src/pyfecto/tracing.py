@@ -0,0 +1,477 @@
+"""
+Tracing: timed, nested spans around effects, handed to pluggable exporters.
+
+`effect.traced(name)` wraps an effect in a span. Spans opened while another span's effect runs, through flat_map,
+zip, forked fibers and so on, become its children: they share its trace id and record its span id as their
+parent, so the spans of a trace form a tree. Durations are measured with the monotonic `time.perf_counter_ns()`
+and kept as integer nanoseconds.
+
+Finished spans go to the Tracer configured on the runtime, `Runtime(tracer=Tracer([...]))`, which exports them
+in batches on a background thread. Without a tracer, spans are still tracked, so that log_span can report them,
+but they are not exported.
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextvars
+import json
+import random
+import threading
+import time
+import urllib.request
+from abc import ABC, abstractmethod
+from typing import Any, Optional, TypeVar
+
+from .fiber import FiberInterrupted
+from .pyio import (
+    PYIO,
+    Defer,
+    Ensuring,
+    Fail,
+    Fold,
+    Succeed,
+    Sync,
+    _configured_runtime,
+)
+from .runtime import LOGGER
+
+A = TypeVar("A")
+E = TypeVar("E", bound=Exception | None)
+
+
+class Span:
+    """
+    One timed operation within a trace.
+
+    Attributes:
+        name: What the operation is
+        trace_id: 32 hex digits identifying the trace, shared by all spans of one tree
+        span_id: 16 hex digits identifying the span
+        parent_id: span_id of the enclosing span, or None for the root of a trace
+        attributes: Key-value details about the operation
+        start_ns: Start as read from time.perf_counter_ns(), only meaningful relative to other readings
+        end_ns: End as read from time.perf_counter_ns(), or None while the span is open
+        start_time_unix_ns: Start as nanoseconds since the epoch, for exporters
+        error: The error the operation failed with, FiberInterrupted if it did not complete, or None if it
+            succeeded
+    """
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "attributes",
+        "start_ns",
+        "end_ns",
+        "start_time_unix_ns",
+        "error",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        parent: Optional[Span] = None,
+        attributes: Optional[dict[str, Any]] = None,
+    ):
+        self.name = name
+        self.trace_id: str = (
+            parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        )
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent else None
+        self.attributes: dict[str, Any] = dict(attributes or {})
+        self.start_time_unix_ns = time.time_ns()
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[BaseException] = None
+
+    @property
+    def duration_ns(self) -> Optional[int]:
+        """Nanoseconds from start to end, or None while the span is open."""
+        return None if self.end_ns is None else self.end_ns - self.start_ns
+
+    @property
+    def ok(self) -> bool:
+        """Whether the operation succeeded."""
+        return self.error is None
+
+    def to_dict(self) -> dict[str, Any]:
+        """The span as plain JSON-serializable values."""
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time_unix_ns": self.start_time_unix_ns,
+            "duration_ns": self.duration_ns,
+            "attributes": {
+                key: _plain(value) for key, value in self.attributes.items()
+            },
+            "error": None if self.error is None else repr(self.error),
+        }
+
+    def __repr__(self) -> str:
+        return (
+            f"Span({self.name!r}, span_id={self.span_id}, parent_id={self.parent_id})"
+        )
+
+
+# The span whose effect is running. Fibers carry it over from the code that forked them.
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "pyfecto_current_span", default=None
+)
+
+
+def span(
+    name: str, operation: PYIO[E, A], attributes: Optional[dict[str, Any]] = None
+) -> PYIO[E, A]:
+    """
+    Runs the operation inside a new span, the child of the span the operation is started in, if any.
+    The span ends when the operation completes, fails or is interrupted.
+
+    Args:
+        name: Name of the span
+        operation: The effect to trace
+        attributes: Initial attributes of the span
+    """
+
+    def start() -> PYIO[E, A]:
+        parent = _current_span.get()
+        opened = Span(name, parent, attributes)
+        _current_span.set(opened)
+        completed = [False]
+
+        def on_failure(error: Any) -> PYIO[Any, Any]:
+            completed[0] = True
+            opened.error = error
+            return Fail(error)
+
+        def on_success(value: Any) -> PYIO[Any, Any]:
+            completed[0] = True
+            return Succeed(value)
+
+        def end() -> None:
+            opened.end_ns = time.perf_counter_ns()
+            if not completed[0]:
+                opened.error = FiberInterrupted(
+                    "Span ended before its operation completed"
+                )
+            _current_span.set(parent)
+            runtime = _configured_runtime()
+            if runtime is not None and runtime.tracer is not None:
+                runtime.tracer._on_end(opened)
+
+        return Ensuring(Fold(operation, on_failure, on_success), Sync(end))
+
+    return Defer(start)
+
+
+def current_span() -> PYIO[None, Optional[Span]]:
+    """Produces the span the effect runs in, or None outside of any span."""
+    return PYIO.attempt(_current_span.get)
+
+
+def annotate(**attributes: Any) -> PYIO[None, None]:
+    """
+    Adds attributes to the span the effect runs in. Does nothing outside of any span.
+
+    Args:
+        **attributes: The attributes to add
+    """
+
+    def run() -> None:
+        active = _current_span.get()
+        if active is not None:
+            active.attributes.update(attributes)
+
+    return PYIO.attempt(run)
+
+
+class SpanExporter(ABC):
+    """Receives finished spans from a Tracer, in batches, on the tracer's export thread."""
+
+    @abstractmethod
+    def export(self, spans: list[Span]) -> None:
+        """
+        Exports a batch of finished spans.
+
+        Args:
+            spans: The spans, in the order they ended
+        """
+        pass
+
+    def shutdown(self) -> None:
+        """Releases what the exporter holds, once the tracer is shut down."""
+        pass
+
+
+class InMemoryExporter(SpanExporter):
+    """Keeps exported spans in a list, for tests and debugging."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._spans: list[Span] = []
+
+    @property
+    def spans(self) -> list[Span]:
+        """A copy of the spans exported so far."""
+        with self._lock:
+            return list(self._spans)
+
+    def export(self, spans: list[Span]) -> None:
+        with self._lock:
+            self._spans.extend(spans)
+
+    def clear(self) -> None:
+        """Forgets the spans exported so far."""
+        with self._lock:
+            self._spans.clear()
+
+
+class JsonLinesExporter(SpanExporter):
+    """Appends each span as one JSON object per line to a file, see Span.to_dict for the fields."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: The file to append to
+        """
+        self.path = path
+
+    def export(self, spans: list[Span]) -> None:
+        lines = "".join(json.dumps(span.to_dict()) + "\n" for span in spans)
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(lines)
+
+
+class OtlpHttpExporter(SpanExporter):
+    """
+    Sends spans to an OpenTelemetry collector as OTLP/HTTP JSON, e.g. to a collector running next to the
+    application. Each batch is one POST request.
+    """
+
+    def __init__(
+        self,
+        endpoint: str = "http://localhost:4318/v1/traces",
+        service_name: str = "pyfecto",
+        timeout: float = 10.0,
+    ):
+        """
+        Args:
+            endpoint: URL of the collector's traces endpoint
+            service_name: Reported as the `service.name` resource attribute
+            timeout: Seconds to wait for the collector to answer
+        """
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def export(self, spans: list[Span]) -> None:
+        body = json.dumps(to_otlp(spans, self.service_name)).encode("utf-8")
+        request = urllib.request.Request(
+            self.endpoint,
+            data=body,
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+def to_otlp(spans: list[Span], service_name: str) -> dict[str, Any]:
+    """
+    Converts spans to an OTLP `ExportTraceServiceRequest` in its JSON encoding.
+
+    Args:
+        spans: The spans to convert
+        service_name: Reported as the `service.name` resource attribute
+    """
+    converted = []
+    for span in spans:
+        duration = span.duration_ns or 0
+        otlp_span: dict[str, Any] = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            # SPAN_KIND_INTERNAL
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_time_unix_ns),
+            "endTimeUnixNano": str(span.start_time_unix_ns + duration),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in span.attributes.items()
+            ],
+            # STATUS_CODE_OK or STATUS_CODE_ERROR
+            "status": (
+                {"code": 1}
+                if span.error is None
+                else {"code": 2, "message": repr(span.error)}
+            ),
+        }
+        if span.parent_id is not None:
+            otlp_span["parentSpanId"] = span.parent_id
+        converted.append(otlp_span)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {
+                            "key": "service.name",
+                            "value": {"stringValue": service_name},
+                        }
+                    ]
+                },
+                "scopeSpans": [{"scope": {"name": "pyfecto"}, "spans": converted}],
+            }
+        ]
+    }
+
+
+class Tracer:
+    """
+    Collects finished spans and hands them to exporters in batches.
+
+    Exporting happens on a background daemon thread: when `batch_size` spans are waiting, every `flush_interval`
+    seconds, on flush(), and when the interpreter exits, so exporters never add latency to the traced effects.
+    An exporter that fails is logged and does not keep the others from receiving the batch.
+
+    Usage:
+        memory = InMemoryExporter()
+        runtime = Runtime(tracer=Tracer([memory, JsonLinesExporter("spans.jsonl")]))
+    """
+
+    def __init__(
+        self,
+        exporters: list[SpanExporter],
+        batch_size: int = 512,
+        flush_interval: float = 5.0,
+    ):
+        """
+        Args:
+            exporters: Where finished spans are sent
+            batch_size: Number of waiting spans that triggers an export
+            flush_interval: Maximum number of seconds a finished span waits to be exported
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+        if flush_interval <= 0:
+            raise ValueError(f"flush_interval must be positive, got {flush_interval}")
+        self.exporters = list(exporters)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._idle = threading.Condition(self._lock)
+        self._pending: list[Span] = []
+        self._exporting = False
+        self._flush_requested = False
+        self._closed = False
+        self._worker: Optional[threading.Thread] = None
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Exports every finished span now and waits until that is done.
+
+        Args:
+            timeout: Maximum number of seconds to wait (if None, no limit)
+
+        Returns:
+            False if the timeout expired first
+        """
+        with self._lock:
+            if self._worker is None:
+                return True
+            self._flush_requested = True
+            self._wakeup.notify()
+            return self._idle.wait_for(
+                lambda: not self._pending and not self._exporting, timeout
+            )
+
+    def shutdown(self, timeout: Optional[float] = None) -> bool:
+        """
+        Exports the remaining spans, stops the export thread and shuts the exporters down.
+        Spans ending afterwards are discarded.
+
+        Args:
+            timeout: Maximum number of seconds to wait for the remaining spans to be exported
+
+        Returns:
+            False if the timeout expired first
+        """
+        flushed = self.flush(timeout)
+        with self._lock:
+            if self._closed:
+                return flushed
+            self._closed = True
+            self._wakeup.notify()
+        for exporter in self.exporters:
+            try:
+                exporter.shutdown()
+            except Exception as e:
+                LOGGER.warning(f"Span exporter {type(exporter).__name__} failed: {e!r}")
+        return flushed
+
+    def _on_end(self, span: Span) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._pending.append(span)
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._drain, name="pyfecto-tracer", daemon=True
+                )
+                self._worker.start()
+                atexit.register(self.shutdown, 5.0)
+            elif len(self._pending) >= self.batch_size:
+                self._wakeup.notify()
+
+    def _drain(self) -> None:
+        while True:
+            with self._lock:
+                self._wakeup.wait_for(
+                    lambda: len(self._pending) >= self.batch_size
+                    or self._flush_requested
+                    or self._closed,
+                    self.flush_interval,
+                )
+                batch, self._pending = self._pending, []
+                self._flush_requested = False
+                self._exporting = bool(batch)
+                closed = self._closed
+            for start in range(0, len(batch), self.batch_size):
+                end = start + self.batch_size
+                self._export(batch[start:end])
+            with self._lock:
+                self._exporting = False
+                if not self._pending:
+                    self._idle.notify_all()
+            if closed:
+                return
+
+    def _export(self, batch: list[Span]) -> None:
+        for exporter in self.exporters:
+            try:
+                exporter.export(batch)
+            except Exception as e:
+                LOGGER.warning(f"Span exporter {type(exporter).__name__} failed: {e!r}")
+
+
+def _plain(value: Any) -> Any:
+    """An attribute value as a JSON scalar: kept if it already is one, its repr otherwise."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return repr(value)
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # OTLP's JSON encoding carries 64-bit integers as strings
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": value if isinstance(value, str) else repr(value)}
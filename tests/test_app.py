@@ -72,3 +72,14 @@ class TestPyfectoApp(TestCase):
         config = Config(api_key="test-key", endpoint="https://api.example.com")
         app = MyTestApplication(config, "test-query", runtime=custom_runtime)
         Runtime.run_app(app, exit_on_error=False)
+
+    def test_run_app_with_asyncio(self):
+        config = Config(api_key="test-key", endpoint="https://api.example.com")
+        app = MyTestApplication(config, "test-query")
+        Runtime.run_app(app, exit_on_error=False, use_asyncio=True)
+
+        failing_app = MyTestApplication(config, "error")
+        self.assertRaises(
+            ValueError,
+            lambda: Runtime.run_app(failing_app, exit_on_error=False, use_asyncio=True),
+        )
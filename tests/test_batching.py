@@ -0,0 +1,228 @@
+"""Unit tests for the pyfecto.batching module."""
+
+import threading
+import time
+from unittest import TestCase
+
+from src.pyfecto.batching import DataSource
+from src.pyfecto.collections import collect_all, foreach, foreach_par
+from src.pyfecto.pyio import PYIO
+from src.pyfecto.runtime import LOGGER, Runtime
+from src.pyfecto.tracing import InMemoryExporter, Tracer, current_span
+
+USERS = {i: {"id": i, "name": f"user-{i}", "manager": i // 10} for i in range(100)}
+
+
+class Users(DataSource):
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    def fetch_batch(self, keys):
+        def fetch():
+            self.batches.append(list(keys))
+            if self.fail:
+                raise ConnectionError("backend down")
+            return {key: USERS[key] for key in keys if key in USERS}
+
+        return PYIO.attempt(fetch)
+
+
+class TestDataSource(TestCase):
+    def test_single_request(self):
+        users = Users()
+        self.assertEqual(users.get(3).run(), USERS[3])
+        self.assertEqual(users.batches, [[3]])
+
+    def test_foreach_batches_requests(self):
+        users = Users()
+        result = foreach(list(range(10)), users.get).run()
+        self.assertEqual(result, [USERS[i] for i in range(10)])
+        self.assertEqual(users.batches, [list(range(10))])
+
+    def test_requests_are_deduplicated(self):
+        users = Users()
+        result = foreach([1, 2, 1, 3, 2], users.get).run()
+        self.assertEqual([user["id"] for user in result], [1, 2, 1, 3, 2])
+        self.assertEqual(users.batches, [[1, 2, 3]])
+
+    def test_composed_requests_batch_per_round(self):
+        users = Users()
+
+        def with_manager(user_id):
+            return users.get(user_id).flat_map(
+                lambda user: users.get(user["manager"]).map(
+                    lambda manager: (user["name"], manager["name"])
+                )
+            )
+
+        result = foreach([15, 25, 35], with_manager).run()
+        self.assertEqual(
+            result,
+            [("user-15", "user-1"), ("user-25", "user-2"), ("user-35", "user-3")],
+        )
+        self.assertEqual(users.batches, [[15, 25, 35], [1, 2, 3]])
+
+    def test_fetched_keys_are_cached_for_the_run(self):
+        users = Users()
+
+        def with_manager(user_id):
+            return users.get(user_id).flat_map(lambda user: users.get(user["manager"]))
+
+        foreach([1, 12], with_manager).run()
+        # The second round only needs manager 0; manager 1 was fetched in the first round
+        self.assertEqual(users.batches, [[1, 12], [0]])
+
+    def test_collect_all_batches_across_sources(self):
+        users = Users()
+        others = Users()
+        effects = [users.get(1), others.get(2), users.get(3), PYIO.success("plain")]
+        result = collect_all(effects).run()
+        self.assertEqual(result, [USERS[1], USERS[2], USERS[3], "plain"])
+        self.assertEqual(users.batches, [[1, 3]])
+        self.assertEqual(others.batches, [[2]])
+
+    def test_max_batch_size(self):
+        users = Users()
+        users.max_batch_size = 4
+        foreach(list(range(10)), users.get).run()
+        self.assertEqual(users.batches, [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]])
+
+    def test_missing_key_fails_with_key_error(self):
+        users = Users()
+        result = foreach([1, 1000], users.get).run()
+        self.assertIsInstance(result, KeyError)
+        self.assertIsInstance(users.get(1000).run(), KeyError)
+
+    def test_batch_failure_fails_the_requests(self):
+        users = Users(fail=True)
+        self.assertIsInstance(foreach([1, 2], users.get).run(), ConnectionError)
+        self.assertIsInstance(users.get(1).run(), ConnectionError)
+
+    def test_recovering_a_failed_request(self):
+        users = Users()
+        effects = [users.get(1000).recover(lambda _: PYIO.success(None)), users.get(1)]
+        self.assertEqual(collect_all(effects).run(), [None, USERS[1]])
+        self.assertEqual(users.batches, [[1000, 1]])
+
+    def test_request_on_a_fiber(self):
+        users = Users()
+        fiber = users.get(5).fork().run()
+        self.assertEqual(fiber.join().run(), USERS[5])
+
+    def test_rerun_starts_with_an_empty_cache(self):
+        users = Users()
+        effect = foreach([1, 2], users.get)
+        effect.run()
+        effect.run()
+        self.assertEqual(users.batches, [[1, 2], [1, 2]])
+
+
+class TestBatchingWaits(TestCase):
+    def setUp(self):
+        self.runtime = Runtime()
+        self.max_workers = self.runtime.max_workers
+        self.runtime.shutdown()
+        self.runtime.max_workers = 2
+
+    def tearDown(self):
+        self.runtime.shutdown(wait=False)
+        self.runtime.max_workers = self.max_workers
+
+    def test_waits_do_not_hold_a_worker(self):
+        def item(i):
+            return foreach([i], lambda j: PYIO.success(j).zip_par(PYIO.success(j)))
+
+        effect = foreach_par(list(range(4)), item).timeout(2)
+        self.assertEqual(effect.run(), [[(i, i)] for i in range(4)])
+
+    def test_sleeping_items_share_the_workers(self):
+        def item(i):
+            return foreach([i], lambda j: PYIO.sleep(0.05).map(lambda _: j))
+
+        started = time.monotonic()
+        result = foreach_par(list(range(8)), item).timeout(2).run()
+        self.assertEqual(result, [[i] for i in range(8)])
+        self.assertLess(time.monotonic() - started, 0.3)
+
+    def test_items_still_run_in_sequence(self):
+        events = []
+
+        def item(i):
+            return PYIO.attempt(lambda: events.append(f"start {i}")).then(
+                PYIO.sleep(0.01).map(lambda _: events.append(f"end {i}"))
+            )
+
+        foreach([1, 2], item).run()
+        self.assertEqual(events, ["start 1", "end 1", "start 2", "end 2"])
+
+    def test_requests_after_a_wait_are_batched(self):
+        users = Users()
+        result = foreach(
+            [1, 2, 3], lambda i: PYIO.sleep(0.01).flat_map(lambda _: users.get(i))
+        ).run()
+        self.assertEqual(result, [USERS[i] for i in range(1, 4)])
+        self.assertEqual(users.batches, [[1, 2, 3]])
+
+    def test_interruption_releases_unfinished_items(self):
+        released = []
+        waiting = threading.Event()
+        users = Users()
+
+        def item(i):
+            wait = (
+                users.get(i)
+                if i == 0
+                else PYIO.attempt(waiting.set).then(PYIO.sleep(10))
+            )
+            return wait.ensuring(PYIO.attempt(lambda: released.append(i)))
+
+        fiber = foreach([0, 1], item).fork().run()
+        waiting.wait(1)
+        fiber.interrupt().run()
+        deadline = time.monotonic() + 1
+        while len(released) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(sorted(released), [0, 1])
+        self.assertEqual(users.batches, [])
+
+
+class TestBatchingContext(TestCase):
+    def setUp(self):
+        self.runtime = Runtime()
+        self.memory = InMemoryExporter()
+        self.runtime.tracer = Tracer([self.memory])
+
+    def tearDown(self):
+        self.runtime.tracer.shutdown(timeout=1)
+        self.runtime.tracer = None
+
+    def test_items_have_their_own_spans(self):
+        users = Users()
+
+        def item(i):
+            return users.get(i).flat_map(lambda _: current_span()).traced(f"item{i}")
+
+        active = foreach([1, 2, 3], item).traced("batch").run()
+        self.assertEqual([span.name for span in active], ["item1", "item2", "item3"])
+        self.assertEqual(users.batches, [[1, 2, 3]])
+        self.runtime.tracer.flush(timeout=1)
+        spans = {span.name: span for span in self.memory.spans}
+        for i in [1, 2, 3]:
+            self.assertEqual(spans[f"item{i}"].parent_id, spans["batch"].span_id)
+
+    def test_items_do_not_change_the_callers_context(self):
+        users = Users()
+        foreach([1, 2], lambda i: users.get(i).traced(f"item{i}")).run()
+        self.assertIsNone(current_span().run())
+
+    def test_log_span_around_items_is_a_root_span(self):
+        users = Users()
+        messages = []
+        handler = LOGGER.add(messages.append, format="{message}")
+        try:
+            items = foreach([1, 2], lambda i: users.get(i).traced(f"item{i}"))
+            PYIO.log_span("outer", "outer done", items).run()
+        finally:
+            LOGGER.remove(handler)
+        self.assertIsNone(messages[-1].record["extra"]["parent_span_id"])
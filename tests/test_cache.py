@@ -0,0 +1,147 @@
+"""Unit tests for the pyfecto.cache module."""
+
+import time
+from unittest import TestCase
+
+from src.pyfecto.cache import CacheStats, EffectCache
+from src.pyfecto.collections import collect_all_par, foreach
+from src.pyfecto.pyio import PYIO
+from src.pyfecto.runtime import Runtime
+
+
+class WeatherService:
+    """A backend recording every call it receives."""
+
+    def __init__(self, delay=0.0, failing=()):
+        self.calls = []
+        self.delay = delay
+        self.failing = set(failing)
+
+    def get_weather(self, city):
+        def call():
+            self.calls.append(city)
+            time.sleep(self.delay)
+            if city in self.failing:
+                raise ValueError(f"no weather for {city}")
+            return f"sunny in {city}"
+
+        return PYIO.attempt(call)
+
+
+class TestEffectCache(TestCase):
+    def test_caches_by_key(self):
+        service = WeatherService()
+        cache = EffectCache(service.get_weather)
+        self.assertEqual(cache.get("paris").run(), "sunny in paris")
+        self.assertEqual(cache.get("paris").run(), "sunny in paris")
+        self.assertEqual(cache.get("rome").run(), "sunny in rome")
+        self.assertEqual(service.calls, ["paris", "rome"])
+        self.assertEqual(
+            cache.stats(), CacheStats(hits=1, misses=2, evictions=0, size=2)
+        )
+
+    def test_is_lazy(self):
+        service = WeatherService()
+        effect = EffectCache(service.get_weather).get("paris")
+        self.assertEqual(service.calls, [])
+        effect.run()
+        self.assertEqual(service.calls, ["paris"])
+
+    def test_concurrent_misses_are_single_flight(self):
+        service = WeatherService(delay=0.05)
+        cache = EffectCache(service.get_weather)
+        results = collect_all_par([cache.get("paris") for _ in range(20)]).run()
+        self.assertEqual(results, ["sunny in paris"] * 20)
+        self.assertEqual(service.calls, ["paris"])
+        stats = cache.stats()
+        self.assertEqual((stats.hits, stats.misses), (19, 1))
+
+    def test_lru_eviction(self):
+        service = WeatherService()
+        cache = EffectCache(service.get_weather, max_size=2)
+        foreach(["a", "b", "a", "c", "a", "b"], cache.get).run()
+        # "b" was least recently used when "c" came in, so it was looked up twice
+        self.assertEqual(service.calls, ["a", "b", "c", "b"])
+        self.assertEqual(cache.stats().evictions, 2)
+        self.assertEqual(cache.stats().size, 2)
+
+    def test_ttl_expiry(self):
+        service = WeatherService()
+        cache = EffectCache(service.get_weather, ttl=0.05)
+        cache.get("paris").run()
+        cache.get("paris").run()
+        time.sleep(0.1)
+        cache.get("paris").run()
+        self.assertEqual(service.calls, ["paris", "paris"])
+
+    def test_failures_are_not_cached_by_default(self):
+        service = WeatherService(failing=["atlantis"])
+        cache = EffectCache(service.get_weather)
+        self.assertIsInstance(cache.get("atlantis").run(), ValueError)
+        self.assertIsInstance(cache.get("atlantis").run(), ValueError)
+        self.assertEqual(service.calls, ["atlantis", "atlantis"])
+
+    def test_negative_caching(self):
+        service = WeatherService(failing=["atlantis"])
+        cache = EffectCache(service.get_weather, failure_ttl=0.05)
+        first = cache.get("atlantis").run()
+        self.assertIs(cache.get("atlantis").run(), first)
+        time.sleep(0.1)
+        cache.get("atlantis").run()
+        self.assertEqual(service.calls, ["atlantis", "atlantis"])
+
+    def test_exception_building_lookup_is_captured(self):
+        def lookup(key):
+            raise KeyError(key)
+
+        self.assertIsInstance(EffectCache(lookup).get("x").run(), KeyError)
+
+    def test_invalidate(self):
+        service = WeatherService()
+        cache = EffectCache(service.get_weather)
+        cache.get("paris").run()
+        cache.get("rome").run()
+        cache.invalidate("paris").run()
+        cache.get("paris").run()
+        cache.invalidate_all().run()
+        cache.get("rome").run()
+        self.assertEqual(service.calls, ["paris", "rome", "paris", "rome"])
+
+    def test_stats_are_exposed_through_the_runtime(self):
+        service = WeatherService()
+        cache = EffectCache(service.get_weather, name="weather")
+        cache.get("paris").run()
+        cache.get("paris").run()
+        stats = Runtime().cache_stats()["weather"]
+        self.assertEqual((stats.hits, stats.misses), (1, 1))
+        self.assertEqual(stats.hit_rate, 0.5)
+
+    def test_creating_a_cache_does_not_create_the_runtime(self):
+        runtime = Runtime()
+        Runtime._instance = None
+        try:
+            cache = EffectCache(WeatherService().get_weather, name="early")
+            self.assertIsNone(Runtime._instance)
+        finally:
+            Runtime._instance = runtime
+        cache.get("paris").run()
+        self.assertEqual(Runtime().cache_stats()["early"].misses, 1)
+
+    def test_default_name(self):
+        cache = EffectCache(WeatherService().get_weather)
+        self.assertEqual(cache.name, "WeatherService.get_weather")
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            EffectCache(WeatherService().get_weather, max_size=0)
+        with self.assertRaises(ValueError):
+            EffectCache(WeatherService().get_weather, ttl=0)
+
+
+class TestCacheByKey(TestCase):
+    def test_cache_by_key(self):
+        service = WeatherService()
+        get_weather = PYIO.cache_by_key(service.get_weather, max_size=10, ttl=60).get
+        program = get_weather("paris").zip(get_weather("paris"))
+        self.assertEqual(program.run(), ("sunny in paris", "sunny in paris"))
+        self.assertEqual(service.calls, ["paris"])
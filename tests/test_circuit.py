@@ -0,0 +1,209 @@
+"""Unit tests for the pyfecto.circuit module."""
+
+import threading
+import time
+from unittest import TestCase
+
+from src.pyfecto.circuit import CircuitBreaker, CircuitOpenError
+from src.pyfecto.collections import foreach_par
+from src.pyfecto.fiber import Fiber
+from src.pyfecto.pyio import PYIO, EffectTimeoutError
+from src.pyfecto.runtime import LOGGER, Runtime, _level_number
+
+
+class Dependency:
+    """Counts its calls and fails while it is down."""
+
+    def __init__(self):
+        self.calls = 0
+        self.down = True
+        self.lock = threading.Lock()
+
+    def call(self, seconds=0.0):
+        def run():
+            with self.lock:
+                self.calls += 1
+            if seconds:
+                time.sleep(seconds)
+            if self.down:
+                raise ConnectionError("dependency is down")
+            return "ok"
+
+        return PYIO.attempt(run)
+
+
+class TestCircuitBreaker(TestCase):
+    def setUp(self):
+        # Configuring the runtime resets the logger, so do it before adding the test sink
+        Runtime()
+        self.messages = []
+        self.handler = LOGGER.add(self.messages.append, format="{message}")
+
+    def tearDown(self):
+        LOGGER.remove(self.handler)
+
+    def trip(self, breaker, dependency):
+        for _ in range(breaker.max_failures):
+            breaker.protect(dependency.call()).run()
+
+    def test_closed_passes_outcomes_through(self):
+        breaker = CircuitBreaker(max_failures=3)
+        dependency = Dependency()
+        self.assertIsInstance(breaker.protect(dependency.call()).run(), ConnectionError)
+        dependency.down = False
+        self.assertEqual(breaker.protect(dependency.call()).run(), "ok")
+        self.assertEqual(breaker.state, "closed")
+        self.assertEqual(breaker.stats().consecutive_failures, 0)
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(max_failures=3, reset_timeout=10)
+        dependency = Dependency()
+        self.trip(breaker, dependency)
+        self.assertEqual(breaker.state, "open")
+
+        started = time.monotonic()
+        result = breaker.protect(dependency.call(seconds=1)).run()
+        self.assertLess(time.monotonic() - started, 0.1)
+        self.assertIsInstance(result, CircuitOpenError)
+        self.assertGreater(result.retry_after, 9)
+        self.assertEqual(dependency.calls, 3)
+        stats = breaker.stats()
+        self.assertEqual((stats.rejected, stats.times_opened), (1, 1))
+
+    def test_success_resets_the_count(self):
+        breaker = CircuitBreaker(max_failures=2)
+        dependency = Dependency()
+        for down in [True, False, True, False]:
+            dependency.down = down
+            breaker.protect(dependency.call()).run()
+        self.assertEqual(breaker.state, "closed")
+
+    def test_closes_after_successful_probes(self):
+        breaker = CircuitBreaker(max_failures=1, reset_timeout=0.05, half_open_probes=2)
+        dependency = Dependency()
+        self.trip(breaker, dependency)
+        time.sleep(0.06)
+        dependency.down = False
+        self.assertEqual(breaker.protect(dependency.call()).run(), "ok")
+        self.assertEqual(breaker.state, "half-open")
+        self.assertEqual(breaker.protect(dependency.call()).run(), "ok")
+        self.assertEqual(breaker.state, "closed")
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker(max_failures=1, reset_timeout=0.05)
+        dependency = Dependency()
+        self.trip(breaker, dependency)
+        time.sleep(0.06)
+        self.assertIsInstance(breaker.protect(dependency.call()).run(), ConnectionError)
+        self.assertEqual(breaker.state, "open")
+        self.assertIsInstance(
+            breaker.protect(dependency.call()).run(), CircuitOpenError
+        )
+        self.assertEqual(breaker.stats().times_opened, 2)
+
+    def test_limits_concurrent_probes(self):
+        breaker = CircuitBreaker(max_failures=1, reset_timeout=0.05, half_open_probes=1)
+        dependency = Dependency()
+        self.trip(breaker, dependency)
+        time.sleep(0.06)
+        dependency.down = False
+        probe = Fiber.start(breaker.protect(dependency.call(seconds=0.1)))
+        time.sleep(0.03)
+        self.assertIsInstance(
+            breaker.protect(dependency.call()).run(), CircuitOpenError
+        )
+        self.assertEqual(probe.join().run(), "ok")
+        self.assertEqual(breaker.state, "closed")
+
+    def test_interrupted_probe_frees_its_slot(self):
+        breaker = CircuitBreaker(max_failures=1, reset_timeout=0.05)
+        dependency = Dependency()
+        self.trip(breaker, dependency)
+        time.sleep(0.06)
+        result = breaker.protect(PYIO.sleep(1)).timeout(0.02).run()
+        self.assertIsInstance(result, EffectTimeoutError)
+        self.assertEqual(breaker.state, "half-open")
+        dependency.down = False
+        time.sleep(0.02)
+        self.assertEqual(breaker.protect(dependency.call()).run(), "ok")
+        self.assertEqual(breaker.state, "closed")
+
+    def test_concurrent_use(self):
+        breaker = CircuitBreaker(max_failures=5, reset_timeout=10)
+        dependency = Dependency()
+        results = foreach_par(
+            list(range(200)),
+            lambda _: breaker.protect(dependency.call()).match(
+                lambda e: e, lambda v: v
+            ),
+            max_concurrency=16,
+        ).run()
+        self.assertEqual(breaker.state, "open")
+        rejected = [r for r in results if isinstance(r, CircuitOpenError)]
+        self.assertEqual(len(rejected), breaker.stats().rejected)
+        self.assertEqual(dependency.calls + len(rejected), 200)
+        self.assertLess(dependency.calls, 30)
+
+    def test_logs_transitions(self):
+        breaker = CircuitBreaker(max_failures=1, reset_timeout=0.05, name="payments")
+        dependency = Dependency()
+        self.trip(breaker, dependency)
+        time.sleep(0.06)
+        dependency.down = False
+        breaker.protect(dependency.call()).run()
+        logged = [m for m in self.messages if "'payments'" in m]
+        self.assertEqual(len(logged), 3)
+        self.assertIn("opened after 1 consecutive failures", logged[0])
+        self.assertIn("from open to half-open", logged[1])
+        self.assertIn("from half-open to closed", logged[2])
+
+    def test_transitions_are_logged_outside_the_lock(self):
+        breaker = CircuitBreaker(max_failures=1)
+        acquired = []
+
+        def sink(message):
+            acquired.append(breaker._lock.acquire(timeout=0.5))
+            if acquired[-1]:
+                breaker._lock.release()
+
+        handler = LOGGER.add(sink)
+        try:
+            self.trip(breaker, Dependency())
+        finally:
+            LOGGER.remove(handler)
+        self.assertEqual(acquired, [True])
+
+    def test_transitions_follow_the_runtime_log_level(self):
+        runtime = Runtime()
+        level = runtime._min_log_level
+        runtime._min_log_level = _level_number("ERROR")
+        try:
+            self.trip(CircuitBreaker(max_failures=1), Dependency())
+        finally:
+            runtime._min_log_level = level
+        self.assertEqual(self.messages, [])
+
+    def test_registered_with_runtime(self):
+        breaker = CircuitBreaker(name="inventory")
+        self.trip(breaker, Dependency())
+        stats = Runtime().circuit_breaker_stats()["inventory"]
+        self.assertEqual(stats.state, "open")
+
+    def test_creating_a_breaker_does_not_create_the_runtime(self):
+        runtime = Runtime()
+        Runtime._instance = None
+        try:
+            breaker = CircuitBreaker(name="early")
+            self.assertIsNone(Runtime._instance)
+        finally:
+            Runtime._instance = runtime
+        self.trip(breaker, Dependency())
+        self.assertEqual(Runtime().circuit_breaker_stats()["early"].state, "open")
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            CircuitBreaker(max_failures=0)
+        with self.assertRaises(ValueError):
+            CircuitBreaker(reset_timeout=-1)
+        with self.assertRaises(ValueError):
+            CircuitBreaker(half_open_probes=0)
@@ -0,0 +1,223 @@
+"""Unit tests for the concurrent functions of the pyfecto.collections module."""
+
+import asyncio
+import threading
+import time
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from src.pyfecto.collections import (
+    collect_all_par,
+    foreach,
+    foreach_par,
+    foreach_par_async,
+)
+from src.pyfecto.pyio import PYIO
+
+
+def slow(x, seconds=0.1):
+    return PYIO.attempt(lambda: time.sleep(seconds)).map_to(lambda: x * 2)
+
+
+class TestForeachPar(TestCase):
+    def test_empty_list(self):
+        self.assertEqual(foreach_par([], slow).run(), [])
+
+    def test_preserves_order(self):
+        def process(x):
+            # Later items finish first
+            return slow(x, 0.01 * (5 - x))
+
+        self.assertEqual(foreach_par([1, 2, 3, 4], process).run(), [2, 4, 6, 8])
+
+    def test_runs_concurrently(self):
+        start = time.perf_counter()
+        result = foreach_par(list(range(8)), slow, max_concurrency=8).run()
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(result, [x * 2 for x in range(8)])
+        self.assertLess(elapsed, 0.5)
+
+    def test_respects_max_concurrency(self):
+        lock = threading.Lock()
+        active = [0]
+        peak = [0]
+
+        def track(x):
+            def enter():
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+
+            def leave():
+                with lock:
+                    active[0] -= 1
+
+            return (
+                PYIO.attempt(enter)
+                .then(slow(x, 0.02))
+                .flat_map(lambda v: PYIO.attempt(leave).map_to(lambda: v))
+            )
+
+        result = foreach_par(list(range(12)), track, max_concurrency=3).run()
+        self.assertEqual(result, [x * 2 for x in range(12)])
+        self.assertLessEqual(peak[0], 3)
+
+    def test_fails_fast_and_skips_remaining_items(self):
+        started = []
+        error = ValueError("Error on item 0")
+
+        def process(x):
+            started.append(x)
+            if x == 0:
+                return PYIO.fail(error)
+            return slow(x, 0.05)
+
+        start = time.perf_counter()
+        result = foreach_par(list(range(20)), process, max_concurrency=2).run()
+        elapsed = time.perf_counter() - start
+
+        self.assertIs(result, error)
+        self.assertLess(len(started), 20)
+        self.assertLess(elapsed, 0.5)
+
+    def test_failure_interrupts_running_items(self):
+        completed = []
+        error = ValueError("boom")
+
+        def process(x):
+            if x == 0:
+                return slow(x, 0.02).then(PYIO.fail(error))
+            return (
+                slow(x, 0.1)
+                .then(slow(x, 0.1))
+                .flat_map(lambda v: PYIO.attempt(lambda: completed.append(x)))
+            )
+
+        self.assertIs(foreach_par([0, 1, 2], process).run(), error)
+        time.sleep(0.3)
+        self.assertEqual(completed, [])
+
+    def test_exception_building_effect_is_captured(self):
+        def process(x):
+            if x == 2:
+                raise ValueError("bad item")
+            return PYIO.success(x)
+
+        result = foreach_par([1, 2, 3], process).run()
+        self.assertIsInstance(result, ValueError)
+
+    def test_is_lazy_and_rerunnable(self):
+        calls = []
+
+        def process(x):
+            calls.append(x)
+            return PYIO.success(x)
+
+        effect = foreach_par([1, 2, 3], process, max_concurrency=2)
+        self.assertEqual(calls, [])
+        self.assertEqual(effect.run(), [1, 2, 3])
+        self.assertEqual(effect.run(), [1, 2, 3])
+        self.assertEqual(sorted(calls), [1, 1, 2, 2, 3, 3])
+
+    def test_invalid_max_concurrency(self):
+        with self.assertRaises(ValueError):
+            foreach_par([1], slow, max_concurrency=0)
+
+
+class TestCollectAllPar(TestCase):
+    def test_empty_list(self):
+        self.assertEqual(collect_all_par([]).run(), [])
+
+    def test_runs_concurrently_and_preserves_order(self):
+        effects = [slow(x, 0.02 * (5 - x)) for x in range(5)] + [PYIO.success("done")]
+        start = time.perf_counter()
+        result = collect_all_par(effects).run()
+        self.assertEqual(result, [0, 2, 4, 6, 8, "done"])
+        self.assertLess(time.perf_counter() - start, 0.2)
+
+    def test_respects_max_concurrency(self):
+        start = time.perf_counter()
+        result = collect_all_par([slow(x) for x in range(4)], max_concurrency=2).run()
+        self.assertEqual(result, [0, 2, 4, 6])
+        self.assertGreaterEqual(time.perf_counter() - start, 0.2)
+
+    def test_fails_fast_and_interrupts_the_rest(self):
+        error = ValueError("test error")
+        cancelled = threading.Event()
+        pending = PYIO.from_callback(lambda callback: cancelled.set)
+        result = collect_all_par([pending, PYIO.fail(error)]).run()
+        self.assertIs(result, error)
+        self.assertTrue(cancelled.wait(1))
+
+
+class TestZipPar(TestCase):
+    def test_zip_par(self):
+        start = time.perf_counter()
+        self.assertEqual(slow(1).zip_par(slow(2)).run(), (2, 4))
+        self.assertLess(time.perf_counter() - start, 0.18)
+
+    def test_zip_with_par(self):
+        self.assertEqual(slow(1).zip_with_par(slow(2), lambda a, b: a + b).run(), 6)
+
+    def test_failure_interrupts_the_other_side(self):
+        error = ValueError("test error")
+        cancelled = threading.Event()
+        pending = PYIO.from_callback(lambda callback: cancelled.set)
+        self.assertIs(pending.zip_par(PYIO.fail(error)).run(), error)
+        self.assertTrue(cancelled.wait(1))
+        self.assertIs(PYIO.fail(error).zip_par(slow(1)).run(), error)
+
+
+class TestForeachParAsync(IsolatedAsyncioTestCase):
+    @staticmethod
+    def fetch(x, seconds=0.1):
+        async def delayed():
+            await asyncio.sleep(seconds)
+            return x * 2
+
+        return PYIO.from_awaitable(delayed)
+
+    async def test_empty_list(self):
+        self.assertEqual(await foreach_par_async([], self.fetch).run_async(), [])
+
+    async def test_runs_concurrently_and_preserves_order(self):
+        items = list(range(500))
+        start = time.perf_counter()
+        result = await foreach_par_async(
+            items, self.fetch, max_concurrency=250
+        ).run_async()
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(result, [x * 2 for x in items])
+        self.assertLess(elapsed, 0.6)
+
+    async def test_fails_fast_and_cancels_remaining_tasks(self):
+        completed = []
+        error = ValueError("boom")
+
+        def process(x):
+            if x == 0:
+                return PYIO.fail(error)
+            return self.fetch(x, 0.1).map(lambda v: completed.append(v))
+
+        result = await foreach_par_async(
+            list(range(10)), process, max_concurrency=4
+        ).run_async()
+        self.assertIs(result, error)
+        await asyncio.sleep(0.2)
+        self.assertEqual(completed, [])
+
+    def test_run_without_event_loop(self):
+        self.assertEqual(foreach_par_async([1, 2, 3], self.fetch).run(), [2, 4, 6])
+
+    def test_run_without_event_loop_keeps_the_timer_loop_free(self):
+        threads = foreach_par_async(
+            [1, 2], lambda _: PYIO.attempt(lambda: threading.current_thread().name)
+        ).run()
+        self.assertNotIn("pyfecto-event-loop", threads)
+
+    def test_run_without_event_loop_with_nested_foreach(self):
+        effect = foreach_par_async(
+            [1, 2], lambda i: foreach([i], lambda j: self.fetch(j, 0.01))
+        ).timeout(3)
+        self.assertEqual(effect.run(), [[2], [4]])
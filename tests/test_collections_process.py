@@ -0,0 +1,78 @@
+"""Unit tests for running work in the runtime's process pool."""
+
+import os
+from unittest import TestCase
+
+from src.pyfecto.collections import foreach_process
+from src.pyfecto.pyio import PYIO
+
+
+def square(x):
+    return x * x
+
+
+def fail_on_three(x):
+    if x == 3:
+        raise ValueError("Error on item 3")
+    return x
+
+
+def current_pid(_):
+    return os.getpid()
+
+
+def fibonacci(n):
+    return n if n < 2 else fibonacci(n - 1) + fibonacci(n - 2)
+
+
+class TestOnProcessPool(TestCase):
+    def test_success(self):
+        effect = PYIO.on_process_pool(fibonacci, 20).map(lambda x: x + 1)
+        self.assertEqual(effect.run(), 6766)
+
+    def test_runs_in_another_process(self):
+        pid = PYIO.on_process_pool(current_pid, None).run()
+        self.assertNotEqual(pid, os.getpid())
+
+    def test_error_is_captured(self):
+        result = PYIO.on_process_pool(fail_on_three, 3).run()
+        self.assertIsInstance(result, ValueError)
+        self.assertEqual(str(result), "Error on item 3")
+
+    def test_is_lazy(self):
+        effect = PYIO.on_process_pool(square, 4)
+        self.assertEqual(effect.run(), 16)
+        self.assertEqual(effect.run(), 16)
+
+    def test_from_fibers(self):
+        program = (
+            PYIO.on_process_pool(fibonacci, 18)
+            .fork()
+            .zip(PYIO.on_process_pool(fibonacci, 19).fork())
+            .flat_map(lambda fibers: fibers[0].join().zip(fibers[1].join()))
+        )
+        self.assertEqual(program.run(), (2584, 4181))
+
+
+class TestForeachProcess(TestCase):
+    def test_empty_list(self):
+        self.assertEqual(foreach_process([], square).run(), [])
+
+    def test_preserves_order(self):
+        items = list(range(1_000))
+        self.assertEqual(foreach_process(items, square).run(), [x * x for x in items])
+
+    def test_explicit_chunksize(self):
+        items = list(range(10))
+        for chunksize in (1, 3, 10, 50):
+            result = foreach_process(items, square, chunksize=chunksize).run()
+            self.assertEqual(result, [x * x for x in items])
+
+    def test_error_is_captured(self):
+        result = foreach_process(list(range(10)), fail_on_three, chunksize=2).run()
+        self.assertIsInstance(result, ValueError)
+        self.assertEqual(str(result), "Error on item 3")
+
+    def test_invalid_chunksize(self):
+        with self.assertRaises(ValueError):
+            foreach_process([1], square, chunksize=0)
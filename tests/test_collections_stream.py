@@ -0,0 +1,149 @@
+"""Unit tests for the streaming functions of the pyfecto.collections module."""
+
+from unittest import TestCase
+
+from src.pyfecto.collections import (collect_all_into, filter_into,
+                                     foreach_into, partition_into)
+from src.pyfecto.pyio import PYIO
+
+
+class RecordingSink:
+    """Collects batches and, for each one, how many items had been pulled from the source."""
+
+    def __init__(self, pulled=None):
+        self.batches = []
+        self.pulled_at_delivery = []
+        self._pulled = pulled
+
+    def __call__(self, batch):
+        def record():
+            self.batches.append(batch)
+            if self._pulled is not None:
+                self.pulled_at_delivery.append(len(self._pulled))
+
+        return PYIO.attempt(record)
+
+
+def tracked(n, pulled):
+    for i in range(n):
+        pulled.append(i)
+        yield i
+
+
+class TestForeachInto(TestCase):
+    def test_delivers_results_in_batches(self):
+        sink = RecordingSink()
+        effect = foreach_into(
+            range(7), lambda x: PYIO.success(x * 2), sink, batch_size=3
+        )
+        self.assertEqual(effect.run(), 7)
+        self.assertEqual(sink.batches, [[0, 2, 4], [6, 8, 10], [12]])
+
+    def test_pulls_items_lazily(self):
+        pulled = []
+        sink = RecordingSink(pulled)
+        effect = foreach_into(
+            tracked(6, pulled), lambda x: PYIO.success(x), sink, batch_size=2
+        )
+        self.assertEqual(pulled, [])
+        self.assertEqual(effect.run(), 6)
+        # Each batch is delivered before the next items are pulled
+        self.assertEqual(sink.pulled_at_delivery, [2, 4, 6])
+
+    def test_large_generator(self):
+        total = []
+        effect = foreach_into(
+            (i for i in range(200_000)),
+            lambda x: PYIO.success(x),
+            lambda batch: PYIO.attempt(lambda: total.append(sum(batch))),
+            batch_size=10_000,
+        )
+        self.assertEqual(effect.run(), 200_000)
+        self.assertEqual(len(total), 20)
+        self.assertEqual(sum(total), sum(range(200_000)))
+
+    def test_item_failure(self):
+        sink = RecordingSink()
+        error = ValueError("Error on item 3")
+
+        def process(x):
+            return PYIO.fail(error) if x == 3 else PYIO.success(x)
+
+        self.assertIs(foreach_into(range(10), process, sink, batch_size=2).run(), error)
+        self.assertEqual(sink.batches, [[0, 1]])
+
+    def test_sink_failure(self):
+        error = ValueError("sink failed")
+        effect = foreach_into(range(5), PYIO.success, lambda batch: PYIO.fail(error))
+        self.assertIs(effect.run(), error)
+
+    def test_iterable_failure(self):
+        def broken():
+            yield 1
+            raise ValueError("broken source")
+
+        result = foreach_into(broken(), PYIO.success, RecordingSink()).run()
+        self.assertIsInstance(result, ValueError)
+
+    def test_empty_iterable(self):
+        sink = RecordingSink()
+        self.assertEqual(foreach_into([], PYIO.success, sink).run(), 0)
+        self.assertEqual(sink.batches, [])
+
+    def test_invalid_batch_size(self):
+        with self.assertRaises(ValueError):
+            foreach_into([], PYIO.success, RecordingSink(), batch_size=0)
+
+
+class TestCollectAllInto(TestCase):
+    def test_runs_effects_from_generator(self):
+        created = []
+
+        def effects():
+            for i in range(5):
+                created.append(i)
+                yield PYIO.success(i)
+
+        sink = RecordingSink()
+        effect = collect_all_into(effects(), sink, batch_size=2)
+        self.assertEqual(created, [])
+        self.assertEqual(effect.run(), 5)
+        self.assertEqual(sink.batches, [[0, 1], [2, 3], [4]])
+
+
+class TestFilterInto(TestCase):
+    def test_delivers_kept_items(self):
+        sink = RecordingSink()
+        effect = filter_into(
+            range(10), lambda x: PYIO.success(x % 2 == 0), sink, batch_size=2
+        )
+        self.assertEqual(effect.run(), 5)
+        self.assertEqual(sink.batches, [[0, 2], [4, 6], [8]])
+
+    def test_predicate_failure(self):
+        error = ValueError("test error")
+        effect = filter_into(range(3), lambda x: PYIO.fail(error), RecordingSink())
+        self.assertIs(effect.run(), error)
+
+
+class TestPartitionInto(TestCase):
+    def test_delivers_failures_and_successes(self):
+        sink = RecordingSink()
+
+        def process(x):
+            if x % 3 == 0:
+                return PYIO.fail(ValueError(f"Error on {x}"))
+            return PYIO.success(x)
+
+        effect = partition_into(range(7), process, sink, batch_size=4)
+        self.assertEqual(effect.run(), (3, 4))
+        self.assertEqual(len(sink.batches), 2)
+        failures, successes = sink.batches[0]
+        self.assertEqual([str(e) for e in failures], ["Error on 0", "Error on 3"])
+        self.assertEqual(successes, [1, 2])
+
+    def test_exception_building_effect_counts_as_failure(self):
+        def process(x):
+            raise ValueError("bad item")
+
+        self.assertEqual(partition_into([1, 2], process, RecordingSink()).run(), (2, 0))
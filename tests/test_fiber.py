@@ -0,0 +1,157 @@
+"""Unit tests for the pyfecto.fiber module."""
+
+import threading
+import time
+from unittest import TestCase
+
+from src.pyfecto.fiber import Fiber, FiberInterrupted
+from src.pyfecto.pyio import PYIO
+
+
+class TestFiber(TestCase):
+    def test_fork_join_success(self):
+        effect = PYIO.attempt(lambda: 21).map(lambda x: x * 2)
+        result = effect.fork().flat_map(lambda fiber: fiber.join()).run()
+        self.assertEqual(result, 42)
+
+    def test_fork_returns_fiber_handle(self):
+        fiber = PYIO.success(1).fork().run()
+        self.assertIsInstance(fiber, Fiber)
+        self.assertEqual(fiber.join().run(), 1)
+
+    def test_join_propagates_failure(self):
+        error = ValueError("test error")
+        result = PYIO.fail(error).fork().flat_map(lambda f: f.join()).run()
+        self.assertIs(result, error)
+
+    def test_forked_effects_overlap(self):
+        def slow(value):
+            return PYIO.attempt(lambda: time.sleep(0.2)).map_to(lambda: value)
+
+        program = (
+            slow("a")
+            .fork()
+            .zip(slow("b").fork())
+            .flat_map(lambda fibers: fibers[0].join().zip(fibers[1].join()))
+        )
+        start = time.perf_counter()
+        result = program.run()
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(result, ("a", "b"))
+        self.assertLess(elapsed, 0.35)
+
+    def test_fork_is_lazy(self):
+        calls = []
+        effect = PYIO.attempt(lambda: calls.append(1)).fork()
+        self.assertEqual(calls, [])
+        effect.flat_map(lambda f: f.join()).run()
+        self.assertEqual(calls, [1])
+
+    def test_poll(self):
+        release = threading.Event()
+        fiber = (
+            PYIO.attempt(lambda: release.wait(5)).map_to(lambda: "done").fork().run()
+        )
+        self.assertIsNone(fiber.poll().run())
+
+        release.set()
+        fiber.join().run()
+        self.assertEqual(fiber.poll().run(), (None, "done"))
+
+    def test_interrupt_suspended_fiber(self):
+        registered = threading.Event()
+        cancelled = threading.Event()
+
+        def register(callback):
+            registered.set()
+            return cancelled.set
+
+        fiber = PYIO.from_callback(register).fork().run()
+        registered.wait(5)
+        fiber.interrupt().run()
+
+        self.assertTrue(cancelled.is_set())
+        self.assertTrue(fiber.is_done())
+        self.assertIsInstance(fiber.join().run(), FiberInterrupted)
+
+    def test_interrupt_running_fiber(self):
+        steps = []
+
+        def loop(n):
+            return PYIO.attempt(lambda: steps.append(n)).flat_map(lambda _: loop(n + 1))
+
+        fiber = loop(0).fork().run()
+        while not steps:
+            time.sleep(0.01)
+        fiber.interrupt().run()
+
+        self.assertIsInstance(fiber.join().run(), FiberInterrupted)
+        count = len(steps)
+        time.sleep(0.05)
+        self.assertEqual(len(steps), count)
+
+    def test_interrupt_finished_fiber_keeps_outcome(self):
+        fiber = PYIO.success(1).fork().run()
+        fiber.join().run()
+        fiber.interrupt().run()
+        self.assertEqual(fiber.join().run(), 1)
+
+    def test_long_running_fibers_share_the_pool(self):
+        def count(n):
+            effect = PYIO.success(0)
+            for _ in range(n):
+                effect = effect.flat_map(lambda x: PYIO.success(x + 1))
+            return effect
+
+        program = PYIO.chain_all(*[count(5_000).fork() for _ in range(50)]).flat_map(
+            lambda last: last.join()
+        )
+        self.assertEqual(program.run(), 5_000)
+
+    def test_join_from_another_fiber(self):
+        release = threading.Event()
+        inner = PYIO.attempt(lambda: release.wait(5)).map_to(lambda: "inner")
+        program = inner.fork().flat_map(
+            lambda fiber: fiber.join().map(lambda v: v + "+outer").fork()
+        )
+        outer = program.run()
+        release.set()
+        self.assertEqual(outer.join().run(), "inner+outer")
+
+    def test_from_callback(self):
+        effect = PYIO.from_callback(lambda callback: callback(None, 42))
+        self.assertEqual(effect.run(), 42)
+
+        error = ValueError("test error")
+        failing = PYIO.from_callback(lambda callback: callback(error, None))
+        self.assertIs(failing.run(), error)
+
+        def register(callback):
+            threading.Timer(0.01, lambda: callback(None, "later")).start()
+
+        self.assertEqual(PYIO.from_callback(register).run(), "later")
+
+    def test_join_all(self):
+        fibers = [PYIO.success(i).fork().run() for i in range(5)]
+        self.assertEqual(Fiber.join_all(fibers).run(), [0, 1, 2, 3, 4])
+        self.assertEqual(Fiber.join_all([]).run(), [])
+
+    def test_join_all_fails_fast_and_interrupts_the_rest(self):
+        error = ValueError("test error")
+        release = threading.Event()
+        slow = PYIO.from_callback(lambda callback: release.set).fork().run()
+        failing = PYIO.fail(error).fork().run()
+
+        start = time.perf_counter()
+        self.assertIs(Fiber.join_all([slow, failing]).run(), error)
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertIsInstance(slow.join().run(), FiberInterrupted)
+
+    def test_exception_in_fiber_fails_the_fiber(self):
+        def explode(_):
+            raise ValueError("exploded")
+
+        fiber = PYIO.success(1).map(explode).fork().run()
+        result = fiber.join().run()
+        self.assertIsInstance(result, ValueError)
@@ -0,0 +1,90 @@
+"""Unit tests for the level checks and lazy messages of the log effects."""
+
+from unittest import TestCase
+
+from src.pyfecto.pyio import PYIO
+from src.pyfecto.runtime import LOGGER, Runtime, _level_number
+
+
+class TestLogLevels(TestCase):
+    def setUp(self):
+        self.runtime = Runtime()
+        self.min_level = self.runtime._min_log_level
+        # As if the runtime was configured with log_level="INFO"
+        self.runtime._min_log_level = _level_number("INFO")
+        self.messages = []
+        self.handler = LOGGER.add(
+            self.messages.append, format="{level} {message}", level="TRACE"
+        )
+
+    def tearDown(self):
+        LOGGER.remove(self.handler)
+        self.runtime._min_log_level = self.min_level
+
+    def test_log_enabled(self):
+        self.assertFalse(self.runtime.log_enabled("TRACE"))
+        self.assertFalse(self.runtime.log_enabled("DEBUG"))
+        self.assertTrue(self.runtime.log_enabled("INFO"))
+        self.assertTrue(self.runtime.log_enabled("CRITICAL"))
+
+    def test_disabled_message_is_not_built(self):
+        built = []
+
+        def expensive():
+            built.append(True)
+            return "expensive"
+
+        effect = PYIO.log_debug(expensive)
+        self.assertIs(effect, PYIO.unit())
+        self.assertIsNone(effect.run())
+        self.assertEqual(built, [])
+        self.assertEqual(self.messages, [])
+
+    def test_enabled_message_is_built_when_run(self):
+        built = []
+
+        def message():
+            built.append(True)
+            return "built"
+
+        effect = PYIO.log_info(message)
+        self.assertEqual(built, [])
+        effect.run()
+        effect.run()
+        self.assertEqual(len(built), 2)
+        self.assertEqual(self.messages, ["INFO built\n", "INFO built\n"])
+
+    def test_template(self):
+        PYIO.log_warning("{count} items left", count=3).run()
+        self.assertEqual(self.messages, ["WARNING 3 items left\n"])
+
+    def test_level_checked_again_when_run(self):
+        effect = PYIO.log_info(lambda: "later")
+        self.runtime._min_log_level = _level_number("ERROR")
+        effect.run()
+        self.assertEqual(self.messages, [])
+
+    def test_disabled_span_skips_the_record(self):
+        self.runtime._min_log_level = _level_number("WARNING")
+        built = []
+
+        def message():
+            built.append(True)
+            return "done"
+
+        span = PYIO.log_span("task", message, PYIO.success(42))
+        self.assertEqual(span.run(), 42)
+        self.assertEqual(self.messages, [])
+        self.assertEqual(built, [])
+
+    def test_span_with_lazy_message(self):
+        span = PYIO.log_span("task", lambda: "done", PYIO.success(42))
+        self.assertEqual(span.run(), 42)
+        self.assertEqual(self.messages, ["INFO done\n"])
+
+    def test_level_numbers(self):
+        self.assertEqual(_level_number("DEBUG"), 10)
+        self.assertEqual(_level_number(15), 15)
+        LOGGER.level("NOTICE", no=25)
+        self.assertEqual(_level_number("NOTICE"), 25)
+        self.assertTrue(self.runtime.log_enabled("NOTICE"))
@@ -0,0 +1,161 @@
+"""Unit tests for the pyfecto.log_pipeline module."""
+
+import threading
+import time
+from unittest import TestCase
+
+from src.pyfecto.collections import foreach_par
+from src.pyfecto.log_pipeline import LogPipeline
+from src.pyfecto.pyio import PYIO
+from src.pyfecto.runtime import LOGGER, Runtime
+
+
+class SlowSink:
+    """Collects formatted messages, taking a while for each, until it is released."""
+
+    def __init__(self, delay=0.0):
+        self.messages = []
+        self.delay = delay
+        self.released = threading.Event()
+        self.released.set()
+
+    def __call__(self, message):
+        self.released.wait()
+        if self.delay:
+            time.sleep(self.delay)
+        self.messages.append(str(message))
+
+
+class TestLogPipeline(TestCase):
+    def setUp(self):
+        self.runtime = Runtime()
+        self.sink = SlowSink()
+        self.handler = LOGGER.add(
+            self.sink, format="{time:HH:mm:ss.SSS} | {level} | {message} | {extra}"
+        )
+
+    def tearDown(self):
+        LOGGER.remove(self.handler)
+        self.runtime.log_pipeline = None
+
+    def use(self, pipeline):
+        self.runtime.log_pipeline = pipeline
+        return pipeline
+
+    def test_log_effects_go_through_the_pipeline(self):
+        pipeline = self.use(LogPipeline())
+        PYIO.log_info("hello {name}", name="world").run()
+        PYIO.log_warning("careful").run()
+        PYIO.log_span("task", "done", PYIO.unit()).run()
+        self.assertTrue(pipeline.flush(timeout=1))
+        self.assertEqual(len(self.sink.messages), 3)
+        self.assertIn("INFO | hello world", self.sink.messages[0])
+        self.assertIn("WARNING | careful", self.sink.messages[1])
+        self.assertIn("'spans': {'task':", self.sink.messages[2])
+        stats = pipeline.stats()
+        self.assertEqual((stats.submitted, stats.written, stats.dropped), (3, 3, 0))
+
+    def test_logging_does_not_wait_for_the_sink(self):
+        self.sink.delay = 0.05
+        pipeline = self.use(LogPipeline())
+        started = time.monotonic()
+        for i in range(10):
+            PYIO.log_info(f"message {i}").run()
+        self.assertLess(time.monotonic() - started, 0.05)
+        self.assertTrue(pipeline.flush(timeout=2))
+        self.assertEqual(len(self.sink.messages), 10)
+
+    def test_keeps_the_logging_time(self):
+        self.sink.released.clear()
+        pipeline = self.use(LogPipeline())
+        logged_at = time.strftime("%H:%M:%S")
+        PYIO.log_info("early").run()
+        time.sleep(1.1)
+        self.sink.released.set()
+        pipeline.flush(timeout=1)
+        self.assertTrue(self.sink.messages[0].startswith(logged_at))
+
+    def test_drop_policy(self):
+        self.sink.released.clear()
+        pipeline = self.use(LogPipeline(capacity=5, batch_size=1))
+        for i in range(20):
+            PYIO.log_info(f"message {i}").run()
+        self.sink.released.set()
+        pipeline.flush(timeout=1)
+        stats = pipeline.stats()
+        self.assertGreater(stats.dropped, 0)
+        self.assertEqual(stats.submitted + stats.dropped, 20)
+        self.assertEqual(len(self.sink.messages), stats.written)
+
+    def test_block_policy(self):
+        self.sink.released.clear()
+        pipeline = self.use(LogPipeline(capacity=5, batch_size=1, overflow="block"))
+        producer = threading.Thread(
+            target=lambda: [PYIO.log_info(f"message {i}").run() for i in range(20)]
+        )
+        producer.start()
+        time.sleep(0.05)
+        self.assertTrue(producer.is_alive())
+        self.sink.released.set()
+        producer.join(timeout=1)
+        pipeline.flush(timeout=1)
+        self.assertEqual(pipeline.stats().dropped, 0)
+        self.assertEqual(len(self.sink.messages), 20)
+        self.assertIn("message 19", self.sink.messages[-1])
+
+    def test_concurrent_logging(self):
+        pipeline = self.use(LogPipeline(capacity=100_000))
+        foreach_par(
+            list(range(500)), lambda i: PYIO.log_info(f"item {i}"), max_concurrency=8
+        ).run()
+        pipeline.flush(timeout=2)
+        self.assertEqual(len(self.sink.messages), 500)
+
+    def test_close(self):
+        pipeline = self.use(LogPipeline())
+        PYIO.log_info("before").run()
+        self.assertTrue(pipeline.close(timeout=1))
+        PYIO.log_info("after").run()
+        self.assertEqual(len(self.sink.messages), 1)
+        self.assertEqual(pipeline.stats().dropped, 1)
+
+    def test_shutdown_flushes(self):
+        self.sink.delay = 0.01
+        pipeline = self.use(LogPipeline())
+        for i in range(5):
+            PYIO.log_info(f"message {i}").run()
+        self.runtime.shutdown()
+        self.assertEqual(pipeline.stats().pending, 0)
+        self.assertEqual(len(self.sink.messages), 5)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            LogPipeline(capacity=0)
+        with self.assertRaises(ValueError):
+            LogPipeline(batch_size=0)
+        with self.assertRaises(ValueError):
+            LogPipeline(overflow="wait")
+
+
+class TestLoggingWithoutRuntime(TestCase):
+    def setUp(self):
+        Runtime()
+        # As if the application had not created the runtime
+        self.instance, Runtime._instance = Runtime._instance, None
+        self.messages = []
+        self.handler = LOGGER.add(
+            self.messages.append, format="{level} {message}", level="DEBUG"
+        )
+
+    def tearDown(self):
+        LOGGER.remove(self.handler)
+        Runtime._instance = self.instance
+
+    def test_log_effects_keep_the_application_sinks(self):
+        PYIO.log_info("info").run()
+        PYIO.log_debug(lambda: "debug").run()
+        LOGGER.debug("plain")
+        self.assertIsNone(Runtime._instance)
+        self.assertEqual(
+            self.messages, ["INFO info\n", "DEBUG debug\n", "DEBUG plain\n"]
+        )
@@ -0,0 +1,141 @@
+"""Unit tests for the pyfecto.log_sampling module."""
+
+import time
+from unittest import TestCase, mock
+
+from src.pyfecto.collections import foreach, foreach_par
+from src.pyfecto.log_pipeline import LogPipeline
+from src.pyfecto.log_sampling import LogSampler
+from src.pyfecto.pyio import PYIO
+from src.pyfecto.runtime import LOGGER, Runtime
+
+
+class TestLogSampling(TestCase):
+    def setUp(self):
+        self.runtime = Runtime()
+        self.messages = []
+        self.handler = LOGGER.add(self.messages.append, format="{level} {message}")
+
+    def tearDown(self):
+        self.runtime.log_sampler = None
+        LOGGER.remove(self.handler)
+        self.runtime.log_pipeline = None
+
+    def use(self, sampler):
+        self.runtime.log_sampler = sampler
+        return sampler
+
+    def texts(self):
+        return [str(message).strip() for message in self.messages]
+
+    def test_every_nth(self):
+        sampler = self.use(LogSampler(every=10))
+        foreach(list(range(100)), lambda i: PYIO.log_info(f"item {i}")).run()
+        self.assertEqual(self.texts(), [f"INFO item {i}" for i in range(0, 100, 10)])
+        stats = sampler.stats()
+        self.assertEqual((stats.logged, stats.suppressed), (10, 90))
+
+    def test_levels_are_sampled_separately(self):
+        self.use(LogSampler(every=3))
+        for _ in range(3):
+            PYIO.log_info("info").run()
+            PYIO.log_warning("warning").run()
+        self.assertEqual(self.texts(), ["INFO info", "WARNING warning"])
+
+    def test_per_second(self):
+        sampler = self.use(LogSampler(per_second=20, burst=5))
+        for i in range(50):
+            PYIO.log_info(f"burst {i}").run()
+        self.assertEqual(len(self.messages), 5)
+        time.sleep(0.1)
+        PYIO.log_info("after refill").run()
+        self.assertEqual(self.texts()[-1], "INFO after refill")
+        self.assertEqual(sampler.stats().suppressed, 45)
+
+    def test_every_nth_and_per_second(self):
+        self.use(LogSampler(every=2, per_second=1, burst=3))
+        for i in range(20):
+            PYIO.log_info(f"item {i}").run()
+        self.assertEqual(self.texts(), ["INFO item 0", "INFO item 2", "INFO item 4"])
+
+    def test_errors_are_always_logged(self):
+        self.use(LogSampler(every=1000))
+        for i in range(5):
+            PYIO.log_error(f"error {i}").run()
+            PYIO.log_critical(f"critical {i}").run()
+        self.assertEqual(len(self.messages), 10)
+
+    def test_errors_can_be_sampled(self):
+        self.use(LogSampler(every=1000, always_log_errors=False))
+        for i in range(5):
+            PYIO.log_error(f"error {i}").run()
+        self.assertEqual(self.texts(), ["ERROR error 0"])
+
+    def test_suppressed_messages_are_not_built(self):
+        built = []
+
+        def message():
+            built.append(True)
+            return "built"
+
+        self.use(LogSampler(every=10))
+        for _ in range(30):
+            PYIO.log_info(message).run()
+        self.assertEqual(len(built), 3)
+
+    def test_log_span(self):
+        self.use(LogSampler(every=100))
+        spans = [PYIO.log_span("task", "task done", PYIO.success(i)) for i in range(5)]
+        self.assertEqual([span.run() for span in spans], [0, 1, 2, 3, 4])
+        failing = PYIO.log_span("task", "task failed", PYIO.fail(ValueError("test")))
+        self.assertIsInstance(failing.run(), ValueError)
+        self.assertEqual(self.texts(), ["INFO task done", "INFO task failed"])
+
+    def test_summary(self):
+        self.use(LogSampler(every=10, summary_interval=0.05))
+        for i in range(20):
+            PYIO.log_info(f"item {i}").run()
+        time.sleep(0.06)
+        PYIO.log_info("last").run()
+        summary = self.messages[2]
+        self.assertEqual(summary.record["level"].name, "INFO")
+        self.assertEqual(summary.record["extra"], {"suppressed": 18})
+        self.assertIn("suppressed 18 INFO log records", summary.record["message"])
+        self.assertEqual(self.texts()[3], "INFO last")
+
+    def test_shutdown_reports_suppressed(self):
+        self.use(LogSampler(every=5))
+        pipeline = self.runtime.log_pipeline = LogPipeline()
+        for i in range(10):
+            PYIO.log_warning(f"item {i}").run()
+        self.runtime.shutdown()
+        self.assertEqual(pipeline.stats().pending, 0)
+        self.assertEqual(len(self.messages), 3)
+        self.assertEqual(self.messages[-1].record["extra"], {"suppressed": 8})
+        self.runtime.log_sampler.flush()
+        self.assertEqual(len(self.messages), 3)
+
+    @mock.patch("atexit.register")
+    def test_suppressing_does_not_register_exit_hooks(self, mock_register):
+        self.use(LogSampler(every=5))
+        for i in range(10):
+            PYIO.log_info(f"item {i}").run()
+        mock_register.assert_not_called()
+
+    def test_concurrent_logging(self):
+        sampler = self.use(LogSampler(every=7))
+        foreach_par(
+            list(range(700)), lambda i: PYIO.log_info(f"item {i}"), max_concurrency=8
+        ).run()
+        self.assertEqual(len(self.messages), 100)
+        self.assertEqual(sampler.stats().suppressed, 600)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            LogSampler(every=0)
+        with self.assertRaises(ValueError):
+            LogSampler(per_second=0)
+        with self.assertRaises(ValueError):
+            LogSampler(per_second=1, burst=0)
+        with self.assertRaises(ValueError):
+            LogSampler(summary_interval=0)
@@ -0,0 +1,124 @@
+"""Unit tests for PYIO.memoize and PYIO.cached."""
+
+import threading
+import time
+from unittest import TestCase
+
+from src.pyfecto.collections import collect_all_par
+from src.pyfecto.pyio import PYIO
+
+
+def counting(value="value", seconds=0.0):
+    """An effect recording each of its runs, together with the list of runs."""
+    calls = []
+
+    def call():
+        calls.append(1)
+        time.sleep(seconds)
+        return f"{value}-{len(calls)}"
+
+    return PYIO.attempt(call), calls
+
+
+class TestMemoize(TestCase):
+    def test_runs_once(self):
+        effect, calls = counting()
+        memoized = effect.memoize()
+        self.assertEqual(memoized.run(), "value-1")
+        self.assertEqual(memoized.run(), "value-1")
+        self.assertEqual(len(calls), 1)
+
+    def test_is_lazy(self):
+        effect, calls = counting()
+        effect.memoize()
+        self.assertEqual(calls, [])
+
+    def test_memoizes_failure(self):
+        calls = []
+
+        def fail():
+            calls.append(1)
+            raise ValueError("boom")
+
+        memoized = PYIO.attempt(fail).memoize()
+        first = memoized.run()
+        self.assertIsInstance(first, ValueError)
+        self.assertIs(memoized.run(), first)
+        self.assertEqual(len(calls), 1)
+
+    def test_concurrent_callers_share_the_run(self):
+        effect, calls = counting(seconds=0.1)
+        memoized = effect.memoize()
+        result = collect_all_par([memoized for _ in range(20)]).run()
+        self.assertEqual(result, ["value-1"] * 20)
+        self.assertEqual(len(calls), 1)
+
+    def test_concurrent_threads_share_the_run(self):
+        effect, calls = counting(seconds=0.1)
+        memoized = effect.memoize()
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(memoized.run()))
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["value-1"] * 10)
+        self.assertEqual(len(calls), 1)
+
+    def test_interrupted_caller_does_not_cancel_the_shared_run(self):
+        effect, calls = counting(seconds=0.1)
+        memoized = effect.memoize()
+        waiter = memoized.fork().run()
+        waiter.interrupt().run()
+        self.assertEqual(memoized.run(), "value-1")
+        self.assertEqual(len(calls), 1)
+
+    def test_composes(self):
+        effect, calls = counting()
+        memoized = effect.memoize()
+        program = memoized.zip(memoized).map(lambda pair: pair[0] == pair[1])
+        self.assertTrue(program.run())
+        self.assertEqual(len(calls), 1)
+
+
+class TestCached(TestCase):
+    def test_reuses_value_until_expiry(self):
+        effect, calls = counting()
+        cached = effect.cached(ttl=0.1)
+        self.assertEqual(cached.run(), "value-1")
+        self.assertEqual(cached.run(), "value-1")
+        time.sleep(0.15)
+        self.assertEqual(cached.run(), "value-2")
+        self.assertEqual(cached.run(), "value-2")
+        self.assertEqual(len(calls), 2)
+
+    def test_refresh_is_single_flight(self):
+        effect, calls = counting(seconds=0.05)
+        cached = effect.cached(ttl=0.05)
+        cached.run()
+        time.sleep(0.1)
+        result = collect_all_par([cached for _ in range(20)]).run()
+        self.assertEqual(result, ["value-2"] * 20)
+        self.assertEqual(len(calls), 2)
+
+    def test_failures_are_not_cached(self):
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) == 1:
+                raise ValueError("first call fails")
+            return "ok"
+
+        cached = PYIO.attempt(flaky).cached(ttl=10)
+        self.assertIsInstance(cached.run(), ValueError)
+        self.assertEqual(cached.run(), "ok")
+        self.assertEqual(cached.run(), "ok")
+        self.assertEqual(len(calls), 2)
+
+    def test_invalid_ttl(self):
+        with self.assertRaises(ValueError):
+            PYIO.success(1).cached(ttl=0)
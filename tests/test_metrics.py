@@ -0,0 +1,224 @@
+"""Unit tests for the pyfecto.metrics module and PYIO.timed / PYIO.counted."""
+
+import math
+import os
+import random
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from unittest import TestCase
+
+from src.pyfecto.collections import foreach_par
+from src.pyfecto.metrics import Counter, Gauge, Histogram, Metric, MetricsRegistry
+from src.pyfecto.pyio import PYIO
+from src.pyfecto.runtime import Runtime
+
+
+class TestCounter(TestCase):
+    def test_inc(self):
+        counter = Counter("jobs_total")
+        counter.inc()
+        counter.inc(2.5)
+        self.assertEqual(counter.value, 3.5)
+        with self.assertRaises(ValueError):
+            counter.inc(-1)
+
+    def test_concurrent_increments(self):
+        counter = Counter("jobs_total")
+
+        def work():
+            for _ in range(10_000):
+                counter.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(counter.value, 80_000)
+
+    def test_invalid_names(self):
+        with self.assertRaises(ValueError):
+            Counter("jobs-total")
+        with self.assertRaises(ValueError):
+            Counter("jobs_total", labels={"__name__": "x"})
+
+
+class TestMetric(TestCase):
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            Metric("jobs_total")
+
+
+class TestGauge(TestCase):
+    def test_set_inc_dec(self):
+        gauge = Gauge("connections")
+        gauge.set(5)
+        gauge.inc()
+        gauge.dec(3)
+        self.assertEqual(gauge.value, 3)
+
+    def test_track(self):
+        gauge = Gauge("in_progress")
+        seen = gauge.track(PYIO.attempt(lambda: gauge.value)).run()
+        self.assertEqual(seen, 1)
+        self.assertEqual(gauge.value, 0)
+        gauge.track(PYIO.fail(ValueError("test error"))).run()
+        self.assertEqual(gauge.value, 0)
+
+
+class TestHistogram(TestCase):
+    def test_quantiles_within_relative_error(self):
+        histogram = Histogram("latency_seconds", significant_figures=2)
+        values = [random.lognormvariate(-5, 2) for _ in range(20_000)]
+        for value in values:
+            histogram.record(value)
+        values.sort()
+        for q in [0.5, 0.9, 0.99, 0.999]:
+            exact = values[math.ceil(q * len(values)) - 1]
+            self.assertAlmostEqual(histogram.quantile(q) / exact, 1, delta=0.01)
+
+    def test_snapshot(self):
+        histogram = Histogram("sizes", quantiles=(0.5, 1))
+        for value in [0, 1, 2, 3, 1000]:
+            histogram.record(value)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot.count, 5)
+        self.assertEqual(snapshot.sum, 1006)
+        self.assertEqual((snapshot.min, snapshot.max), (0, 1000))
+        self.assertAlmostEqual(snapshot.quantiles[0.5], 2, delta=0.02)
+        self.assertEqual(snapshot.quantiles[1], 1000)
+        self.assertEqual(histogram.quantile(0), 0)
+
+    def test_empty(self):
+        histogram = Histogram("empty")
+        self.assertEqual(histogram.count, 0)
+        self.assertTrue(math.isnan(histogram.quantile(0.5)))
+
+    def test_concurrent_records(self):
+        histogram = Histogram("latency_seconds")
+
+        def work():
+            for i in range(1, 5_001):
+                histogram.record(i / 1000)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(histogram.count, 20_000)
+        self.assertAlmostEqual(histogram.quantile(0.5), 2.5, delta=0.025)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            Histogram("latency_seconds").record(-1)
+        with self.assertRaises(ValueError):
+            Histogram("latency_seconds", significant_figures=0)
+        with self.assertRaises(ValueError):
+            Histogram("latency_seconds", quantiles=(1.5,))
+
+
+class TestRegistry(TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_get_or_create(self):
+        counter = self.registry.counter("jobs_total", "Jobs processed")
+        self.assertIs(self.registry.counter("jobs_total"), counter)
+        labelled = self.registry.counter("jobs_total", labels={"queue": "emails"})
+        self.assertIsNot(labelled, counter)
+        self.assertEqual(self.registry.metrics(), [counter, labelled])
+        with self.assertRaises(ValueError):
+            self.registry.gauge("jobs_total")
+
+    def test_prometheus_format(self):
+        self.registry.counter("jobs_total", "Jobs\nprocessed").inc(3)
+        self.registry.counter("jobs_total", labels={"queue": 'a "b"\\c'}).inc()
+        self.registry.gauge("temperature").set(21.5)
+        histogram = self.registry.histogram(
+            "latency_seconds", "Latency", quantiles=(0.5, 0.99)
+        )
+        histogram.record(0.25)
+        self.assertEqual(
+            self.registry.to_prometheus(),
+            "# HELP jobs_total Jobs\\nprocessed\n"
+            "# TYPE jobs_total counter\n"
+            "jobs_total 3\n"
+            'jobs_total{queue="a \\"b\\"\\\\c"} 1\n'
+            "# TYPE temperature gauge\n"
+            "temperature 21.5\n"
+            "# HELP latency_seconds Latency\n"
+            "# TYPE latency_seconds summary\n"
+            'latency_seconds{quantile="0.5"} 0.25\n'
+            'latency_seconds{quantile="0.99"} 0.25\n'
+            "latency_seconds_sum 0.25\n"
+            "latency_seconds_count 1\n",
+        )
+
+    def test_write_prometheus(self):
+        self.registry.counter("jobs_total").inc()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "app.prom")
+            self.registry.write_prometheus(path)
+            with open(path) as file:
+                self.assertEqual(file.read(), self.registry.to_prometheus())
+            self.assertEqual(os.listdir(directory), ["app.prom"])
+
+    def test_serve(self):
+        self.registry.counter("jobs_total").inc(7)
+        server = self.registry.serve(port=0)
+        try:
+            base = f"http://127.0.0.1:{server.server_port}"
+            with urllib.request.urlopen(f"{base}/metrics", timeout=5) as response:
+                self.assertIn("text/plain", response.headers["Content-Type"])
+                self.assertIn("jobs_total 7\n", response.read().decode())
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(f"{base}/other", timeout=5)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestCombinators(TestCase):
+    def setUp(self):
+        self.runtime = Runtime()
+        self.metrics = self.runtime._metrics
+        self.runtime._metrics = MetricsRegistry()
+
+    def tearDown(self):
+        self.runtime._metrics = self.metrics
+
+    def test_timed(self):
+        effect = PYIO.sleep(0.02).timed("sleep_seconds")
+        effect.run()
+        effect.run()
+        histogram = self.runtime.metrics.histogram("sleep_seconds")
+        self.assertEqual(histogram.count, 2)
+        self.assertGreaterEqual(histogram.quantile(0.5), 0.02)
+        self.assertLess(histogram.quantile(0.5), 1)
+
+    def test_timed_records_failures_and_interruptions(self):
+        histogram = Histogram("latency_seconds")
+        PYIO.fail(ValueError("test error")).timed(histogram).run()
+        PYIO.sleep(1).timed(histogram).timeout(0.02).run()
+        PYIO.sleep(0.05).run()
+        self.assertEqual(histogram.count, 2)
+
+    def test_counted(self):
+        counter = Counter("attempts_total")
+        effect = PYIO.fail(ValueError("test error")).counted(counter)
+        effect.run()
+        effect.run()
+        self.assertEqual(counter.value, 2)
+
+    def test_counted_by_name_in_parallel(self):
+        foreach_par(
+            list(range(200)),
+            lambda i: PYIO.unit().counted("items_total").timed("item_seconds"),
+            max_concurrency=8,
+        ).run()
+        self.assertEqual(self.runtime.metrics.counter("items_total").value, 200)
+        self.assertEqual(self.runtime.metrics.histogram("item_seconds").count, 200)
+        self.assertIn("items_total 200\n", self.runtime.metrics.to_prometheus())
@@ -0,0 +1,241 @@
+"""Unit tests for the pyfecto.primitives module."""
+
+import asyncio
+import threading
+import time
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from src.pyfecto.collections import foreach_par
+from src.pyfecto.fiber import Fiber
+from src.pyfecto.pyio import PYIO, EffectTimeoutError
+from src.pyfecto.primitives import Promise, Queue, Ref, Semaphore
+
+
+class TestRef(TestCase):
+    def test_get_set_update(self):
+        ref = Ref(1)
+        self.assertEqual(ref.get().run(), 1)
+        ref.set(5).run()
+        ref.update(lambda n: n * 2).run()
+        self.assertEqual(ref.get().run(), 10)
+        self.assertEqual(ref.update_and_get(lambda n: n + 1).run(), 11)
+
+    def test_modify(self):
+        counter = Ref(0)
+        ids = [counter.modify(lambda n: (n, n + 1)).run() for _ in range(3)]
+        self.assertEqual(ids, [0, 1, 2])
+        self.assertEqual(counter.get().run(), 3)
+
+    def test_concurrent_updates_are_atomic(self):
+        ref = Ref(0)
+        foreach_par(list(range(500)), lambda _: ref.update(lambda n: n + 1)).run()
+        self.assertEqual(ref.get().run(), 500)
+
+    def test_failing_update_keeps_value(self):
+        ref = Ref(1)
+        result = ref.update(lambda n: n / 0).run()
+        self.assertIsInstance(result, ZeroDivisionError)
+        self.assertEqual(ref.get().run(), 1)
+
+
+class TestPromise(TestCase):
+    def test_wait_for_value(self):
+        promise = Promise()
+        waiters = [Fiber.start(promise.wait().map(lambda v: v + 1)) for _ in range(3)]
+        self.assertFalse(promise.is_done().run())
+        self.assertTrue(promise.succeed(41).run())
+        self.assertEqual(Fiber.join_all(waiters).run(), [42, 42, 42])
+        self.assertTrue(promise.is_done().run())
+
+    def test_fail(self):
+        promise = Promise()
+        error = ValueError("test error")
+        promise.fail(error).run()
+        self.assertIs(promise.wait().run(), error)
+
+    def test_completes_once(self):
+        promise = Promise()
+        self.assertTrue(promise.succeed(1).run())
+        self.assertFalse(promise.succeed(2).run())
+        self.assertFalse(promise.fail(ValueError()).run())
+        self.assertEqual(promise.wait().run(), 1)
+
+    def test_completed_from_another_thread(self):
+        promise = Promise()
+        threading.Timer(0.05, lambda: promise.succeed("done").run()).start()
+        self.assertEqual(promise.wait().run(), "done")
+
+    def test_wait_can_time_out(self):
+        promise = Promise()
+        self.assertIsInstance(promise.wait().timeout(0.05).run(), EffectTimeoutError)
+        self.assertEqual(promise._waiters, [])
+
+
+class TestSemaphore(TestCase):
+    def test_limits_concurrency(self):
+        semaphore = Semaphore(3)
+        lock = threading.Lock()
+        active = [0]
+        peak = [0]
+
+        def work(_):
+            def enter():
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+
+            def leave():
+                with lock:
+                    active[0] -= 1
+
+            return PYIO.attempt(enter).then(PYIO.sleep(0.01)).then(PYIO.attempt(leave))
+
+        foreach_par(list(range(20)), lambda i: semaphore.with_permit(work(i))).run()
+        self.assertEqual(peak[0], 3)
+        self.assertEqual(semaphore.available().run(), 3)
+
+    def test_released_when_effect_fails(self):
+        semaphore = Semaphore(1)
+        error = ValueError("test error")
+        self.assertIs(semaphore.with_permit(PYIO.fail(error)).run(), error)
+        self.assertEqual(semaphore.available().run(), 1)
+
+    def test_released_on_timeout(self):
+        semaphore = Semaphore(1)
+        result = semaphore.with_permit(PYIO.sleep(1)).timeout(0.05).run()
+        self.assertIsInstance(result, EffectTimeoutError)
+        # The interrupted effect gives its permit back on its own fiber, right after the timeout
+        deadline = time.monotonic() + 1
+        while semaphore.available().run() != 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(semaphore.available().run(), 1)
+
+    def test_waiting_can_time_out_without_leaking(self):
+        semaphore = Semaphore(1)
+        holder = Fiber.start(semaphore.with_permit(PYIO.sleep(0.1)))
+        time.sleep(0.02)
+        result = semaphore.with_permit(PYIO.success(1)).timeout(0.02).run()
+        self.assertIsInstance(result, EffectTimeoutError)
+        holder.join().run()
+        self.assertEqual(semaphore.available().run(), 1)
+        self.assertEqual(semaphore.with_permit(PYIO.success(2)).run(), 2)
+
+    def test_withdrawn_waiter_lets_smaller_requests_through(self):
+        semaphore = Semaphore(2)
+        holder = Fiber.start(semaphore.with_permits(1, PYIO.sleep(0.2)))
+        time.sleep(0.02)
+        large = Fiber.start(semaphore.with_permits(2, PYIO.unit()).timeout(0.05))
+        time.sleep(0.01)
+        small = Fiber.start(semaphore.with_permits(1, PYIO.success("small")))
+        self.assertIsInstance(large.join().run(), EffectTimeoutError)
+        started = time.monotonic()
+        self.assertEqual(small.join().run(), "small")
+        self.assertLess(time.monotonic() - started, 0.1)
+        holder.join().run()
+
+    def test_invalid_permits(self):
+        with self.assertRaises(ValueError):
+            Semaphore(0)
+        with self.assertRaises(ValueError):
+            Semaphore(1).with_permits(0, PYIO.unit())
+        with self.assertRaises(ValueError):
+            Semaphore(2).with_permits(3, PYIO.unit())
+
+
+class TestQueue(TestCase):
+    def test_first_in_first_out(self):
+        queue = Queue.unbounded()
+        foreach_par([1, 2, 3], queue.offer, max_concurrency=1).run()
+        self.assertEqual([queue.take().run() for _ in range(3)], [1, 2, 3])
+        self.assertIsNone(queue.poll().run())
+
+    def test_take_waits_for_a_value(self):
+        queue = Queue.bounded(1)
+        consumer = Fiber.start(queue.take())
+        time.sleep(0.02)
+        self.assertTrue(queue.offer("hello").run())
+        self.assertEqual(consumer.join().run(), "hello")
+
+    def test_bounded_back_pressure(self):
+        queue = Queue.bounded(2)
+        queue.offer(1).then(queue.offer(2)).run()
+        producer = Fiber.start(queue.offer(3))
+        time.sleep(0.02)
+        self.assertIsNone(producer._outcome)
+        self.assertEqual(queue.size().run(), 2)
+        self.assertEqual(queue.take().run(), 1)
+        self.assertTrue(producer.join().run())
+        self.assertEqual([queue.take().run() for _ in range(2)], [2, 3])
+
+    def test_sliding(self):
+        queue = Queue.sliding(2)
+        for item in [1, 2, 3]:
+            self.assertTrue(queue.offer(item).run())
+        self.assertEqual([queue.poll().run() for _ in range(3)], [2, 3, None])
+
+    def test_dropping(self):
+        queue = Queue.dropping(2)
+        accepted = [queue.offer(item).run() for item in [1, 2, 3]]
+        self.assertEqual(accepted, [True, True, False])
+        self.assertEqual([queue.poll().run() for _ in range(3)], [1, 2, None])
+
+    def test_producers_and_consumers(self):
+        queue = Queue.bounded(4)
+        items = list(range(200))
+        producer = Fiber.start(PYIO.chain_all(*[queue.offer(i) for i in items]))
+        taken = foreach_par(items, lambda _: queue.take(), max_concurrency=8).run()
+        producer.join().run()
+        self.assertEqual(sorted(taken), items)
+        self.assertEqual(queue.size().run(), 0)
+
+    def test_interrupted_take_loses_nothing(self):
+        queue = Queue.bounded(10)
+        for _ in range(50):
+            consumer = Fiber.start(queue.take())
+            queue.offer("item").run()
+            consumer.interrupt().run()
+            if consumer.join().run() != "item":
+                self.assertEqual(queue.poll().run(), "item")
+            self.assertEqual(queue.size().run(), 0)
+
+    def test_take_can_time_out(self):
+        queue = Queue.bounded(1)
+        self.assertIsInstance(queue.take().timeout(0.02).run(), EffectTimeoutError)
+        queue.offer(1).run()
+        self.assertEqual(queue.take().run(), 1)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            Queue.bounded(0)
+        with self.assertRaises(ValueError):
+            Queue(1, "unknown")
+
+
+class TestPrimitivesAsync(IsolatedAsyncioTestCase):
+    async def test_queue_does_not_block_the_event_loop(self):
+        queue = Queue.bounded(1)
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        consumer = asyncio.ensure_future(queue.take().run_async())
+        await ticker()
+        await queue.offer("value").run_async()
+        self.assertEqual(await consumer, "value")
+        self.assertEqual(len(ticks), 5)
+
+    async def test_semaphore(self):
+        semaphore = Semaphore(2)
+        results = await asyncio.gather(
+            *[
+                semaphore.with_permit(
+                    PYIO.sleep(0.01).map(lambda _, i=i: i)
+                ).run_async()
+                for i in range(6)
+            ]
+        )
+        self.assertEqual(results, list(range(6)))
+        self.assertEqual(await semaphore.available().run_async(), 2)
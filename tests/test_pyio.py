@@ -2,7 +2,7 @@ import sys
 from dataclasses import dataclass
 from unittest import TestCase
 
-from src.pyfecto.pyio import PYIO
+from src.pyfecto.pyio import PYIO, Fail, FlatMap, Fold, Map, Succeed, Sync
 from src.pyfecto.runtime import Runtime
 
 
@@ -378,3 +378,90 @@ class TestPYIO(TestCase):
         result = PYIO.pipeline(get_user, get_permissions, get_data).run()
 
         self.assertEqual(result, "Data for user 1")
+
+    def test_chain_all_is_stack_safe(self):
+        effects = [PYIO.success(i) for i in range(10_000)]
+        self.assertEqual(PYIO.chain_all(*effects).run(), 9_999)
+
+    def test_recursive_flat_map_is_stack_safe(self):
+        def countdown(n: int) -> PYIO[None, int]:
+            return PYIO.success(n).flat_map(
+                lambda x: PYIO.success("done") if x == 0 else countdown(x - 1)
+            )
+
+        self.assertEqual(countdown(10_000).run(), "done")
+
+    def test_deep_map_and_recover_are_stack_safe(self):
+        effect = PYIO.success(0)
+        for _ in range(10_000):
+            effect = effect.map(lambda x: x + 1)
+        self.assertEqual(effect.run(), 10_000)
+
+        error = ValueError("test error")
+        failed = PYIO.fail(error)
+        for _ in range(10_000):
+            failed = failed.recover(lambda e: PYIO.fail(e))
+        self.assertIs(failed.run(), error)
+
+    def test_effects_are_inspectable_nodes(self):
+        error = ValueError("test error")
+        self.assertIsInstance(PYIO.success(1), Succeed)
+        self.assertIsInstance(PYIO.fail(error), Fail)
+        self.assertIsInstance(PYIO.attempt(lambda: 1), Sync)
+
+        source = PYIO.success(1)
+        mapped = source.map(str)
+        self.assertIsInstance(mapped, Map)
+        self.assertIs(mapped.source, source)
+
+        chained = mapped.flat_map(lambda s: PYIO.success(s + "!"))
+        self.assertIsInstance(chained, FlatMap)
+        recovered = chained.recover(lambda e: PYIO.success("recovered"))
+        self.assertIsInstance(recovered, Fold)
+        self.assertIsNone(recovered.on_success)
+        self.assertTrue(repr(recovered).startswith("Fold(FlatMap(Map(Succeed(1)"))
+
+    def test_nodes_use_slots(self):
+        with self.assertRaises(AttributeError):
+            PYIO.success(1).__dict__
+
+    def test_defer_builds_effect_when_run(self):
+        calls = []
+
+        def build():
+            calls.append(1)
+            return PYIO.success(len(calls))
+
+        effect = PYIO.defer(build)
+        self.assertEqual(calls, [])
+        self.assertEqual(effect.run(), 1)
+        self.assertEqual(effect.run(), 2)
+
+    def test_consecutive_maps_are_fused(self):
+        source = PYIO.attempt(lambda: 1)
+        effect = source.map(lambda x: x + 1).map(lambda x: x * 10).map(str)
+        self.assertIsInstance(effect, Map)
+        self.assertIs(effect.source, source)
+        self.assertEqual(len(effect.fs), 3)
+        self.assertEqual(effect.run(), "20")
+
+    def test_then_after_success_is_collapsed(self):
+        that = PYIO.attempt(lambda: 42)
+        self.assertIs(PYIO.success(1).then(that), that)
+        self.assertIs(PYIO.unit().then(that), that)
+
+        # Sequencing into a known value becomes a fusable map
+        effect = PYIO.attempt(lambda: 1).then(PYIO.success("done")).map(str.upper)
+        self.assertIsInstance(effect, Map)
+        self.assertEqual(effect.run(), "DONE")
+
+    def test_fusion_preserves_laziness_and_errors(self):
+        calls = []
+        effect = PYIO.success(1).map(lambda x: calls.append(x) or x + 1).map(str)
+        self.assertEqual(calls, [])
+        self.assertEqual(effect.run(), "2")
+        self.assertEqual(calls, [1])
+
+        error = ValueError("test error")
+        failed = PYIO.fail(error).map(lambda x: x + 1).then(PYIO.success(2))
+        self.assertIs(failed.run(), error)
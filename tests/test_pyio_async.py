@@ -0,0 +1,142 @@
+"""Unit tests for running PYIO effects on asyncio."""
+
+import asyncio
+import threading
+import time
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from src.pyfecto.pyio import PYIO
+
+
+async def delayed(value, seconds=0.05):
+    await asyncio.sleep(seconds)
+    return value
+
+
+async def failing(message):
+    await asyncio.sleep(0)
+    raise ValueError(message)
+
+
+class TestRunAsync(IsolatedAsyncioTestCase):
+    async def test_run_async_pure_effects(self):
+        effect = (
+            PYIO.success(20)
+            .map(lambda x: x + 1)
+            .flat_map(lambda x: PYIO.success(x * 2))
+        )
+        self.assertEqual(await effect.run_async(), 42)
+
+        error = ValueError("test error")
+        self.assertIs(await PYIO.fail(error).map(lambda x: x).run_async(), error)
+
+    async def test_from_awaitable(self):
+        effect = PYIO.from_awaitable(lambda: delayed(21)).map(lambda x: x * 2)
+        self.assertEqual(await effect.run_async(), 42)
+
+    async def test_from_awaitable_failure(self):
+        result = await PYIO.from_awaitable(lambda: failing("boom")).run_async()
+        self.assertIsInstance(result, ValueError)
+        self.assertEqual(str(result), "boom")
+
+        recovered = PYIO.from_awaitable(lambda: failing("boom")).recover(
+            lambda e: PYIO.success("recovered")
+        )
+        self.assertEqual(await recovered.run_async(), "recovered")
+
+    async def test_from_awaitable_is_lazy_and_rerunnable(self):
+        calls = []
+
+        async def record():
+            calls.append(1)
+            return len(calls)
+
+        effect = PYIO.from_awaitable(record)
+        self.assertEqual(calls, [])
+        self.assertEqual(await effect.run_async(), 1)
+        self.assertEqual(await effect.run_async(), 2)
+
+    async def test_many_effects_share_one_loop(self):
+        effects = [
+            PYIO.from_awaitable(lambda i=i: delayed(i, 0.2)).map(lambda x: x + 1)
+            for i in range(1_000)
+        ]
+        start = time.perf_counter()
+        results = await asyncio.gather(*(effect.run_async() for effect in effects))
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(results, list(range(1, 1_001)))
+        self.assertLess(elapsed, 1.5)
+
+    async def test_from_callback_does_not_block_the_loop(self):
+        def register(callback):
+            threading.Timer(0.05, lambda: callback(None, "done")).start()
+
+        ticks = []
+
+        async def ticker():
+            for _ in range(3):
+                ticks.append(1)
+                await asyncio.sleep(0.01)
+
+        result, _ = await asyncio.gather(
+            PYIO.from_callback(register).run_async(), ticker()
+        )
+        self.assertEqual(result, "done")
+        self.assertEqual(len(ticks), 3)
+
+    async def test_cancelling_the_task_cancels_the_callback(self):
+        cancelled = threading.Event()
+        effect = PYIO.from_callback(lambda callback: cancelled.set)
+
+        task = asyncio.ensure_future(effect.run_async())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertTrue(cancelled.is_set())
+
+    async def test_long_chains_yield_to_the_loop(self):
+        effect = PYIO.success(0)
+        for _ in range(10_000):
+            effect = effect.flat_map(lambda x: PYIO.success(x + 1))
+
+        ticks = []
+
+        async def ticker():
+            while len(ticks) < 3:
+                ticks.append(1)
+                await asyncio.sleep(0)
+
+        result, _ = await asyncio.gather(effect.run_async(), ticker())
+        self.assertEqual(result, 10_000)
+        self.assertEqual(len(ticks), 3)
+
+    async def test_join_fiber_from_async(self):
+        fiber = (
+            PYIO.attempt(lambda: time.sleep(0.05)).map_to(lambda: "fiber").fork().run()
+        )
+        self.assertEqual(await fiber.join().run_async(), "fiber")
+
+
+class TestFromAwaitableWithoutLoop(TestCase):
+    def test_run_blocks_until_awaitable_completes(self):
+        effect = PYIO.from_awaitable(lambda: delayed("done"))
+        self.assertEqual(effect.run(), "done")
+
+        result = PYIO.from_awaitable(lambda: failing("boom")).run()
+        self.assertIsInstance(result, ValueError)
+
+    def test_from_awaitable_on_fibers(self):
+        def fetch(value):
+            return PYIO.from_awaitable(lambda: delayed(value, 0.2))
+
+        program = (
+            fetch("a")
+            .fork()
+            .zip(fetch("b").fork())
+            .flat_map(lambda fibers: fibers[0].join().zip(fibers[1].join()))
+        )
+        start = time.perf_counter()
+        self.assertEqual(program.run(), ("a", "b"))
+        self.assertLess(time.perf_counter() - start, 0.35)
@@ -0,0 +1,106 @@
+"""Unit tests for PYIO.race, PYIO.race_all and PYIO.hedge."""
+
+import threading
+import time
+from unittest import TestCase
+
+from src.pyfecto.pyio import PYIO
+
+
+def delayed(seconds, value):
+    return PYIO.sleep(seconds).map(lambda _: value)
+
+
+def delayed_failure(seconds, error):
+    return PYIO.sleep(seconds).then(PYIO.fail(error))
+
+
+def cancellable(cancelled):
+    """An effect that never completes and records its cancellation."""
+    return PYIO.from_callback(lambda callback: cancelled.set)
+
+
+class TestRace(TestCase):
+    def test_first_success_wins(self):
+        self.assertEqual(
+            PYIO.race(delayed(0.2, "slow"), delayed(0.01, "fast")).run(), "fast"
+        )
+        self.assertEqual(
+            PYIO.race(delayed(0.01, "fast"), delayed(0.2, "slow")).run(), "fast"
+        )
+
+    def test_loser_is_interrupted(self):
+        cancelled = threading.Event()
+        start = time.perf_counter()
+        result = PYIO.race(cancellable(cancelled), delayed(0.01, "winner")).run()
+        self.assertEqual(result, "winner")
+        self.assertTrue(cancelled.wait(1))
+        self.assertLess(time.perf_counter() - start, 1)
+
+    def test_failure_does_not_win(self):
+        error = ValueError("fast failure")
+        result = PYIO.race(PYIO.fail(error), delayed(0.05, "ok")).run()
+        self.assertEqual(result, "ok")
+
+    def test_fails_when_all_fail(self):
+        first = ValueError("first")
+        last = ValueError("last")
+        result = PYIO.race(
+            delayed_failure(0.01, first), delayed_failure(0.05, last)
+        ).run()
+        self.assertIs(result, last)
+
+    def test_race_all(self):
+        effects = [delayed(0.3 - i * 0.05, i) for i in range(5)]
+        self.assertEqual(PYIO.race_all(effects).run(), 4)
+        self.assertEqual(PYIO.race_all([PYIO.success(1)]).run(), 1)
+        with self.assertRaises(ValueError):
+            PYIO.race_all([])
+
+    def test_interrupting_the_race_interrupts_all(self):
+        cancelled = [threading.Event() for _ in range(3)]
+        fiber = PYIO.race_all([cancellable(c) for c in cancelled]).fork().run()
+        time.sleep(0.05)
+        fiber.interrupt().run()
+        for event in cancelled:
+            self.assertTrue(event.wait(1))
+
+
+class TestHedge(TestCase):
+    def test_fast_effect_runs_once(self):
+        calls = []
+        effect = PYIO.attempt(lambda: calls.append(1)).map_to(lambda: "ok")
+        self.assertEqual(PYIO.hedge(effect, after=0.1).run(), "ok")
+        time.sleep(0.15)
+        self.assertEqual(len(calls), 1)
+
+    def test_slow_effect_is_hedged(self):
+        calls = []
+
+        def call():
+            calls.append(1)
+            # Only the first copy is slow
+            return delayed(5 if len(calls) == 1 else 0.01, len(calls))
+
+        start = time.perf_counter()
+        result = PYIO.hedge(PYIO.defer(call), after=0.05).run()
+        self.assertEqual(result, 2)
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertEqual(len(calls), 2)
+
+    def test_fast_failure_is_not_hedged(self):
+        calls = []
+        error = ValueError("test error")
+        effect = PYIO.attempt(lambda: calls.append(1)).then(PYIO.fail(error))
+        start = time.perf_counter()
+        self.assertIs(PYIO.hedge(effect, after=0.5).run(), error)
+        self.assertLess(time.perf_counter() - start, 0.25)
+        time.sleep(0.1)
+        self.assertEqual(len(calls), 1)
+
+    def test_interrupting_the_hedge_interrupts_the_copies(self):
+        cancelled = threading.Event()
+        fiber = PYIO.hedge(cancellable(cancelled), after=1).fork().run()
+        time.sleep(0.05)
+        fiber.interrupt().run()
+        self.assertTrue(cancelled.wait(1))
@@ -0,0 +1,163 @@
+"""Unit tests for the pyfecto.ratelimit module and the throttle argument of the collection functions."""
+
+import asyncio
+import threading
+import time
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from src.pyfecto.collections import (
+    collect_all,
+    collect_all_par,
+    foreach,
+    foreach_par,
+    foreach_par_async,
+)
+from src.pyfecto.fiber import Fiber
+from src.pyfecto.pyio import PYIO, EffectTimeoutError
+from src.pyfecto.ratelimit import RateLimiter, throttle
+
+
+class StartTimes:
+    """Records when each effect starts."""
+
+    def __init__(self):
+        self.times = []
+        self.lock = threading.Lock()
+
+    def record(self, x):
+        def run():
+            with self.lock:
+                self.times.append(time.monotonic())
+            return x
+
+        return PYIO.attempt(run)
+
+    def average_gap(self):
+        # Single gaps jitter with the timers, the average is what the limiter guarantees
+        return (max(self.times) - min(self.times)) / (len(self.times) - 1)
+
+
+class TestRateLimiter(TestCase):
+    def test_spreads_starts_evenly(self):
+        limiter = RateLimiter(20, per=1.0)
+        starts = StartTimes()
+        PYIO.chain_all(*[limiter.limit(starts.record(i)) for i in range(6)]).run()
+        self.assertEqual(len(starts.times), 6)
+        self.assertGreater(starts.average_gap(), 0.045)
+
+    def test_idle_limiter_starts_right_away(self):
+        limiter = RateLimiter(1, per=10.0)
+        started = time.monotonic()
+        self.assertEqual(limiter.limit(PYIO.success(1)).run(), 1)
+        self.assertLess(time.monotonic() - started, 0.05)
+
+    def test_burst(self):
+        limiter = RateLimiter(10, per=1.0, burst=3)
+        started = time.monotonic()
+        PYIO.chain_all(*[limiter.limit(PYIO.unit()) for _ in range(3)]).run()
+        self.assertLess(time.monotonic() - started, 0.05)
+        limiter.limit(PYIO.unit()).run()
+        self.assertGreater(time.monotonic() - started, 0.08)
+
+    def test_cost(self):
+        limiter = RateLimiter(20, per=1.0)
+        limiter.acquire().run()
+        started = time.monotonic()
+        limiter.acquire(cost=3).run()
+        self.assertGreater(time.monotonic() - started, 0.13)
+
+    def test_shared_across_threads(self):
+        limiter = RateLimiter(50, per=1.0)
+        starts = StartTimes()
+        threads = [
+            threading.Thread(target=limiter.limit(starts.record(i)).run)
+            for i in range(10)
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertGreater(time.monotonic() - started, 0.16)
+        self.assertGreater(starts.average_gap(), 0.018)
+
+    def test_waiting_fibers_do_not_hold_threads(self):
+        limiter = RateLimiter(10, per=1.0)
+        fibers = [Fiber.start(limiter.limit(PYIO.success(i))) for i in range(5)]
+        self.assertEqual(Fiber.join_all(fibers).run(), list(range(5)))
+
+    def test_errors_pass_through(self):
+        error = ValueError("test error")
+        self.assertIs(RateLimiter(10).limit(PYIO.fail(error)).run(), error)
+
+    def test_wait_can_time_out(self):
+        limiter = RateLimiter(1, per=10.0)
+        limiter.acquire().run()
+        result = limiter.limit(PYIO.success(1)).timeout(0.05).run()
+        self.assertIsInstance(result, EffectTimeoutError)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            RateLimiter(0)
+        with self.assertRaises(ValueError):
+            RateLimiter(1, per=0)
+        with self.assertRaises(ValueError):
+            RateLimiter(1, burst=0)
+        with self.assertRaises(ValueError):
+            RateLimiter(1).acquire(0)
+
+
+class TestThrottle(TestCase):
+    def test_foreach(self):
+        starts = StartTimes()
+        result = foreach([1, 2, 3], starts.record, throttle=throttle(20)).run()
+        self.assertEqual(result, [1, 2, 3])
+        self.assertGreater(starts.average_gap(), 0.045)
+
+    def test_foreach_par(self):
+        starts = StartTimes()
+        items = list(range(6))
+        result = foreach_par(items, starts.record, throttle=throttle(20)).run()
+        self.assertEqual(result, items)
+        self.assertGreater(starts.average_gap(), 0.045)
+
+    def test_collect_all(self):
+        starts = StartTimes()
+        effects = [starts.record(i) for i in range(3)]
+        self.assertEqual(collect_all(effects, throttle=throttle(20)).run(), [0, 1, 2])
+        self.assertGreater(starts.average_gap(), 0.045)
+
+    def test_collect_all_par(self):
+        starts = StartTimes()
+        effects = [starts.record(i) for i in range(3)]
+        result = collect_all_par(effects, throttle=throttle(20)).run()
+        self.assertEqual(result, [0, 1, 2])
+        self.assertGreater(starts.average_gap(), 0.045)
+
+    def test_shared_between_calls(self):
+        limiter = throttle(20)
+        starts = StartTimes()
+        calls = [
+            Fiber.start(foreach_par([i, i + 1], starts.record, throttle=limiter))
+            for i in (0, 2)
+        ]
+        Fiber.join_all(calls).run()
+        self.assertEqual(len(starts.times), 4)
+        self.assertGreater(starts.average_gap(), 0.045)
+
+
+class TestThrottleAsync(IsolatedAsyncioTestCase):
+    async def test_foreach_par_async(self):
+        starts = StartTimes()
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        effect = foreach_par_async(list(range(4)), starts.record, throttle=throttle(20))
+        result, _ = await asyncio.gather(effect.run_async(), ticker())
+        self.assertEqual(result, list(range(4)))
+        self.assertEqual(len(ticks), 5)
+        self.assertGreater(starts.average_gap(), 0.045)
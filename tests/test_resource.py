@@ -0,0 +1,373 @@
+"""Unit tests for PYIO.ensuring, PYIO.acquire_release and the pyfecto.resource module."""
+
+import asyncio
+import threading
+import time
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from src.pyfecto.batching import DataSource
+from src.pyfecto.collections import foreach, foreach_par
+from src.pyfecto.fiber import FiberInterrupted
+from src.pyfecto.pyio import PYIO, EffectTimeoutError
+from src.pyfecto.resource import ResourcePool, Scoped
+
+
+class Connection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+
+
+class Database:
+    """Hands out numbered connections and records opening and closing them."""
+
+    def __init__(self, fail_connect=False):
+        self.events = []
+        self.opened = 0
+        self.fail_connect = fail_connect
+        self.lock = threading.Lock()
+
+    def connect(self):
+        def open_connection():
+            if self.fail_connect:
+                raise ConnectionError("cannot connect")
+            with self.lock:
+                self.opened += 1
+                number = self.opened
+            self.events.append(f"open {number}")
+            return Connection(number)
+
+        return PYIO.attempt(open_connection)
+
+    def close(self, connection):
+        def close_connection():
+            connection.closed = True
+            self.events.append(f"close {connection.number}")
+
+        return PYIO.attempt(close_connection)
+
+    def scoped(self):
+        return PYIO.acquire_release(self.connect(), self.close)
+
+
+class TestEnsuring(TestCase):
+    def test_runs_after_success_and_failure(self):
+        events = []
+        finalizer = PYIO.attempt(lambda: events.append("done"))
+        self.assertEqual(PYIO.success(1).ensuring(finalizer).run(), 1)
+        error = ValueError("test error")
+        self.assertIs(PYIO.fail(error).ensuring(finalizer).run(), error)
+        self.assertEqual(events, ["done", "done"])
+
+    def test_failing_finalizer(self):
+        error = ValueError("finalizer error")
+        self.assertIs(PYIO.success(1).ensuring(PYIO.fail(error)).run(), error)
+        original = ValueError("original")
+        self.assertIs(PYIO.fail(original).ensuring(PYIO.fail(error)).run(), original)
+
+    def test_runs_when_an_exception_escapes(self):
+        events = []
+
+        def explode(_):
+            raise RuntimeError("boom")
+
+        effect = PYIO.success(1).map(explode)
+        with self.assertRaises(RuntimeError):
+            effect.ensuring(PYIO.attempt(lambda: events.append("done"))).run()
+        self.assertEqual(events, ["done"])
+
+    def test_runs_on_interruption(self):
+        events = []
+        registered = threading.Event()
+
+        def register(callback):
+            registered.set()
+
+        effect = PYIO.from_callback(register).ensuring(
+            PYIO.attempt(lambda: events.append("done"))
+        )
+        fiber = effect.fork().run()
+        registered.wait(1)
+        fiber.interrupt().run()
+        self.assertIsInstance(fiber.join().run(), FiberInterrupted)
+        self.assertEqual(events, ["done"])
+
+    def test_interruption_is_not_recoverable(self):
+        registered = threading.Event()
+        pending = PYIO.from_callback(lambda callback: registered.set())
+        fiber = pending.recover(lambda _: PYIO.success("recovered")).fork().run()
+        registered.wait(1)
+        fiber.interrupt().run()
+        self.assertIsInstance(fiber.join().run(), FiberInterrupted)
+
+    def test_finalizer_is_not_interrupted(self):
+        events = []
+        started = threading.Event()
+
+        def slow_finalizer():
+            started.set()
+            return PYIO.sleep(0.1).then(
+                PYIO.attempt(lambda: events.append("finalized"))
+            )
+
+        effect = PYIO.sleep(10).ensuring(PYIO.defer(slow_finalizer))
+        fiber = effect.fork().run()
+        time.sleep(0.02)
+        threading.Thread(target=lambda: fiber.interrupt().run()).start()
+        started.wait(1)
+        # A second interruption while the finalizer waits does not cut it short either
+        fiber.interrupt().run()
+        self.assertEqual(events, ["finalized"])
+
+    def test_stack_safe(self):
+        effect = PYIO.success(0)
+        for _ in range(10_000):
+            effect = effect.map(lambda x: x + 1).ensuring(PYIO.unit())
+        self.assertEqual(effect.run(), 10_000)
+
+
+class TestAcquireRelease(TestCase):
+    def test_releases_after_use(self):
+        db = Database()
+        result = db.scoped().use(lambda c: PYIO.success(c.number * 10)).run()
+        self.assertEqual(result, 10)
+        self.assertEqual(db.events, ["open 1", "close 1"])
+
+    def test_releases_when_use_fails(self):
+        db = Database()
+        error = ValueError("query failed")
+        result = (
+            db.scoped()
+            .use(lambda c: PYIO.success(c).flat_map(lambda _: PYIO.fail(error)))
+            .run()
+        )
+        self.assertIs(result, error)
+        self.assertEqual(db.events, ["open 1", "close 1"])
+
+    def test_nothing_to_release_when_acquire_fails(self):
+        db = Database(fail_connect=True)
+        result = db.scoped().use(lambda c: PYIO.success(c)).run()
+        self.assertIsInstance(result, ConnectionError)
+        self.assertEqual(db.events, [])
+
+    def test_releases_on_timeout(self):
+        db = Database()
+        result = db.scoped().use(lambda c: PYIO.sleep(10)).timeout(0.05).run()
+        self.assertIsInstance(result, EffectTimeoutError)
+        deadline = time.monotonic() + 1
+        while db.events != ["open 1", "close 1"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(db.events, ["open 1", "close 1"])
+
+    def test_acquire_is_not_interrupted(self):
+        events = []
+        acquiring = threading.Event()
+
+        def acquire():
+            acquiring.set()
+            return PYIO.sleep(0.1).map(
+                lambda _: events.append("acquired") or "resource"
+            )
+
+        scoped = PYIO.acquire_release(
+            PYIO.defer(acquire),
+            lambda r: PYIO.attempt(lambda: events.append("released")),
+        )
+        fiber = scoped.use(lambda r: PYIO.sleep(10)).fork().run()
+        acquiring.wait(1)
+        fiber.interrupt().run()
+        self.assertEqual(events, ["acquired", "released"])
+
+    def test_composition_releases_in_reverse_order(self):
+        db = Database()
+        both = db.scoped().zip(db.scoped()).map(lambda pair: [c.number for c in pair])
+        self.assertEqual(both.use(lambda numbers: PYIO.success(numbers)).run(), [1, 2])
+        self.assertEqual(db.events, ["open 1", "open 2", "close 2", "close 1"])
+
+    def test_failed_second_acquisition_releases_the_first(self):
+        db = Database()
+        failing = Database(fail_connect=True)
+        both = db.scoped().flat_map(lambda _: failing.scoped())
+        self.assertIsInstance(both.use(PYIO.success).run(), ConnectionError)
+        self.assertEqual(db.events, ["open 1", "close 1"])
+
+    def test_scoped_is_reusable(self):
+        db = Database()
+        scoped = db.scoped()
+        scoped.use(PYIO.success).run()
+        scoped.use(PYIO.success).run()
+        self.assertEqual(db.events, ["open 1", "close 1", "open 2", "close 2"])
+        self.assertIsInstance(scoped, Scoped)
+
+
+class Numbers(DataSource):
+    def fetch_batch(self, keys):
+        return PYIO.success({key: key * 10 for key in keys})
+
+
+class TestAcquireReleaseInForeach(TestCase):
+    def test_releases_items_waiting_for_a_batch_when_another_fails(self):
+        db = Database()
+        numbers = Numbers()
+        error = ValueError("item failed")
+
+        def item(i):
+            if i == 1:
+                return PYIO.fail(error)
+            return db.scoped().use(lambda c: numbers.get(c.number))
+
+        self.assertIs(foreach([0, 1], item).run(), error)
+        self.assertEqual(db.events, ["open 1", "close 1"])
+
+    def test_releases_when_an_exception_escapes(self):
+        db = Database()
+
+        def explode(_):
+            raise RuntimeError("boom")
+
+        result = foreach(
+            [0], lambda _: db.scoped().use(lambda c: PYIO.success(c).map(explode))
+        ).run()
+        self.assertIsInstance(result, RuntimeError)
+        self.assertEqual(db.events, ["open 1", "close 1"])
+
+
+class TestAcquireReleaseAsync(IsolatedAsyncioTestCase):
+    async def test_releases_when_task_is_cancelled(self):
+        db = Database()
+
+        async def hang():
+            await asyncio.sleep(10)
+
+        effect = db.scoped().use(lambda c: PYIO.from_awaitable(hang))
+        task = asyncio.ensure_future(effect.run_async())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(db.events, ["open 1", "close 1"])
+
+
+class TestResourcePool(TestCase):
+    def pool(self, db, **kwargs):
+        return ResourcePool(db.connect(), db.close, **kwargs)
+
+    def test_reuses_resources(self):
+        db = Database()
+        pool = self.pool(db)
+        numbers = [pool.use(lambda c: PYIO.success(c.number)).run() for _ in range(5)]
+        self.assertEqual(numbers, [1] * 5)
+        self.assertEqual(db.opened, 1)
+        self.assertEqual((pool.size, pool.idle), (1, 1))
+
+    def test_bounded_by_max_size(self):
+        db = Database()
+        pool = self.pool(db, max_size=3)
+        lock = threading.Lock()
+        active = [0]
+        peak = [0]
+
+        def query(connection):
+            def enter():
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+
+            def leave(_):
+                with lock:
+                    active[0] -= 1
+
+            return PYIO.attempt(enter).then(PYIO.sleep(0.02)).map(leave)
+
+        result = foreach_par(list(range(20)), lambda _: pool.use(query)).run()
+        self.assertEqual(len(result), 20)
+        self.assertEqual(peak[0], 3)
+        self.assertEqual(db.opened, 3)
+        self.assertEqual(pool.idle, 3)
+
+    def test_returned_when_use_fails(self):
+        db = Database()
+        pool = self.pool(db, max_size=1)
+        error = ValueError("query failed")
+        self.assertIs(pool.use(lambda c: PYIO.fail(error)).run(), error)
+        self.assertEqual(pool.use(lambda c: PYIO.success(c.number)).run(), 1)
+
+    def test_failed_creation_frees_the_slot(self):
+        db = Database(fail_connect=True)
+        pool = self.pool(db, max_size=1)
+        self.assertIsInstance(pool.use(PYIO.success).run(), ConnectionError)
+        db.fail_connect = False
+        self.assertEqual(pool.use(lambda c: PYIO.success(c.number)).run(), 1)
+        self.assertEqual(pool.size, 1)
+
+    def test_waiting_checkout_can_time_out_without_leaking(self):
+        db = Database()
+        pool = self.pool(db, max_size=1)
+        release = threading.Event()
+        holder = pool.use(lambda c: PYIO.attempt(lambda: release.wait(5))).fork().run()
+        time.sleep(0.05)
+
+        result = pool.use(PYIO.success).timeout(0.05).run()
+        self.assertIsInstance(result, EffectTimeoutError)
+
+        release.set()
+        holder.join().run()
+        self.assertEqual(pool.use(lambda c: PYIO.success(c.number)).run(), 1)
+        self.assertEqual((pool.size, pool.idle), (1, 1))
+
+    def test_idle_timeout(self):
+        db = Database()
+        pool = self.pool(db, idle_timeout=0.05)
+        pool.use(PYIO.success).run()
+        # Evicted on a timer, without another checkout
+        deadline = time.monotonic() + 1
+        while len(db.events) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(pool.size, 0)
+        self.assertEqual(db.events, ["open 1", "close 1"])
+        self.assertEqual(pool.use(lambda c: PYIO.success(c.number)).run(), 2)
+
+    def test_idle_timeout_restarts_with_each_return(self):
+        db = Database()
+        pool = self.pool(db, idle_timeout=0.15)
+        for _ in range(3):
+            pool.use(PYIO.success).run()
+            time.sleep(0.1)
+        self.assertEqual(db.events, ["open 1"])
+        deadline = time.monotonic() + 1
+        while len(db.events) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(db.events, ["open 1", "close 1"])
+
+    def test_min_size_and_warm_up(self):
+        db = Database()
+        pool = self.pool(db, min_size=2, idle_timeout=0.01)
+        pool.warm_up().run()
+        self.assertEqual((pool.size, pool.idle), (2, 2))
+        time.sleep(0.05)
+        pool.use(PYIO.success).run()
+        # Idle resources beyond min_size expire, the minimum is kept
+        self.assertEqual(pool.size, 2)
+        self.assertEqual(db.opened, 2)
+
+    def test_health_check_replaces_broken_resources(self):
+        db = Database()
+        pool = self.pool(db, health_check=lambda c: PYIO.success(not c.closed))
+        connection = pool.use(PYIO.success).run()
+        connection.closed = True
+        self.assertEqual(pool.use(lambda c: PYIO.success(c.number)).run(), 2)
+        self.assertEqual(pool.size, 1)
+
+    def test_close(self):
+        db = Database()
+        pool = self.pool(db)
+        pool.use(PYIO.success).run()
+        pool.close().run()
+        self.assertEqual(db.events, ["open 1", "close 1"])
+        self.assertIsInstance(pool.use(PYIO.success).run(), RuntimeError)
+
+    def test_invalid_sizes(self):
+        with self.assertRaises(ValueError):
+            self.pool(Database(), max_size=0)
+        with self.assertRaises(ValueError):
+            self.pool(Database(), min_size=5, max_size=2)
@@ -0,0 +1,189 @@
+"""Unit tests for the pyfecto.schedule module and PYIO.retry / PYIO.repeat."""
+
+import asyncio
+import time
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from src.pyfecto.fiber import Fiber
+from src.pyfecto.pyio import PYIO
+from src.pyfecto.schedule import Schedule
+
+
+def delays(schedule, inputs=10):
+    """Drives a fresh run of the schedule, returning its delays up to the first stop."""
+    driver = schedule._start()
+    result = []
+    for i in range(inputs):
+        delay = driver(i)
+        if delay is None:
+            break
+        result.append(delay)
+    return result
+
+
+def flaky(failures, value="ok"):
+    """An effect failing its first `failures` runs, together with the list recording its calls."""
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise ValueError(f"failure {len(calls)}")
+        return value
+
+    return PYIO.attempt(call), calls
+
+
+class TestSchedule(TestCase):
+    def test_fixed(self):
+        self.assertEqual(delays(Schedule.fixed(0.5), 3), [0.5, 0.5, 0.5])
+
+    def test_exponential(self):
+        self.assertEqual(delays(Schedule.exponential(1), 4), [1, 2, 4, 8])
+        self.assertEqual(delays(Schedule.exponential(1, 3, max_delay=5), 3), [1, 3, 5])
+
+    def test_recurs(self):
+        self.assertEqual(delays(Schedule.recurs(2)), [0.0, 0.0])
+        self.assertEqual(delays(Schedule.recurs(0)), [])
+
+    def test_up_to(self):
+        driver = Schedule.up_to(0.05)._start()
+        self.assertEqual(driver(None), 0.0)
+        time.sleep(0.06)
+        self.assertIsNone(driver(None))
+
+    def test_intersect_and_union(self):
+        both = Schedule.exponential(1) & Schedule.recurs(3)
+        self.assertEqual(delays(both), [1, 2, 4])
+
+        either = Schedule.recurs(2) | Schedule.fixed(1)
+        self.assertEqual(delays(either, 4), [0.0, 0.0, 1, 1])
+
+        shortest = Schedule.fixed(2).union(
+            Schedule.fixed(1).intersect(Schedule.recurs(1))
+        )
+        self.assertEqual(delays(shortest, 3), [1, 2, 2])
+
+    def test_jittered(self):
+        for delay in delays(Schedule.fixed(1).jittered(0.5), 50):
+            self.assertTrue(0.5 <= delay <= 1.5)
+        self.assertEqual(delays(Schedule.fixed(1).jittered(0), 2), [1, 1])
+
+    def test_fresh_state_per_run(self):
+        schedule = Schedule.recurs(1)
+        self.assertEqual(delays(schedule), [0.0])
+        self.assertEqual(delays(schedule), [0.0])
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            Schedule.fixed(-1)
+        with self.assertRaises(ValueError):
+            Schedule.exponential(1, factor=0.5)
+        with self.assertRaises(ValueError):
+            Schedule.recurs(-1)
+        with self.assertRaises(ValueError):
+            Schedule.fixed(1).jittered(2)
+
+
+class TestRetry(TestCase):
+    def test_retry_until_success(self):
+        effect, calls = flaky(2)
+        self.assertEqual(effect.retry(Schedule.recurs(5)).run(), "ok")
+        self.assertEqual(len(calls), 3)
+
+    def test_retry_gives_up_with_last_error(self):
+        effect, calls = flaky(10)
+        result = effect.retry(Schedule.recurs(3)).run()
+        self.assertIsInstance(result, ValueError)
+        self.assertEqual(str(result), "failure 4")
+        self.assertEqual(len(calls), 4)
+
+    def test_retry_success_runs_once(self):
+        effect, calls = flaky(0)
+        self.assertEqual(effect.retry(Schedule.fixed(10)).run(), "ok")
+        self.assertEqual(len(calls), 1)
+
+    def test_retry_waits_between_attempts(self):
+        effect, calls = flaky(2)
+        start = time.perf_counter()
+        self.assertEqual(effect.retry(Schedule.fixed(0.05)).run(), "ok")
+        self.assertGreaterEqual(time.perf_counter() - start, 0.1)
+
+    def test_retry_restarts_schedule_per_run(self):
+        effect = PYIO.fail(ValueError("always")).retry(Schedule.recurs(2))
+        counter = []
+        counted = PYIO.attempt(lambda: counter.append(1)).then(effect)
+        counted.run()
+        counted.run()
+        self.assertEqual(len(counter), 2)
+
+    def test_retry_is_stack_safe(self):
+        effect, calls = flaky(50_000)
+        self.assertEqual(effect.retry(Schedule.recurs(100_000)).run(), "ok")
+        self.assertEqual(len(calls), 50_001)
+
+    def test_retry_with_deadline(self):
+        effect, _ = flaky(1_000_000)
+        start = time.perf_counter()
+        result = effect.retry(Schedule.fixed(0.01) & Schedule.up_to(0.1)).run()
+        self.assertIsInstance(result, ValueError)
+        self.assertLess(time.perf_counter() - start, 1)
+
+    def test_sleeping_fibers_release_their_threads(self):
+        fibers = [
+            flaky(1)[0].retry(Schedule.fixed(0.2)).fork().run() for _ in range(200)
+        ]
+        start = time.perf_counter()
+        self.assertEqual(Fiber.join_all(fibers).run(), ["ok"] * 200)
+        self.assertLess(time.perf_counter() - start, 2)
+
+
+class TestRepeat(TestCase):
+    def test_repeat(self):
+        counter = []
+        effect = PYIO.attempt(lambda: counter.append(1) or len(counter))
+        self.assertEqual(effect.repeat(Schedule.recurs(3)).run(), 4)
+        self.assertEqual(len(counter), 4)
+
+    def test_repeat_stops_on_failure(self):
+        effect, calls = flaky(1)
+        self.assertIsInstance(effect.repeat(Schedule.recurs(3)).run(), ValueError)
+        self.assertEqual(len(calls), 1)
+
+    def test_repeat_is_stack_safe(self):
+        counter = []
+        effect = PYIO.attempt(lambda: counter.append(1))
+        effect.repeat(Schedule.recurs(100_000)).run()
+        self.assertEqual(len(counter), 100_001)
+
+
+class TestSleep(TestCase):
+    def test_sleep(self):
+        start = time.perf_counter()
+        self.assertIsNone(PYIO.sleep(0.05).run())
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+        self.assertIsNone(PYIO.sleep(0).run())
+
+    def test_interrupting_a_sleeping_fiber(self):
+        fiber = PYIO.sleep(10).fork().run()
+        start = time.perf_counter()
+        fiber.interrupt().run()
+        self.assertLess(time.perf_counter() - start, 1)
+
+
+class TestRetryAsync(IsolatedAsyncioTestCase):
+    async def test_retry_does_not_block_the_loop(self):
+        events = []
+
+        async def ticker():
+            for _ in range(3):
+                await asyncio.sleep(0.01)
+                events.append("tick")
+
+        effect, _ = flaky(1)
+        retried = effect.retry(Schedule.fixed(0.1)).map(
+            lambda v: events.append("retried") or v
+        )
+        result, _ = await asyncio.gather(retried.run_async(), ticker())
+        self.assertEqual(result, "ok")
+        self.assertEqual(events, ["tick", "tick", "tick", "retried"])
@@ -0,0 +1,197 @@
+"""Unit tests for the pyfecto.stream module."""
+
+import threading
+import time
+from unittest import TestCase
+
+from src.pyfecto.collections import foreach_par
+from src.pyfecto.pyio import PYIO
+from src.pyfecto.runtime import Runtime
+from src.pyfecto.stream import PStream
+
+
+class TestPStream(TestCase):
+    def test_from_iterable_and_collect(self):
+        self.assertEqual(
+            PStream.from_iterable([1, 2, 3]).run_collect().run(), [1, 2, 3]
+        )
+        self.assertEqual(PStream.from_iterable([]).run_collect().run(), [])
+
+        stream = PStream.from_iterable((i for i in range(10)), chunk_size=3)
+        self.assertEqual(stream.run_collect().run(), list(range(10)))
+
+    def test_is_lazy(self):
+        pulled = []
+
+        def source():
+            for i in range(5):
+                pulled.append(i)
+                yield i
+
+        effect = PStream.from_iterable(source()).map(lambda x: x * 2).run_collect()
+        self.assertEqual(pulled, [])
+        self.assertEqual(effect.run(), [0, 2, 4, 6, 8])
+
+    def test_pure_transformations(self):
+        stream = (
+            PStream.from_iterable(range(10), chunk_size=4)
+            .map(lambda x: x + 1)
+            .filter(lambda x: x % 2 == 0)
+        )
+        self.assertEqual(stream.run_collect().run(), [2, 4, 6, 8, 10])
+
+    def test_map_pyio_and_filter_pyio(self):
+        stream = (
+            PStream.from_iterable(range(6), chunk_size=4)
+            .map_pyio(lambda x: PYIO.success(x * 10))
+            .filter_pyio(lambda x: PYIO.success(x > 20))
+        )
+        self.assertEqual(stream.run_collect().run(), [30, 40, 50])
+
+    def test_failure_goes_to_error_channel(self):
+        error = ValueError("Error on 3")
+        pulled = []
+
+        def source():
+            for i in range(100):
+                pulled.append(i)
+                yield i
+
+        stream = PStream.from_iterable(source(), chunk_size=2).map_pyio(
+            lambda x: PYIO.fail(error) if x == 3 else PYIO.success(x)
+        )
+        self.assertIs(stream.run_collect().run(), error)
+        # Back-pressure: nothing past the failing chunk was pulled
+        self.assertEqual(pulled, [0, 1, 2, 3])
+
+        failing_predicate = PStream.from_iterable([1]).filter_pyio(
+            lambda x: PYIO.fail(error)
+        )
+        self.assertIs(failing_predicate.run_collect().run(), error)
+
+    def test_exceptions_are_captured(self):
+        stream = PStream.from_iterable([1, 0]).map(lambda x: 1 / x)
+        self.assertIsInstance(stream.run_collect().run(), ZeroDivisionError)
+
+    def test_grouped(self):
+        stream = PStream.from_iterable(range(7), chunk_size=3).grouped(2)
+        self.assertEqual(stream.run_collect().run(), [[0, 1], [2, 3], [4, 5], [6]])
+        with self.assertRaises(ValueError):
+            PStream.from_iterable([]).grouped(0)
+
+    def test_run_fold(self):
+        stream = PStream.from_iterable(range(1, 101), chunk_size=7)
+        self.assertEqual(stream.run_fold(0, lambda acc, x: acc + x).run(), 5050)
+
+    def test_run_foreach(self):
+        seen = []
+        stream = PStream.from_iterable(range(5))
+        effect = stream.run_foreach(lambda x: PYIO.attempt(lambda: seen.append(x)))
+        self.assertIsNone(effect.run())
+        self.assertEqual(seen, [0, 1, 2, 3, 4])
+
+    def test_rerunnable(self):
+        effect = PStream.from_iterable([1, 2, 3]).map(str).run_collect()
+        self.assertEqual(effect.run(), ["1", "2", "3"])
+        self.assertEqual(effect.run(), ["1", "2", "3"])
+
+    def test_map_par_preserves_order_and_overlaps(self):
+        def slow(x):
+            return PYIO.attempt(lambda: time.sleep(0.05 * (x % 3))).map_to(lambda: x)
+
+        start = time.perf_counter()
+        result = PStream.from_iterable(range(12), chunk_size=5).map_par(6, slow)
+        self.assertEqual(result.run_collect().run(), list(range(12)))
+        self.assertLess(time.perf_counter() - start, 0.4)
+
+    def test_map_par_bounds_concurrency(self):
+        lock = threading.Lock()
+        active = [0]
+        peak = [0]
+
+        def track(x):
+            def enter():
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+
+            def leave(_):
+                with lock:
+                    active[0] -= 1
+                return x
+
+            return (
+                PYIO.attempt(enter)
+                .then(PYIO.attempt(lambda: time.sleep(0.01)))
+                .map(leave)
+            )
+
+        stream = PStream.from_iterable(range(30)).map_par(4, track)
+        self.assertEqual(stream.run_collect().run(), list(range(30)))
+        self.assertLessEqual(peak[0], 4)
+
+    def test_map_par_failure(self):
+        error = ValueError("boom")
+        stream = PStream.from_iterable(range(10)).map_par(
+            3, lambda x: PYIO.fail(error) if x == 4 else PYIO.success(x)
+        )
+        self.assertIs(stream.run_collect().run(), error)
+
+    def test_large_stream(self):
+        stream = (
+            PStream.from_iterable(range(1_000_000))
+            .map(lambda x: x * 2)
+            .filter(lambda x: x % 3 == 0)
+        )
+        count = stream.run_fold(0, lambda acc, _: acc + 1).run()
+        self.assertEqual(count, 333_334)
+
+    def test_map_par_failure_interrupts_running_effects(self):
+        error = ValueError("boom")
+        finished = []
+
+        def effect(x):
+            if x == 0:
+                return PYIO.fail(error)
+            return PYIO.sleep(0.2).map(lambda _: finished.append(x))
+
+        stream = PStream.from_iterable(range(5)).map_par(5, effect)
+        self.assertIs(stream.run_collect().run(), error)
+        time.sleep(0.3)
+        self.assertEqual(finished, [])
+
+
+class TestPStreamOnFibers(TestCase):
+    def setUp(self):
+        self.runtime = Runtime()
+        self.max_workers = self.runtime.max_workers
+        self.runtime.shutdown()
+        self.runtime.max_workers = 2
+
+    def tearDown(self):
+        self.runtime.shutdown(wait=False)
+        self.runtime.max_workers = self.max_workers
+
+    def test_map_par_does_not_hold_a_worker(self):
+        def run_stream(_):
+            return (
+                PStream.from_iterable(range(10))
+                .map_par(2, lambda x: PYIO.sleep(0.01).map(lambda _: x))
+                .run_collect()
+            )
+
+        effect = foreach_par([1, 2, 3], run_stream, max_concurrency=3).timeout(3)
+        self.assertEqual(effect.run(), [list(range(10))] * 3)
+
+    def test_map_pyio_does_not_hold_a_worker(self):
+        def run_stream(_):
+            return (
+                PStream.from_iterable(range(5))
+                .map_pyio(lambda x: PYIO.sleep(0.05).map(lambda _: x))
+                .run_collect()
+            )
+
+        started = time.monotonic()
+        effect = foreach_par(list(range(4)), run_stream).timeout(3)
+        self.assertEqual(effect.run(), [list(range(5))] * 4)
+        self.assertLess(time.monotonic() - started, 0.5)
@@ -0,0 +1,117 @@
+"""Unit tests for PYIO.timeout."""
+
+import asyncio
+import threading
+import time
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from src.pyfecto.pyio import PYIO, EffectTimeoutError
+from src.pyfecto.runtime import Runtime
+from src.pyfecto.schedule import Schedule
+
+
+class TestTimeout(TestCase):
+    def test_completes_in_time(self):
+        self.assertEqual(PYIO.success(42).timeout(1).run(), 42)
+
+    def test_failure_in_time_is_kept(self):
+        error = ValueError("test error")
+        self.assertIs(PYIO.fail(error).timeout(1).run(), error)
+
+    def test_times_out(self):
+        start = time.perf_counter()
+        result = PYIO.sleep(10).timeout(0.05).run()
+        self.assertIsInstance(result, EffectTimeoutError)
+        self.assertIsInstance(result, TimeoutError)
+        self.assertEqual(result.seconds, 0.05)
+        self.assertLess(time.perf_counter() - start, 1)
+
+    def test_interrupts_the_pending_operation(self):
+        cancelled = threading.Event()
+        effect = PYIO.from_callback(lambda callback: cancelled.set)
+        self.assertIsInstance(effect.timeout(0.05).run(), EffectTimeoutError)
+        self.assertTrue(cancelled.wait(1))
+
+    def test_stops_running_computation(self):
+        steps = []
+
+        def loop(n):
+            return PYIO.attempt(lambda: steps.append(n)).flat_map(lambda _: loop(n + 1))
+
+        self.assertIsInstance(loop(0).timeout(0.05).run(), EffectTimeoutError)
+        count = len(steps)
+        time.sleep(0.05)
+        self.assertLessEqual(len(steps), count + 1)
+
+    def test_cancels_awaitable(self):
+        cancelled = threading.Event()
+
+        async def hang():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        effect = PYIO.from_awaitable(hang).timeout(0.05)
+        self.assertIsInstance(effect.run(), EffectTimeoutError)
+        self.assertTrue(cancelled.wait(1))
+
+    def test_abandoned_blocking_call_is_accounted_for(self):
+        release = threading.Event()
+        runtime = Runtime()
+        before = runtime.abandoned_effects
+
+        start = time.perf_counter()
+        result = PYIO.attempt(lambda: release.wait(5)).timeout(0.05).run()
+        self.assertIsInstance(result, EffectTimeoutError)
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertEqual(runtime.abandoned_effects, before + 1)
+
+        release.set()
+        deadline = time.monotonic() + 2
+        while runtime.abandoned_effects != before and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(runtime.abandoned_effects, before)
+
+    def test_timeout_with_retry(self):
+        calls = []
+
+        def call():
+            calls.append(1)
+            return PYIO.sleep(10 if len(calls) < 3 else 0)
+
+        effect = PYIO.defer(call).timeout(0.05).retry(Schedule.recurs(5))
+        self.assertIsNone(effect.run())
+        self.assertEqual(len(calls), 3)
+
+    def test_interrupting_outer_fiber_interrupts_inner(self):
+        cancelled = threading.Event()
+        registered = threading.Event()
+
+        def register(callback):
+            registered.set()
+            return cancelled.set
+
+        fiber = PYIO.from_callback(register).timeout(10).fork().run()
+        registered.wait(1)
+        fiber.interrupt().run()
+        self.assertTrue(cancelled.wait(1))
+
+
+class TestTimeoutAsync(IsolatedAsyncioTestCase):
+    async def test_times_out_under_run_async(self):
+        async def hang():
+            await asyncio.sleep(10)
+
+        start = time.perf_counter()
+        result = await PYIO.from_awaitable(hang).timeout(0.05).run_async()
+        self.assertIsInstance(result, EffectTimeoutError)
+        self.assertLess(time.perf_counter() - start, 1)
+
+    async def test_completes_under_run_async(self):
+        async def quick():
+            return "done"
+
+        result = await PYIO.from_awaitable(quick).timeout(1).run_async()
+        self.assertEqual(result, "done")
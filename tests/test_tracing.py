@@ -0,0 +1,277 @@
+"""Unit tests for the pyfecto.tracing module and PYIO.traced."""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from src.pyfecto.collections import foreach_par
+from src.pyfecto.fiber import FiberInterrupted
+from src.pyfecto.pyio import PYIO
+from src.pyfecto.runtime import LOGGER, Runtime, _level_number
+from src.pyfecto.tracing import (
+    InMemoryExporter,
+    JsonLinesExporter,
+    OtlpHttpExporter,
+    SpanExporter,
+    Tracer,
+    annotate,
+    current_span,
+    to_otlp,
+)
+
+
+class FailingExporter(SpanExporter):
+    def export(self, spans):
+        raise OSError("collector unavailable")
+
+
+class TracingTestCase(TestCase):
+    def setUp(self):
+        self.runtime = Runtime()
+        self.memory = InMemoryExporter()
+        self.runtime.tracer = Tracer([self.memory])
+
+    def tearDown(self):
+        self.runtime.tracer.shutdown(timeout=1)
+        self.runtime.tracer = None
+
+    def exported(self):
+        self.assertTrue(self.runtime.tracer.flush(timeout=1))
+        return {span.name: span for span in self.memory.spans}
+
+
+class TestSpans(TracingTestCase):
+    def test_nested_through_flat_map(self):
+        inner = PYIO.success(1).traced("inner")
+        sibling = PYIO.success(2).traced("sibling")
+        outer = inner.flat_map(lambda _: sibling).traced("outer", user="alice")
+        self.assertEqual(outer.run(), 2)
+
+        spans = self.exported()
+        self.assertIsNone(spans["outer"].parent_id)
+        self.assertEqual(spans["inner"].parent_id, spans["outer"].span_id)
+        self.assertEqual(spans["sibling"].parent_id, spans["outer"].span_id)
+        self.assertEqual(
+            {span.trace_id for span in spans.values()}, {spans["outer"].trace_id}
+        )
+        self.assertEqual(spans["outer"].attributes, {"user": "alice"})
+
+    def test_separate_runs_are_separate_traces(self):
+        effect = PYIO.unit().traced("request")
+        effect.run()
+        effect.run()
+        self.runtime.tracer.flush(timeout=1)
+        first, second = self.memory.spans
+        self.assertNotEqual(first.trace_id, second.trace_id)
+        self.assertIsNone(second.parent_id)
+
+    def test_numeric_duration(self):
+        PYIO.sleep(0.05).traced("sleep").run()
+        span = self.exported()["sleep"]
+        self.assertIsInstance(span.duration_ns, int)
+        self.assertGreaterEqual(span.duration_ns, 50_000_000)
+        self.assertLess(span.duration_ns, 1_000_000_000)
+        self.assertTrue(span.ok)
+
+    def test_failure(self):
+        error = ValueError("test error")
+        self.assertIs(PYIO.fail(error).traced("failing").run(), error)
+        span = self.exported()["failing"]
+        self.assertIs(span.error, error)
+        self.assertFalse(span.ok)
+
+    def test_interruption(self):
+        result = PYIO.sleep(1).traced("slow").timeout(0.02).run()
+        self.assertIsInstance(result, TimeoutError)
+        time.sleep(0.02)
+        self.assertIsInstance(self.exported()["slow"].error, FiberInterrupted)
+
+    def test_forked_fibers_are_children(self):
+        effect = foreach_par(
+            [1, 2, 3], lambda i: PYIO.sleep(0.01).traced(f"item {i}")
+        ).traced("batch")
+        effect.run()
+        spans = self.exported()
+        for i in [1, 2, 3]:
+            self.assertEqual(spans[f"item {i}"].parent_id, spans["batch"].span_id)
+
+    def test_zip_par(self):
+        left = PYIO.sleep(0.01).traced("left")
+        right = PYIO.sleep(0.01).traced("right")
+        left.zip_par(right).traced("both").run()
+        spans = self.exported()
+        self.assertEqual(spans["left"].parent_id, spans["both"].span_id)
+        self.assertEqual(spans["right"].parent_id, spans["both"].span_id)
+
+    def test_annotate_and_current_span(self):
+        effect = annotate(rows=3).then(current_span()).traced("query")
+        active = effect.run()
+        self.assertEqual(active.name, "query")
+        self.assertEqual(self.exported()["query"].attributes, {"rows": 3})
+        self.assertIsNone(current_span().run())
+        annotate(ignored=True).run()
+
+    def test_log_span_links_spans(self):
+        messages = []
+        handler = LOGGER.add(messages.append, format="{message}|{extra}")
+        try:
+            inner = PYIO.log_span("inner", "inner done", PYIO.sleep(0.01))
+            PYIO.log_span("outer", lambda: "outer done", inner).run()
+        finally:
+            LOGGER.remove(handler)
+        spans = self.exported()
+        inner_record = messages[0].record["extra"]
+        outer_record = messages[1].record["extra"]
+        self.assertEqual(inner_record["span_id"], spans["inner"].span_id)
+        self.assertEqual(inner_record["parent_span_id"], spans["outer"].span_id)
+        self.assertIsNone(outer_record["parent_span_id"])
+        self.assertIsInstance(inner_record["spans"]["inner"], float)
+        self.assertGreaterEqual(inner_record["spans"]["inner"], 10)
+
+    def test_log_span_opens_a_span_without_logging(self):
+        level = self.runtime._min_log_level
+        self.runtime._min_log_level = _level_number("WARNING")
+        try:
+            inner = PYIO.unit().traced("inner")
+            PYIO.log_span("outer", "outer done", inner).run()
+        finally:
+            self.runtime._min_log_level = level
+        spans = self.exported()
+        self.assertEqual(spans["inner"].parent_id, spans["outer"].span_id)
+
+
+class TestTracer(TracingTestCase):
+    def test_exports_in_batches(self):
+        batches = []
+
+        class Recording(SpanExporter):
+            def export(self, spans):
+                batches.append(len(spans))
+
+        self.runtime.tracer = Tracer([Recording()], batch_size=10)
+        for _ in range(25):
+            PYIO.unit().traced("step").run()
+        self.runtime.tracer.flush(timeout=1)
+        self.assertEqual(sum(batches), 25)
+        self.assertTrue(all(size <= 10 for size in batches))
+
+    def test_exports_after_flush_interval(self):
+        self.runtime.tracer = Tracer([self.memory], flush_interval=0.05)
+        PYIO.unit().traced("step").run()
+        time.sleep(0.2)
+        self.assertEqual(len(self.memory.spans), 1)
+
+    def test_failing_exporter_does_not_affect_others(self):
+        self.runtime.tracer = Tracer([FailingExporter(), self.memory])
+        PYIO.unit().traced("step").run()
+        self.assertIn("step", self.exported())
+
+    def test_shutdown(self):
+        PYIO.unit().traced("before").run()
+        self.runtime.tracer.shutdown(timeout=1)
+        PYIO.unit().traced("after").run()
+        self.assertEqual([span.name for span in self.memory.spans], ["before"])
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            Tracer([], batch_size=0)
+        with self.assertRaises(ValueError):
+            Tracer([], flush_interval=0)
+
+
+class TestExporters(TracingTestCase):
+    def test_json_lines(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "spans.jsonl")
+            self.runtime.tracer = Tracer([JsonLinesExporter(path)])
+            PYIO.unit().traced("child").traced("parent", attempt=1).run()
+            self.runtime.tracer.flush(timeout=1)
+            with open(path) as file:
+                lines = [json.loads(line) for line in file]
+        child, parent = lines
+        self.assertEqual(child["parent_id"], parent["span_id"])
+        self.assertEqual(parent["attributes"], {"attempt": 1})
+        self.assertIsInstance(parent["duration_ns"], int)
+        self.assertIsNone(parent["error"])
+
+    def test_otlp_format(self):
+        PYIO.fail(ValueError("boom")).traced(
+            "child", retries=2, ratio=0.5, cached=False, region="eu"
+        ).traced("parent").run()
+        spans = self.exported()
+        payload = to_otlp([spans["child"], spans["parent"]], "orders")
+
+        resource_spans = payload["resourceSpans"][0]
+        self.assertEqual(
+            resource_spans["resource"]["attributes"][0],
+            {"key": "service.name", "value": {"stringValue": "orders"}},
+        )
+        child, parent = resource_spans["scopeSpans"][0]["spans"]
+        self.assertEqual(child["parentSpanId"], parent["spanId"])
+        self.assertNotIn("parentSpanId", parent)
+        self.assertEqual(len(child["traceId"]), 32)
+        self.assertEqual(len(child["spanId"]), 16)
+        self.assertEqual(child["status"]["code"], 2)
+        self.assertEqual(
+            int(child["endTimeUnixNano"]) - int(child["startTimeUnixNano"]),
+            spans["child"].duration_ns,
+        )
+        self.assertEqual(
+            child["attributes"],
+            [
+                {"key": "retries", "value": {"intValue": "2"}},
+                {"key": "ratio", "value": {"doubleValue": 0.5}},
+                {"key": "cached", "value": {"boolValue": False}},
+                {"key": "region", "value": {"stringValue": "eu"}},
+            ],
+        )
+
+    def test_otlp_http(self):
+        received = []
+
+        class Collector(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers["Content-Length"])
+                received.append((self.path, json.loads(self.rfile.read(length))))
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(b"{}")
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(("127.0.0.1", 0), Collector)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            endpoint = f"http://127.0.0.1:{server.server_port}/v1/traces"
+            self.runtime.tracer = Tracer([OtlpHttpExporter(endpoint, "checkout")])
+            PYIO.unit().traced("pay").run()
+            self.runtime.tracer.flush(timeout=5)
+        finally:
+            server.shutdown()
+        path, body = received[0]
+        self.assertEqual(path, "/v1/traces")
+        spans = body["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        self.assertEqual([span["name"] for span in spans], ["pay"])
+
+
+class TestTracingAsync(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.memory = InMemoryExporter()
+        Runtime().tracer = Tracer([self.memory])
+
+    async def asyncTearDown(self):
+        Runtime().tracer = None
+
+    async def test_nested_under_run_async(self):
+        inner = PYIO.sleep(0.01).traced("inner")
+        await inner.then(inner).traced("outer").run_async()
+        Runtime().tracer.flush(timeout=1)
+        spans = self.memory.spans
+        outer = spans[-1]
+        self.assertEqual(outer.name, "outer")
+        self.assertEqual([span.parent_id for span in spans[:-1]], [outer.span_id] * 2)